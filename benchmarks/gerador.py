@@ -0,0 +1,84 @@
+"""
+Gerador de transcrições sintéticas rotuladas para a suíte de benchmark.
+
+Monta dailies a partir de NOMES_EQUIPE, das listas de verbos e de expressões de prazo, variando o número de
+falantes e de falas por falante. Cada transcrição vem com o resultado esperado no mesmo formato da API.
+"""
+import random
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from services.falas import normalize_nome
+from services.lexico import NOMES_EQUIPE, VERBOS_PASSADO
+from services.prazos import resolver_prazo
+
+OBJETOS = [
+    "o endpoint de faturamento", "o PR do login", "a integração com o backend", "os testes de carga",
+    "o deploy em homologação", "a documentação da API", "o job de conciliação", "a tela de cadastro",
+    "o cache de sessões", "o relatório de métricas", "a migração do banco", "o fluxo de pagamento",
+]
+# (expressão no texto, expressão de prazo esperada)
+PRAZOS = [
+    ("", ""), ("", ""), ("até sexta-feira", "sexta-feira"), ("na quinta-feira", "quinta-feira"),
+    ("em 3 dias", "em 3 dias"), ("dia 20/03", "20/03"), ("na próxima semana", "próxima semana"),
+    ("depois de amanhã", "depois de amanhã"),
+]
+AUXILIARES = ["vou", "preciso", "devo"]
+IRREGULARES = {"fazer": "fiz", "rever": "revi"}
+
+def passado_1s(verbo: str) -> str:
+    """Pretérito perfeito na 1ª pessoa: finalizar -> finalizei, entregar -> entreguei, corrigir -> corrigi."""
+    if verbo in IRREGULARES:
+        return IRREGULARES[verbo]
+    raiz, terminacao = verbo[:-2], verbo[-2:]
+    if terminacao == "ar":
+        if raiz.endswith("g"):
+            raiz += "u"
+        elif raiz.endswith("c"):
+            raiz = raiz[:-1] + "qu"
+        return raiz + "ei"
+    return raiz + "i"
+
+def _frase_feita(rng: random.Random) -> Tuple[str, Dict[str, Any]]:
+    frase = f"{passado_1s(rng.choice(VERBOS_PASSADO))} {rng.choice(OBJETOS)}"
+    return frase, {"feita": frase}
+
+def _frase_a_fazer(rng: random.Random, base_date: datetime) -> Tuple[str, Dict[str, Any]]:
+    no_texto, prazo = rng.choice(PRAZOS)
+    frase = f"{rng.choice(AUXILIARES)} {rng.choice(VERBOS_PASSADO)} {rng.choice(OBJETOS)}"
+    if no_texto:
+        frase += f" {no_texto}"
+    # Prazos sintéticos saem do mesmo resolvedor da API; o corpus golden é quem tem datas rotuladas à mão.
+    data_prazo = resolver_prazo(prazo, base_date) if prazo else ""
+    return frase, {"a_fazer": {"task": frase, "prazo": prazo, "data_prazo": data_prazo}}
+
+def gerar_transcricao(pessoas: int, falas_por_pessoa: int, seed: int = 0, base_date: datetime = None) -> Dict[str, Any]:
+    """
+    Gera uma daily com `pessoas` falantes, cada um com `falas_por_pessoa` turnos intercalados de 1 a 3 frases.
+    Retorna {"id", "texto", "esperado"}.
+    """
+    rng = random.Random(seed)
+    base_date = base_date or datetime.now()
+    nomes = rng.sample(NOMES_EQUIPE, min(pessoas, len(NOMES_EQUIPE)))
+    # Um nome e seu apelido viram a mesma pessoa; fica só um dos dois.
+    nomes = list({normalize_nome(n): n for n in nomes}.values())
+    esperado: Dict[str, Dict[str, Any]] = {
+        normalize_nome(n): {"responsavel": normalize_nome(n), "feitas": [], "a_fazer": []} for n in nomes
+    }
+    linhas: List[str] = []
+    for _ in range(falas_por_pessoa):
+        for nome in nomes:
+            frases = []
+            for _ in range(rng.randint(1, 3)):
+                frase, rotulo = _frase_feita(rng) if rng.random() < 0.5 else _frase_a_fazer(rng, base_date)
+                frases.append(frase[0].upper() + frase[1:] + ".")
+                pessoa = esperado[normalize_nome(nome)]
+                if "feita" in rotulo:
+                    pessoa["feitas"].append(rotulo["feita"])
+                else:
+                    pessoa["a_fazer"].append(rotulo["a_fazer"])
+            linhas.append(f"{nome}: {' '.join(frases)}")
+    return {"id": f"sintetico-{pessoas}x{falas_por_pessoa}-{seed}", "texto": "\n".join(linhas), "esperado": list(esperado.values())}
+
+def gerar_corpus(quantidade: int, pessoas: int, falas_por_pessoa: int, seed: int = 0, base_date: datetime = None) -> List[Dict[str, Any]]:
+    return [gerar_transcricao(pessoas, falas_por_pessoa, seed=seed + i, base_date=base_date) for i in range(quantidade)]
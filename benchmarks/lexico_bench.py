@@ -0,0 +1,79 @@
+"""
+Microbenchmark do custo por subfrase da classificação léxica: implementação antiga (regex montado por token +
+uma varredura por lista) contra o léxico compilado de services.lexico (uma varredura por subfrase).
+Confere também que as duas dão o mesmo resultado em todas as subfrases.
+
+Uso: PYTHONPATH=. python benchmarks/lexico_bench.py [repeticoes]
+"""
+import re
+import sys
+import time
+
+from services.spacy_local import (
+    nlp, split_subfrases_spans, is_passado, is_futuro, extrair_prazo, identificar_padrao,
+    PAIRING, REUNIAO, BLOQUEIO, NEGATIVOS, VERBOS_PASSADO, VERBOS_FUTURO, lexico_atual,
+)
+from services.warmup import TEXTO_AQUECIMENTO
+
+FRASES = TEXTO_AQUECIMENTO.split("\n") + [
+    "Estou bloqueado por falta de acesso ao banco, e amanhã tenho reunião com o cliente",
+    "Fiz o deploy na sexta-feira mas não deu tempo de validar, preciso terminar até quarta",
+    "Ela ficou de subir a correção em 3 dias; vou parear com o Vini no próximo mês",
+    "Ontem a Isa terminou os testes e deve revisar o PR dia 12/10",
+]
+
+# Implementação anterior, copiada de services/spacy_local.py para comparação.
+def is_passado_antigo(doc) -> bool:
+    for token in doc:
+        if token.lemma_ in VERBOS_PASSADO and "Past" in token.morph.get("Tense"):
+            return True
+        if re.search(r"\b({})\b".format("|".join([v+"u" for v in VERBOS_PASSADO])), token.text, re.IGNORECASE):
+            return True
+    return False
+
+def is_futuro_antigo(doc) -> bool:
+    for token in doc:
+        if token.lemma_ in VERBOS_FUTURO and ("Fut" in token.morph.get("Tense") or token.text.lower() in ["vai", "irá", "deverá", "precisará"]):
+            return True
+        if re.search(r"\b(vai|irá|deverá|precisa|precisará|deve|fará|fazer|começar|começará|iniciar|iniciará|planeja|planejar|pretende|pretender|a fazer|pendente|ficou de|vai entregar|deveriam|deverá|deveriam)\b", token.text, re.IGNORECASE):
+            return True
+    if any(neg in doc.text.lower() for neg in NEGATIVOS):
+        return True
+    return False
+
+def extrair_prazo_antigo(doc) -> str:
+    for ent in doc.ents:
+        if ent.label_ == "PRAZO":
+            return ent.text
+    m = re.search(r"(amanhã|hoje|depois de amanhã|próxima semana|[0-9]{1,2}/[0-9]{1,2}|[0-9]{1,2}-[0-9]{1,2}|[0-9]{1,2} de [a-zç]+|segunda-feira|terça-feira|quarta-feira|quinta-feira|sexta-feira|sábado|domingo|até [a-zç]+|em [0-9]+ dias?|no próximo mês)", doc.text, re.IGNORECASE)
+    return m.group(0) if m else ""
+
+def classificar_antigo(sub, span):
+    padroes = tuple(identificar_padrao(sub, lista) for lista in (PAIRING, REUNIAO, BLOQUEIO, NEGATIVOS))
+    return padroes, is_passado_antigo(span), is_futuro_antigo(span), extrair_prazo_antigo(span)
+
+def classificar_novo(sub, span):
+    marcas = lexico_atual().marcar(sub)
+    padroes = tuple(c in marcas.categorias for c in ("pairing", "reuniao", "bloqueio", "negativo"))
+    return padroes, is_passado(span, marcas), is_futuro(span, marcas), extrair_prazo(span)
+
+def _medir(funcao, subfrases, repeticoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for sub, span in subfrases:
+            funcao(sub, span)
+    return (time.perf_counter() - inicio) / (repeticoes * len(subfrases)) * 1e6
+
+def main() -> None:
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    subfrases = [sub for doc in nlp.pipe(FRASES) for sent in doc.sents for sub in split_subfrases_spans(sent)]
+    divergentes = [sub for sub, span in subfrases if classificar_antigo(sub, span) != classificar_novo(sub, span)]
+    antigo = _medir(classificar_antigo, subfrases, repeticoes)
+    novo = _medir(classificar_novo, subfrases, repeticoes)
+    print(f"{len(subfrases)} subfrases x {repeticoes} repetições")
+    print(f"antigo:   {antigo:8.2f} µs/subfrase")
+    print(f"compilado:{novo:8.2f} µs/subfrase  ({antigo / novo:.1f}x)")
+    print(f"divergências: {divergentes or 'nenhuma'}")
+
+if __name__ == "__main__":
+    main()
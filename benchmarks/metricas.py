@@ -0,0 +1,134 @@
+"""Métricas da suíte de benchmark: precisão/recall por campo, percentis e comparação com o baseline."""
+import math
+import re
+import unicodedata
+from typing import Any, Dict, List, Tuple
+
+# Dois textos de tarefa "casam" quando a sobreposição de palavras (Jaccard) passa deste limiar:
+# provedores diferentes recortam a mesma tarefa de jeitos um pouco diferentes.
+LIMIAR_CASAMENTO = 0.5
+CAMPOS = ("feitas", "a_fazer", "data_prazo")
+
+def _palavras(texto: str) -> set:
+    sem_acento = unicodedata.normalize("NFKD", texto.lower())
+    sem_acento = "".join(c for c in sem_acento if not unicodedata.combining(c))
+    return set(re.findall(r"\w+", sem_acento))
+
+def similaridade(a: str, b: str) -> float:
+    pa, pb = _palavras(a), _palavras(b)
+    if not pa and not pb:
+        return 1.0
+    return len(pa & pb) / len(pa | pb)
+
+def _casar(previstos: List[str], esperados: List[str]) -> List[Tuple[int, int]]:
+    """Casamento guloso pelos pares mais parecidos, cada item usado no máximo uma vez."""
+    candidatos = sorted(
+        ((similaridade(p, e), i, j) for i, p in enumerate(previstos) for j, e in enumerate(esperados)),
+        reverse=True,
+    )
+    usados_p, usados_e, pares = set(), set(), []
+    for score, i, j in candidatos:
+        if score < LIMIAR_CASAMENTO:
+            break
+        if i in usados_p or j in usados_e:
+            continue
+        usados_p.add(i)
+        usados_e.add(j)
+        pares.append((i, j))
+    return pares
+
+def contar(previsto: List[Dict[str, Any]], esperado: List[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    """Conta verdadeiros positivos, falsos positivos e falsos negativos de feitas, a_fazer e data_prazo por responsável."""
+    contagens = {campo: {"tp": 0, "fp": 0, "fn": 0} for campo in CAMPOS}
+    por_nome = {p.get("responsavel"): p for p in previsto if "erro" not in p}
+    nomes = set(por_nome) | {p["responsavel"] for p in esperado}
+    esperado_por_nome = {p["responsavel"]: p for p in esperado}
+    for nome in nomes:
+        prev = por_nome.get(nome, {"feitas": [], "a_fazer": []})
+        esp = esperado_por_nome.get(nome, {"feitas": [], "a_fazer": []})
+
+        pares = _casar(prev["feitas"], esp["feitas"])
+        contagens["feitas"]["tp"] += len(pares)
+        contagens["feitas"]["fp"] += len(prev["feitas"]) - len(pares)
+        contagens["feitas"]["fn"] += len(esp["feitas"]) - len(pares)
+
+        pares = _casar([t["task"] for t in prev["a_fazer"]], [t["task"] for t in esp["a_fazer"]])
+        contagens["a_fazer"]["tp"] += len(pares)
+        contagens["a_fazer"]["fp"] += len(prev["a_fazer"]) - len(pares)
+        contagens["a_fazer"]["fn"] += len(esp["a_fazer"]) - len(pares)
+
+        # data_prazo: só conta como acerto a data certa na tarefa certa.
+        datas = contagens["data_prazo"]
+        casados_p = {i: j for i, j in pares}
+        casados_e = set(casados_p.values())
+        for i, tarefa in enumerate(prev["a_fazer"]):
+            data = tarefa.get("data_prazo") or ""
+            certa = (esp["a_fazer"][casados_p[i]].get("data_prazo") or "") if i in casados_p else ""
+            if data and data == certa:
+                datas["tp"] += 1
+            else:
+                datas["fp"] += bool(data)
+                datas["fn"] += bool(certa)
+        datas["fn"] += sum(1 for j, t in enumerate(esp["a_fazer"]) if j not in casados_e and t.get("data_prazo"))
+    return contagens
+
+def somar(total: Dict[str, Dict[str, int]], parcial: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    for campo, valores in parcial.items():
+        for chave, valor in valores.items():
+            total.setdefault(campo, {"tp": 0, "fp": 0, "fn": 0})[chave] += valor
+    return total
+
+def precisao_recall(contagens: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, float]]:
+    resultado = {}
+    for campo, c in contagens.items():
+        precisao = c["tp"] / (c["tp"] + c["fp"]) if c["tp"] + c["fp"] else 1.0
+        recall = c["tp"] / (c["tp"] + c["fn"]) if c["tp"] + c["fn"] else 1.0
+        f1 = 2 * precisao * recall / (precisao + recall) if precisao + recall else 0.0
+        resultado[campo] = {"precisao": round(precisao, 4), "recall": round(recall, 4), "f1": round(f1, 4), **c}
+    return resultado
+
+def percentis(valores: List[float], ps=(50, 90, 99)) -> Dict[str, float]:
+    """Percentis pelo método nearest-rank, em milissegundos com 3 casas."""
+    if not valores:
+        return {f"p{p}": 0.0 for p in ps}
+    ordenados = sorted(valores)
+    return {f"p{p}": round(ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)], 3) for p in ps}
+
+def _achatar(dados: Dict[str, Any], prefixo: str = "") -> Dict[str, float]:
+    itens = {}
+    for chave, valor in dados.items():
+        caminho = f"{prefixo}.{chave}" if prefixo else chave
+        if isinstance(valor, dict):
+            itens.update(_achatar(valor, caminho))
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            itens[caminho] = float(valor)
+    return itens
+
+def comparar(atual: Dict[str, Any], baseline: Dict[str, Any], tolerancia: float = 0.2,
+             tolerancia_precisao: float = 0.02, piso_ms: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    Compara as métricas com o baseline e retorna as regressões:
+    - latência (.latencia_ms.*) e memória (.memoria.*): piora acima de `tolerancia` (relativa);
+      latências abaixo de `piso_ms` de diferença são ignoradas (ruído);
+    - vazão (.vazao.*): queda acima de `tolerancia`;
+    - precisão/recall/f1: queda acima de `tolerancia_precisao` (absoluta).
+    """
+    a, b = _achatar(atual.get("provedores", {})), _achatar(baseline.get("provedores", {}))
+    regressoes = []
+    for chave, base in b.items():
+        if chave not in a:
+            continue
+        valor = a[chave]
+        if ".latencia_ms." in chave:
+            piorou = valor > base * (1 + tolerancia) and valor - base > piso_ms
+        elif ".memoria." in chave:
+            piorou = valor > base * (1 + tolerancia)
+        elif ".vazao." in chave:
+            piorou = valor < base * (1 - tolerancia)
+        elif chave.rsplit(".", 1)[-1] in ("precisao", "recall", "f1"):
+            piorou = valor < base - tolerancia_precisao
+        else:
+            continue
+        if piorou:
+            regressoes.append({"metrica": chave, "baseline": base, "atual": valor})
+    return regressoes
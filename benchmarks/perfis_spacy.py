@@ -0,0 +1,124 @@
+"""
+Compara modelos (sm/md/lg) e perfis de carga do spaCy em precisão, latência e memória (RSS).
+
+Cada combinação roda num subprocesso próprio, para o RSS medir só aquele modelo. A precisão é medida nos casos de
+test_data: as checagens de test_extractor e a concordância com o resultado da primeira combinação (referência).
+Modelos não instalados são pulados.
+
+Uso: PYTHONPATH=. python benchmarks/perfis_spacy.py [--modelos lg,md,sm] [--perfis completo,enxuto] [--repeticoes 20]
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+# Casos de test_data/test_extractor.py e o texto de aquecimento, com as checagens que os testes fazem.
+CASOS = [
+    {
+        "texto": "Lucas: Ontem finalizei o componente de login, mas ainda preciso revisar a integração com o backend.",
+        "responsavel": "Lucas", "min_feitas": 0, "min_a_fazer": 0, "min_total": 1,
+    },
+    {
+        "texto": "João: Ontem finalizei o ajuste no endpoint de faturamento e fiz o merge na develop. Hoje vou revisar o PR da Alê e começar a refatorar o serviço de autenticação.",
+        "responsavel": "João", "min_feitas": 1, "min_a_fazer": 1, "min_total": 2,
+    },
+    {
+        "texto": "João: Ontem finalizei o ajuste no endpoint de faturamento e fiz o merge na develop. Hoje vou revisar o PR da Alê.\nAlê: Não consegui terminar o deploy, vou fazer pairing com o Caio amanhã.",
+        "responsavel": "Alessandra", "min_feitas": 0, "min_a_fazer": 1, "min_total": 1,
+    },
+]
+
+def _rss_mb() -> float:
+    """RSS atual em MB (Linux); cai para o pico do processo onde /proc não existe."""
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _worker(repeticoes: int) -> None:
+    """Roda dentro do subprocesso: carrega o modelo com o perfil do ambiente e mede tudo."""
+    rss_inicial = _rss_mb()
+    inicio = time.perf_counter()
+    from services.spacy_local import nlp, extract_tasks_with_spacy
+    carga = time.perf_counter() - inicio
+    rss_modelo = _rss_mb() - rss_inicial
+    from services.warmup import TEXTO_AQUECIMENTO
+    extract_tasks_with_spacy(TEXTO_AQUECIMENTO)
+
+    resultados, latencias = [], []
+    for caso in CASOS:
+        tempos = []
+        for _ in range(repeticoes):
+            t = time.perf_counter()
+            resultado = extract_tasks_with_spacy(caso["texto"])
+            tempos.append(time.perf_counter() - t)
+        resultados.append(resultado)
+        latencias.append(statistics.median(tempos) * 1000)
+    print(json.dumps({
+        "componentes": nlp.pipe_names,
+        "vetores": list(nlp.vocab.vectors.shape),
+        "carga_s": round(carga, 3),
+        "rss_modelo_mb": round(rss_modelo, 1),
+        "rss_total_mb": round(_rss_mb(), 1),
+        "latencia_ms": [round(x, 2) for x in latencias],
+        "resultados": resultados,
+    }, ensure_ascii=False))
+
+def _passa_checagens(caso, resultado) -> bool:
+    pessoa = next((p for p in resultado if p["responsavel"] == caso["responsavel"]), None)
+    if pessoa is None:
+        return False
+    return (len(pessoa["feitas"]) >= caso["min_feitas"] and len(pessoa["a_fazer"]) >= caso["min_a_fazer"]
+            and len(pessoa["feitas"]) + len(pessoa["a_fazer"]) >= caso["min_total"])
+
+def _sem_datas(resultado):
+    """data_prazo depende do dia da execução; fica fora da comparação."""
+    return [{**p, "a_fazer": [{k: v for k, v in t.items() if k != "data_prazo"} for t in p["a_fazer"]]} for p in resultado]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modelos", default="lg,md,sm")
+    parser.add_argument("--perfis", default="completo,enxuto")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        _worker(args.repeticoes)
+        return
+
+    linhas, referencia = [], None
+    for modelo in args.modelos.split(","):
+        for perfil in args.perfis.split(","):
+            env = {**os.environ, "SPACY_MODEL": modelo, "SPACY_PERFIL": perfil, "CACHE_ENABLED": "false", "LOG_LEVEL": "WARNING"}
+            proc = subprocess.run([sys.executable, __file__, "--worker", "--repeticoes", str(args.repeticoes)],
+                                  env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{modelo}/{perfil}: pulado ({proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'erro'})")
+                continue
+            dados = json.loads(proc.stdout.strip().splitlines()[-1])
+            resultados = [_sem_datas(r) for r in dados["resultados"]]
+            if referencia is None:
+                referencia = (f"{modelo}/{perfil}", resultados)
+            checagens = sum(_passa_checagens(c, r) for c, r in zip(CASOS, dados["resultados"]))
+            iguais = sum(r == ref for r, ref in zip(resultados, referencia[1]))
+            linhas.append((f"{modelo}/{perfil}", dados, checagens, iguais))
+
+    if not linhas:
+        print("Nenhum modelo disponível.")
+        return
+    print(f"\nReferência de concordância: {referencia[0]}  |  latência = mediana de {args.repeticoes} execuções por caso\n")
+    print(f"{'modelo/perfil':<18}{'checagens':>10}{'iguais':>8}{'carga s':>9}{'RSS mod MB':>12}{'RSS tot MB':>12}{'lat. média ms':>15}  componentes")
+    for nome, dados, checagens, iguais in linhas:
+        print(f"{nome:<18}{checagens:>7}/{len(CASOS)}{iguais:>5}/{len(CASOS)}{dados['carga_s']:>9}{dados['rss_modelo_mb']:>12}"
+              f"{dados['rss_total_mb']:>12}{statistics.mean(dados['latencia_ms']):>15.2f}  {','.join(dados['componentes'])} vetores={dados['vetores']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Microbenchmark da serialização da resposta de extração para uma saída de N pessoas (padrão: 1000).
+
+Compara:
+- antes: o que o FastAPI fazia com o resultado devolvido como dicts (jsonable_encoder + JSONResponse);
+- response_model: o caminho rápido do FastAPI com response_model (valida os dicts e serializa via pydantic);
+- modelos pydantic: montar os objetos PessoaTarefas a partir dos dicts e serializar com dump_json;
+- depois: RespostaJSON (orjson direto nos dicts), que é o que os endpoints devolvem agora.
+Confere também que todos geram o mesmo JSON.
+
+Uso: PYTHONPATH=. python benchmarks/serializacao_bench.py [pessoas] [repeticoes]
+"""
+import asyncio
+import json
+import sys
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import TypeAdapter
+from starlette.responses import JSONResponse
+
+from models.task import PessoaTarefas
+from utils.respostas import RespostaJSON, orjson
+
+def saida(pessoas: int) -> list:
+    """Resultado sintético no formato de /extract-tasks: 5 feitas e 5 a fazer por pessoa."""
+    return [
+        {
+            "responsavel": f"Pessoa {i}",
+            "feitas": [f"Finalizei a integração {j} do módulo de cobrança" for j in range(5)],
+            "a_fazer": [
+                {"task": f"Revisar o PR {j} da equipe", "prazo": "sexta-feira", "data_prazo": "2026-10-23", "descricao": ""}
+                for j in range(5)
+            ],
+        }
+        for i in range(pessoas)
+    ]
+
+def medir(funcao, repeticoes: int) -> float:
+    funcao()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+def main():
+    pessoas = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    resultado = saida(pessoas)
+    campo = create_model_field(name="resposta", type_=List[PessoaTarefas], mode="serialization")
+    adaptador = TypeAdapter(List[PessoaTarefas])
+
+    variantes = {
+        "antes (jsonable_encoder + json)": lambda: JSONResponse(jsonable_encoder(resultado)).body,
+        "response_model (pydantic)": lambda: asyncio.run(serialize_response(field=campo, response_content=resultado, dump_json=True)),
+        "modelos pydantic + dump_json": lambda: adaptador.dump_json(adaptador.validate_python(resultado)),
+        "depois (RespostaJSON)": lambda: RespostaJSON(resultado).body,
+    }
+    esperado = json.loads(JSONResponse(resultado).body)
+    for nome, funcao in variantes.items():
+        assert json.loads(funcao()) == esperado, f"{nome} gerou um JSON diferente"
+
+    print(f"{pessoas} pessoas, {len(RespostaJSON(resultado).body) / 1024:.0f} KiB, orjson {'instalado' if orjson else 'ausente'}")
+    base = None
+    for nome, funcao in variantes.items():
+        ms = medir(funcao, repeticoes)
+        base = base or ms
+        print(f"{nome:34s} {ms:8.2f} ms  ({base / ms:5.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Suíte de benchmark e regressão de precisão dos provedores de extração.
+
+Roda o corpus rotulado (test_data/golden.json) e um lote de transcrições sintéticas (benchmarks/gerador.py) por:
+- spacy: extract_tasks_with_spacy, com a divisão por etapa (separar_falas, nlp.pipe, classificação, agrupamento,
+  prazos) lida do coletor de utils.metrics que a própria função alimenta;
+- gemini: extract_tasks_with_gemini_async contra um backend local (httpx.MockTransport) que devolve o rótulo
+  da transcrição com latência configurável, sem rede nem chave. Mede o custo do nosso lado (payload, parse, prazos).
+
+Mostra os percentis de latência por etapa, a vazão, o pico de memória e a precisão/recall de feitas, a_fazer e
+data_prazo. Com --baseline, compara com um JSON salvo antes (--saida) e sai com código 1 se houver regressão.
+benchmarks/baseline.json é a referência versionada; regrave-a quando uma mudança de desempenho for intencional.
+
+Uso:
+  PYTHONPATH=. python -m benchmarks.suite --saida benchmarks/baseline.json
+  PYTHONPATH=. python -m benchmarks.suite --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from benchmarks.gerador import gerar_corpus
+from benchmarks.metricas import comparar, contar, percentis, precisao_recall, somar
+from utils.metrics import coletar_tempos, resumir_tempos
+
+CORPUS_PADRAO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_data", "golden.json")
+
+def carregar_corpus(caminho: str) -> Dict[str, Any]:
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+# ---------- provedores ----------
+
+def _rodar_spacy(texto: str, base_date: datetime, tempos: Dict[str, List[float]]) -> List[Dict[str, Any]]:
+    """Cronometra extract_tasks_with_spacy, a mesma função da API; as etapas vêm do coletor de utils.metrics."""
+    from services.spacy_local import extract_tasks_with_spacy
+    from services.validator import postprocess_tasks
+
+    with coletar_tempos() as etapas:
+        t0 = time.perf_counter()
+        resultado = extract_tasks_with_spacy(texto)
+        t1 = time.perf_counter()
+    for chave, ms in resumir_tempos(etapas).items():
+        tempos.setdefault(chave.split(".", 1)[1], []).append(ms)
+    tempos.setdefault("total", []).append((t1 - t0) * 1000)
+    # A função resolve os prazos com a data de hoje; para comparar com o rótulo, resolve de novo com a data base.
+    return postprocess_tasks(resultado, base_date=base_date)
+
+class GeminiStub:
+    """Backend local no lugar da Gemini: responde com o rótulo da transcrição (sem data_prazo) após `latencia_ms`."""
+
+    def __init__(self, transcricoes: List[Dict[str, Any]], latencia_ms: float = 0):
+        self.transcricoes = transcricoes
+        self.latencia_ms = latencia_ms
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["contents"][0]["parts"][0]["text"]
+        esperado = next((t["esperado"] for t in self.transcricoes if t["texto"] in prompt), [])
+        resposta = [
+            {"responsavel": p["responsavel"], "feitas": p["feitas"],
+             "a_fazer": [{**t, "data_prazo": ""} for t in p["a_fazer"]]}
+            for p in esperado
+        ]
+        if self.latencia_ms:
+            await asyncio.sleep(self.latencia_ms / 1000)
+        # Modo JSON (responseSchema): o texto é o JSON puro, sem cercas de Markdown.
+        texto = json.dumps(resposta, ensure_ascii=False)
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": texto}]}, "finishReason": "STOP"}]})
+
+def _criar_gemini(transcricoes: List[Dict[str, Any]], latencia_ms: float) -> Callable:
+    from services.gemini_llm import extract_tasks_with_gemini_async
+    from services.validator import postprocess_tasks
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(GeminiStub(transcricoes, latencia_ms)))
+
+    def _rodar(texto: str, base_date: datetime, tempos: Dict[str, List[float]]) -> List[Dict[str, Any]]:
+        t0 = time.perf_counter()
+        resultado = loop.run_until_complete(extract_tasks_with_gemini_async(texto, client=client))
+        t1 = time.perf_counter()
+        # A API resolve os prazos com a data de hoje; para comparar com o rótulo, resolve de novo com a data base.
+        resultado = postprocess_tasks(resultado, base_date=base_date)
+        tempos.setdefault("total", []).append((t1 - t0) * 1000)
+        return resultado
+
+    return _rodar
+
+# ---------- execução ----------
+
+def _medir_provedor(rodar: Callable, conjuntos: Dict[str, List[Dict[str, Any]]], base_date: datetime, repeticoes: int) -> Dict[str, Any]:
+    transcricoes = [t for lista in conjuntos.values() for t in lista]
+    falas = sum(t["texto"].count("\n") + 1 for t in transcricoes)
+
+    # Precisão e aquecimento numa primeira passada, sem cronômetro.
+    precisao = {}
+    for nome, lista in conjuntos.items():
+        total: Dict[str, Dict[str, int]] = {}
+        for t in lista:
+            somar(total, contar(rodar(t["texto"], base_date, {}), t["esperado"]))
+        precisao[nome] = precisao_recall(total)
+
+    tempos: Dict[str, List[float]] = {}
+    gc.collect()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for t in transcricoes:
+            rodar(t["texto"], base_date, tempos)
+    duracao = time.perf_counter() - inicio
+
+    # Memória numa passada separada: o tracemalloc deixa tudo mais lento e distorceria a latência.
+    tracemalloc.start()
+    for t in transcricoes:
+        rodar(t["texto"], base_date, {})
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "latencia_ms": {etapa: percentis(valores) for etapa, valores in tempos.items()},
+        "vazao": {
+            "transcricoes_s": round(repeticoes * len(transcricoes) / duracao, 2),
+            "falas_s": round(repeticoes * falas / duracao, 2),
+        },
+        "memoria": {"pico_python_mb": round(pico / 1024 / 1024, 2)},
+        "precisao": precisao,
+    }
+
+def executar(args) -> Dict[str, Any]:
+    corpus = carregar_corpus(args.corpus)
+    base_date = datetime.fromisoformat(corpus["base_date"])
+    conjuntos = {"golden": corpus["transcricoes"]}
+    if args.sinteticos:
+        conjuntos["sintetico"] = gerar_corpus(args.sinteticos, args.pessoas, args.falas, seed=args.seed, base_date=base_date)
+
+    provedores = {}
+    for provedor in args.provedores.split(","):
+        if provedor == "spacy":
+            rodar = _rodar_spacy
+        elif provedor == "gemini":
+            rodar = _criar_gemini([t for lista in conjuntos.values() for t in lista], args.gemini_latencia_ms)
+        else:
+            raise SystemExit(f"Provedor desconhecido: {provedor}")
+        provedores[provedor] = _medir_provedor(rodar, conjuntos, base_date, args.repeticoes)
+
+    from services.nlp_loader import versao_cache
+    return {
+        "meta": {
+            "gerado_em": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "modelo_spacy": versao_cache(),
+            "transcricoes": {nome: len(lista) for nome, lista in conjuntos.items()},
+            "repeticoes": args.repeticoes,
+            "gemini_latencia_ms": args.gemini_latencia_ms,
+            "rss_max_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        "provedores": provedores,
+    }
+
+def imprimir(resultado: Dict[str, Any]) -> None:
+    meta = resultado["meta"]
+    print(f"Modelo: {meta['modelo_spacy']} | transcrições: {meta['transcricoes']} | repetições: {meta['repeticoes']} | RSS máx: {meta['rss_max_mb']} MB")
+    for provedor, dados in resultado["provedores"].items():
+        print(f"\n== {provedor} ==")
+        print(f"vazão: {dados['vazao']['transcricoes_s']} transcrições/s, {dados['vazao']['falas_s']} falas/s | pico Python: {dados['memoria']['pico_python_mb']} MB")
+        print(f"{'etapa':<16}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+        for etapa, p in dados["latencia_ms"].items():
+            print(f"{etapa:<16}{p['p50']:>10}{p['p90']:>10}{p['p99']:>10}")
+        print(f"{'conjunto/campo':<24}{'precisão':>10}{'recall':>10}{'f1':>8}")
+        for conjunto, campos in dados["precisao"].items():
+            for campo, m in campos.items():
+                print(f"{conjunto + '/' + campo:<24}{m['precisao']:>10}{m['recall']:>10}{m['f1']:>8}")
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS_PADRAO, help="corpus rotulado (JSON)")
+    parser.add_argument("--sinteticos", type=int, default=20, help="transcrições sintéticas geradas")
+    parser.add_argument("--pessoas", type=int, default=4, help="falantes por transcrição sintética")
+    parser.add_argument("--falas", type=int, default=3, help="turnos por falante nas sintéticas")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=5, help="passadas cronometradas pelo corpus inteiro")
+    parser.add_argument("--provedores", default="spacy,gemini")
+    parser.add_argument("--gemini-latencia-ms", type=float, default=0, help="latência simulada do backend Gemini local")
+    parser.add_argument("--saida", help="grava o resultado em JSON (use como baseline)")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora relativa aceita em latência, vazão e memória")
+    parser.add_argument("--tolerancia-precisao", type=float, default=0.02, help="queda absoluta aceita em precisão/recall/f1")
+    parser.add_argument("--piso-ms", type=float, default=0.5, help="diferenças de latência abaixo disso são ruído")
+    parser.add_argument("--verboso", action="store_true", help="mantém os logs INFO dos serviços")
+    args = parser.parse_args(argv)
+    if not args.verboso:
+        logging.disable(logging.INFO)
+
+    resultado = executar(args)
+    imprimir(resultado)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"\nResultado gravado em {args.saida}")
+    if args.baseline:
+        regressoes = comparar(resultado, carregar_corpus(args.baseline), args.tolerancia, args.tolerancia_precisao, args.piso_ms)
+        if regressoes:
+            print(f"\n{len(regressoes)} regressão(ões) em relação a {args.baseline}:")
+            for r in regressoes:
+                print(f"  {r['metrica']}: {r['baseline']} -> {r['atual']}")
+            return 1
+        print(f"\nSem regressões em relação a {args.baseline}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
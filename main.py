@@ -1,18 +1,66 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
 from enum import Enum
-from fastapi import FastAPI, HTTPException
+from typing import AsyncIterator, List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from models.task import PessoaTarefas, ItemLote, ResultadoSessao, Job
+from services.admissao import get_controle_admissao, cliente_da_requisicao, AdmissaoNegadaError, LimiteCorpoMiddleware, StreamingComVaga, Vaga
+from services.cache import get_result_cache, cache_key
+from services.jobs import get_job_queue, start_jobs, stop_jobs, JobNaoEncontradoError, FilaCheiaError
+from services.nlp_loader import versao_cache
+from services.sessoes import get_session_store, Sessao, SessaoNaoEncontradaError, SessaoMuitoGrandeError
+from services.spacy_pool import start_pool, stop_pool, get_pool, PoolSaturadoError, PoolTimeoutError
+from services.warmup import aquecer_modelo, aquecer_pool, marcar_pronto, estado
+from utils.config import get_env_var
+from utils.http_client import start_async_client, close_async_client
+from utils.metrics import REGISTRO, CACHE_CONSULTAS, etapa, coletar_tempos, resumir_tempos, server_timing
+from utils.respostas import RespostaJSON
 
 class ProvedorEnum(str, Enum):
     spacy = "spacy"
     gemini = "gemini"
+    auto = "auto"
 
 class TextoRequest(BaseModel):
     texto: str
     provedor: ProvedorEnum = ProvedorEnum.spacy
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cliente HTTP único por processo: reaproveita conexões TLS com a Gemini entre requisições.
+    await start_async_client()
+    # Carrega e aquece o spaCy em segundo plano; /ready fica falso até terminar.
+    # Com o pool de processos, quem carrega o modelo são os workers do pool.
+    pool = start_pool()
+    aquecimento = None
+    if pool is not None:
+        aquecimento = asyncio.create_task(aquecer_pool(pool))
+    elif get_env_var("SPACY_PRELOAD", default="true").lower() == "true":
+        aquecimento = asyncio.create_task(run_in_threadpool(aquecer_modelo))
+    else:
+        marcar_pronto()
+    # Workers da fila de jobs assíncronos (retomam os jobs pendentes de antes do restart).
+    start_jobs()
+    # Limpeza periódica das sessões expiradas no SQLite (sem SESSOES_SQLITE_PATH não faz nada).
+    get_session_store().start()
+    yield
+    if aquecimento is not None and not aquecimento.done():
+        aquecimento.cancel()
+    await stop_jobs()
+    await get_session_store().stop()
+    stop_pool()
+    await close_async_client()
 
+app = FastAPI(lifespan=lifespan)
+
+# Antes do CORS na lista: o CORS fica por fora e as respostas 413 também levam os cabeçalhos dele.
+app.add_middleware(LimiteCorpoMiddleware, max_bytes=int(get_env_var("CORPO_MAX_BYTES", default=str(4 * 1024 * 1024))))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://tarefai-eta.vercel.app"],
@@ -21,22 +69,449 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/extract-tasks")
-def extract_tasks_endpoint(req: TextoRequest):
-    try:
-        if req.provedor == ProvedorEnum.spacy:
+@app.exception_handler(AdmissaoNegadaError)
+async def admissao_negada_handler(request: Request, exc: AdmissaoNegadaError):
+    return exc.resposta()
+
+def _admitir(request: Request, itens, max_caracteres: Optional[int] = None) -> Vaga:
+    """Passa a requisição pelo controle de admissão (tamanho, vagas do provedor e cota do cliente)."""
+    return get_controle_admissao().admitir(cliente_da_requisicao(request), itens, max_caracteres)
+
+@app.get("/health")
+def health():
+    """Liveness: o processo está de pé."""
+    return {"status": "ok"}
+
+@app.get("/metrics")
+def metrics():
+    """Métricas deste processo no formato texto do Prometheus (latência por etapa, respostas da Gemini, cache, pool)."""
+    return PlainTextResponse(REGISTRO.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _gauge_cache():
+    cache = get_result_cache()
+    if cache:
+        for chave, valor in cache.stats().items():
+            yield {"campo": chave}, valor
+
+def _gauge_pool():
+    pool = get_pool()
+    if pool is not None:
+        for chave, valor in pool.stats().items():
+            yield {"campo": chave}, valor
+
+REGISTRO.gauge("tarefai_cache", "Estado do cache de resultados (itens, hits, misses, evictions).", _gauge_cache)
+def _gauge_sessoes():
+    for chave, valor in get_session_store().stats().items():
+        yield {"campo": chave}, valor
+
+REGISTRO.gauge("tarefai_sessoes", "Sessões incrementais em memória (quantidade, bytes, expiradas, despejadas).", _gauge_sessoes)
+def _gauge_gemini():
+    from services.gemini_transporte import get_transporte
+    for chave, valor in get_transporte().stats().items():
+        if chave != "circuito":
+            yield {"campo": chave}, valor
+
+REGISTRO.gauge("tarefai_gemini_transporte", "Transporte da Gemini (circuit breaker, novas tentativas, hedges, chamadas em andamento).", _gauge_gemini)
+def _gauge_admissao():
+    stats = get_controle_admissao().stats()
+    for provedor, valor in stats["em_andamento"].items():
+        yield {"provedor": provedor}, valor
+
+REGISTRO.gauge("tarefai_admissao_em_andamento", "Extrações admitidas e ainda em andamento, por provedor.", _gauge_admissao)
+def _gauge_jobs():
+    fila = get_job_queue()
+    if fila is None:
+        return
+    stats = fila.stats()
+    for status in ("pendente", "processando", "concluido", "erro", "cancelado"):
+        yield {"status": status}, stats[status]
+
+REGISTRO.gauge("tarefai_jobs", "Jobs assíncronos na fila (SQLite), por status.", _gauge_jobs)
+REGISTRO.gauge("tarefai_spacy_pool", "Estado do pool de processos spaCy (fila, concluídos, rejeitados, timeouts).", _gauge_pool)
+
+@app.get("/ready")
+def ready():
+    """Readiness: só fica verdadeiro depois que o modelo spaCy foi carregado e aquecido. Inclui o relatório de startup."""
+    info = estado()
+    return JSONResponse(info, status_code=200 if info["pronto"] else 503)
+
+def _is_erro(resultado) -> bool:
+    return isinstance(resultado, list) and bool(resultado) and isinstance(resultado[0], dict) and "erro" in resultado[0]
+
+def _versao_cache(provedor: ProvedorEnum) -> str:
+    if provedor == ProvedorEnum.spacy:
+        return versao_cache()
+    from services.gemini_llm import VERSAO_CACHE
+    if provedor == ProvedorEnum.auto:
+        from services.router import CONFIANCA_MINIMA
+        return f"{versao_cache()}+{VERSAO_CACHE}/confianca-{CONFIANCA_MINIMA}"
+    return VERSAO_CACHE
+
+async def _cache_get(texto: str, provedor: ProvedorEnum):
+    cache = get_result_cache()
+    if not cache:
+        return None
+    with etapa(provedor.value, "cache"):
+        resultado = await cache.get_async(cache_key(texto, provedor.value, _versao_cache(provedor)))
+    CACHE_CONSULTAS.inc(provedor=provedor.value, resultado="miss" if resultado is None else "hit")
+    return resultado
+
+async def _cache_set(texto: str, provedor: ProvedorEnum, resultado) -> None:
+    cache = get_result_cache()
+    if cache and not _is_erro(resultado):
+        await cache.set_async(cache_key(texto, provedor.value, _versao_cache(provedor)), resultado)
+
+async def _extrair(texto: str, provedor: ProvedorEnum, roteamento: Optional[list] = None):
+    """
+    Roda o provedor escolhido, passando antes pelo cache de resultados.
+    No modo auto, `roteamento` (se informado) recebe qual provedor atendeu cada bloco de fala.
+    """
+    if provedor not in (ProvedorEnum.spacy, ProvedorEnum.gemini, ProvedorEnum.auto):
+        raise HTTPException(status_code=400, detail="Provedor inválido.")
+    resultado = await _cache_get(texto, provedor)
+    if resultado is not None:
+        return resultado
+    with etapa(provedor.value, "total"):
+        resultado = await _extrair_provedor(texto, provedor, roteamento)
+    if provedor == ProvedorEnum.gemini and _degradar_para_spacy(resultado):
+        # Resultado degradado não vai para o cache da Gemini.
+        if roteamento is not None:
+            roteamento.append({"bloco": None, "responsavel": None, "provedor": "spacy_fallback", "score": 0.0})
+        return await _extrair(texto, ProvedorEnum.spacy)
+    await _cache_set(texto, provedor, resultado)
+    return resultado
+
+GEMINI_FALLBACK_SPACY = get_env_var("GEMINI_FALLBACK_SPACY", default="false").lower() == "true"
+
+def _degradar_para_spacy(resultado) -> bool:
+    """Com GEMINI_FALLBACK_SPACY, um erro da Gemini com o circuit breaker aberto é atendido pelo spaCy."""
+    if not GEMINI_FALLBACK_SPACY or not _is_erro(resultado):
+        return False
+    from services.gemini_llm import gemini_indisponivel
+    return gemini_indisponivel()
+
+async def _extrair_provedor(texto: str, provedor: ProvedorEnum, roteamento: Optional[list]):
+    if provedor == ProvedorEnum.spacy:
+        pool = get_pool()
+        if pool is not None:
+            # Pool de processos: paralelismo real entre núcleos, sem disputar o GIL do app.
+            resultado = await pool.extract_tasks(texto)
+        else:
             from services.spacy_local import extract_tasks_with_spacy
-            resultado = extract_tasks_with_spacy(req.texto)
-        elif req.provedor == ProvedorEnum.gemini:
-            from services.gemini_llm import extract_tasks_with_gemini
-            resultado = extract_tasks_with_gemini(req.texto)
+            # spaCy é CPU-bound: roda no threadpool para não bloquear o event loop.
+            resultado = await run_in_threadpool(extract_tasks_with_spacy, texto)
+    elif provedor == ProvedorEnum.gemini:
+        from services.gemini_llm import extract_tasks_with_gemini_async
+        resultado = await extract_tasks_with_gemini_async(texto)
+    else:
+        from services.router import extract_tasks_auto
+        resultado, rotas = await extract_tasks_auto(texto)
+        if roteamento is not None:
+            roteamento.extend(rotas)
+    return resultado
+
+def _cabecalho_roteamento(roteamento: list) -> str:
+    """Resumo ASCII do roteamento do modo auto: bloco:provedor:score separados por vírgula."""
+    if not roteamento:
+        return "cache"
+    return ",".join(f"{r['bloco'] if r['bloco'] is not None else '*'}:{r['provedor']}:{r['score']}" for r in roteamento)
+
+def _cabecalho_tempos(tempos: list) -> dict:
+    """Cabeçalho Server-Timing com as etapas medidas na requisição (?debug_timings=1)."""
+    return {"Server-Timing": server_timing(resumir_tempos(tempos)) or "cache;dur=0"}
+
+@app.post("/extract-tasks", response_model=List[PessoaTarefas])
+async def extract_tasks_endpoint(
+    req: TextoRequest,
+    request: Request,
+    debug_timings: bool = Query(False, description="Devolve a duração de cada etapa no cabeçalho Server-Timing."),
+):
+    with _admitir(request, [(req.provedor.value, req.texto)]):
+        try:
+            roteamento = []
+            headers = {}
+            if debug_timings:
+                with coletar_tempos() as tempos:
+                    resultado = await _extrair(req.texto, req.provedor, roteamento)
+                headers.update(_cabecalho_tempos(tempos))
+            else:
+                resultado = await _extrair(req.texto, req.provedor, roteamento)
+            # Se resultado for erro (dict com 'erro'), levanta HTTPException
+            if _is_erro(resultado):
+                raise HTTPException(status_code=422, detail=resultado[0]["erro"])
+            if req.provedor == ProvedorEnum.auto or roteamento:
+                headers["X-Roteamento"] = _cabecalho_roteamento(roteamento)
+            # Resposta já pronta: o FastAPI não passa o resultado pelo jsonable_encoder nem pela validação do response_model.
+            return RespostaJSON(resultado, headers=headers or None)
+        except HTTPException:
+            raise
+        except PoolSaturadoError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except PoolTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+BATCH_MAX_ITENS = int(get_env_var("BATCH_MAX_ITENS", default="500"))
+SPACY_BATCH_N_PROCESS = int(get_env_var("SPACY_BATCH_N_PROCESS", default="1"))
+GEMINI_BATCH_CONCORRENCIA = int(get_env_var("GEMINI_BATCH_CONCORRENCIA", default="4"))
+
+def _item_lote(indice: int, resultado=None, erro: Exception = None) -> dict:
+    if erro is not None:
+        mensagem = str(erro) if isinstance(erro, (PoolSaturadoError, PoolTimeoutError)) else f"Erro interno: {str(erro)}"
+        return {"indice": indice, "resultado": None, "erro": mensagem}
+    if _is_erro(resultado):
+        return {"indice": indice, "resultado": None, "erro": resultado[0]["erro"]}
+    return {"indice": indice, "resultado": resultado, "erro": None}
+
+async def _lote_spacy(itens: List[TextoRequest], indices: List[int], respostas: list, batch_size: Optional[int], n_process: int) -> None:
+    textos = [itens[i].texto for i in indices]
+    pool = get_pool()
+    if pool is not None:
+        resultados = await asyncio.gather(*(pool.extract_tasks(texto) for texto in textos), return_exceptions=True)
+    else:
+        from services.spacy_local import extract_tasks_with_spacy_batch
+        try:
+            resultados = await run_in_threadpool(extract_tasks_with_spacy_batch, textos, batch_size, n_process)
+        except Exception as e:
+            resultados = [e] * len(textos)
+    for i, texto, resultado in zip(indices, textos, resultados):
+        if isinstance(resultado, Exception):
+            respostas[i] = _item_lote(i, erro=resultado)
         else:
-            raise HTTPException(status_code=400, detail="Provedor inválido.")
-        # Se resultado for erro (dict com 'erro'), levanta HTTPException
-        if isinstance(resultado, list) and resultado and isinstance(resultado[0], dict) and "erro" in resultado[0]:
-            raise HTTPException(status_code=422, detail=resultado[0]["erro"])
-        return resultado
-    except HTTPException:
-        raise
+            await _cache_set(texto, ProvedorEnum.spacy, resultado)
+            respostas[i] = _item_lote(i, resultado)
+
+async def _lote_gemini(itens: List[TextoRequest], indices: List[int], respostas: list) -> None:
+    from services.gemini_llm import extract_tasks_with_gemini_async
+    limite = asyncio.Semaphore(GEMINI_BATCH_CONCORRENCIA)
+
+    async def _um(i: int) -> None:
+        async with limite:
+            try:
+                resultado = await extract_tasks_with_gemini_async(itens[i].texto)
+            except Exception as e:
+                respostas[i] = _item_lote(i, erro=e)
+                return
+        if _degradar_para_spacy(resultado):
+            try:
+                respostas[i] = _item_lote(i, await _extrair(itens[i].texto, ProvedorEnum.spacy))
+            except Exception as e:
+                respostas[i] = _item_lote(i, erro=e)
+            return
+        await _cache_set(itens[i].texto, ProvedorEnum.gemini, resultado)
+        respostas[i] = _item_lote(i, resultado)
+
+    await asyncio.gather(*(_um(i) for i in indices))
+
+async def _lote_auto(itens: List[TextoRequest], indices: List[int], respostas: list) -> None:
+    async def _um(i: int) -> None:
+        try:
+            respostas[i] = _item_lote(i, await _extrair(itens[i].texto, ProvedorEnum.auto))
+        except Exception as e:
+            respostas[i] = _item_lote(i, erro=e)
+
+    await asyncio.gather(*(_um(i) for i in indices))
+
+@app.post("/extract-tasks/batch", response_model=List[ItemLote])
+async def extract_tasks_batch_endpoint(
+    itens: List[TextoRequest],
+    request: Request,
+    batch_size: Optional[int] = Query(None, ge=1, description="Tamanho do lote do nlp.pipe (spaCy)."),
+    n_process: Optional[int] = Query(None, ge=1, description="Processos usados pelo nlp.pipe (spaCy)."),
+    debug_timings: bool = Query(False, description="Devolve a duração somada de cada etapa no cabeçalho Server-Timing."),
+):
+    """
+    Extrai tarefas de vários textos numa requisição. Retorna um item por texto, na mesma ordem,
+    com o resultado ou a mensagem de erro daquele item.
+    """
+    if len(itens) > BATCH_MAX_ITENS:
+        raise HTTPException(status_code=413, detail=f"Máximo de {BATCH_MAX_ITENS} textos por lote.")
+    with _admitir(request, [(item.provedor.value, item.texto) for item in itens]):
+        if debug_timings:
+            with coletar_tempos() as tempos:
+                respostas = await _processar_lote(itens, batch_size, n_process)
+            return RespostaJSON(respostas, headers=_cabecalho_tempos(tempos))
+        return RespostaJSON(await _processar_lote(itens, batch_size, n_process))
+
+async def _processar_lote(itens: List[TextoRequest], batch_size: Optional[int], n_process: Optional[int]) -> list:
+    respostas: list = [None] * len(itens)
+    pendentes = {ProvedorEnum.spacy: [], ProvedorEnum.gemini: [], ProvedorEnum.auto: []}
+    for i, item in enumerate(itens):
+        resultado = await _cache_get(item.texto, item.provedor)
+        if resultado is not None:
+            respostas[i] = _item_lote(i, resultado)
+        else:
+            pendentes[item.provedor].append(i)
+    n_process = min(n_process or SPACY_BATCH_N_PROCESS, os.cpu_count() or 1)
+    lotes = []
+    if pendentes[ProvedorEnum.spacy]:
+        lotes.append(_lote_spacy(itens, pendentes[ProvedorEnum.spacy], respostas, batch_size, n_process))
+    if pendentes[ProvedorEnum.gemini]:
+        lotes.append(_lote_gemini(itens, pendentes[ProvedorEnum.gemini], respostas))
+    if pendentes[ProvedorEnum.auto]:
+        lotes.append(_lote_auto(itens, pendentes[ProvedorEnum.auto], respostas))
+    await asyncio.gather(*lotes)
+    return respostas
+
+
+class FormatoStream(str, Enum):
+    ndjson = "ndjson"
+    sse = "sse"
+
+def _formatar_evento(evento: dict, formato: FormatoStream) -> str:
+    dados = json.dumps(evento, ensure_ascii=False)
+    if formato == FormatoStream.sse:
+        return f"event: {evento['evento']}\ndata: {dados}\n\n"
+    return dados + "\n"
+
+def _eventos_do_resultado(resultado: list) -> List[dict]:
+    if _is_erro(resultado):
+        return [{"evento": "erro", "dados": resultado[0]}]
+    return [{"evento": "responsavel", "dados": pessoa} for pessoa in resultado] + [{"evento": "fim", "dados": resultado}]
+
+async def _eventos_auto(texto: str) -> AsyncIterator[dict]:
+    # O roteamento depende da pontuação de todos os blocos, então o modo auto não é incremental.
+    for evento in _eventos_do_resultado(await _extrair(texto, ProvedorEnum.auto)):
+        yield evento
+
+# Mesmo ajuste do nlp.pipe no streaming sem pool: blocos de fala por ida ao pool.
+SPACY_STREAM_PASSO = int(get_env_var("SPACY_STREAM_BATCH_SIZE", default="1"))
+
+async def _eventos(req: TextoRequest) -> AsyncIterator[dict]:
+    """Eventos de extração em streaming; no evento "fim" o resultado completo vai para o cache."""
+    em_cache = await _cache_get(req.texto, req.provedor)
+    if em_cache is not None:
+        for evento in _eventos_do_resultado(em_cache):
+            yield evento
+        return
+    if req.provedor == ProvedorEnum.auto:
+        eventos = _eventos_auto(req.texto)
+    elif req.provedor == ProvedorEnum.spacy and get_pool() is not None:
+        # Com o pool, o modelo não é carregado no processo web: os blocos vão para os workers, com a fila e o timeout dele.
+        eventos = get_pool().stream_tasks(req.texto, passo=SPACY_STREAM_PASSO)
+    elif req.provedor == ProvedorEnum.spacy:
+        from services.spacy_local import stream_tasks_with_spacy
+        eventos = iterate_in_threadpool(stream_tasks_with_spacy(req.texto))
+    else:
+        from services.gemini_llm import stream_tasks_with_gemini
+        eventos = stream_tasks_with_gemini(req.texto)
+    try:
+        async for evento in eventos:
+            if evento["evento"] == "fim":
+                await _cache_set(req.texto, req.provedor, evento["dados"])
+            yield evento
+    except (PoolSaturadoError, PoolTimeoutError) as e:
+        yield {"evento": "erro", "dados": {"erro": str(e)}}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
\ No newline at end of file
+        yield {"evento": "erro", "dados": {"erro": f"Erro interno: {str(e)}"}}
+
+@app.post("/extract-tasks/stream")
+async def extract_tasks_stream_endpoint(req: TextoRequest, request: Request, formato: FormatoStream = FormatoStream.ndjson):
+    """
+    Variante em streaming de /extract-tasks. Envia um evento por responsável assim que o bloco de fala dele é processado
+    ("responsavel"), um "patch" com os itens novos quando a pessoa volta a falar e, no fim, o resultado agrupado ("fim").
+    Formatos: NDJSON (padrão) ou SSE (?formato=sse).
+    """
+    vaga = _admitir(request, [(req.provedor.value, req.texto)])
+
+    async def corpo():
+        async for evento in _eventos(req):
+            yield _formatar_evento(evento, formato)
+    media_type = "text/event-stream" if formato == FormatoStream.sse else "application/x-ndjson"
+    # A vaga fica ocupada até o fim do streaming (ou até o cliente desconectar, mesmo antes do corpo começar).
+    return StreamingComVaga(corpo(), vaga, media_type=media_type)
+
+
+class SessaoRequest(BaseModel):
+    texto: str = ""
+
+async def _resultado_sessao(sessao: Sessao) -> dict:
+    try:
+        return await sessao.atualizar()
+    except PoolSaturadoError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except PoolTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+async def _sessao(operacao, *args) -> Sessao:
+    try:
+        return await operacao(*args)
+    except SessaoNaoEncontradaError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except SessaoMuitoGrandeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@app.post("/sessions", status_code=201, response_model=ResultadoSessao)
+async def criar_sessao_endpoint(request: Request, req: Optional[SessaoRequest] = None):
+    """
+    Cria uma sessão de transcrição incremental (spaCy), opcionalmente já com um trecho inicial.
+    Retorna {"sessao", "resultado", "blocos", "reprocessados"}; use o id em /sessions/{id}/append.
+    """
+    texto = req.texto if req else ""
+    with _admitir(request, [(ProvedorEnum.spacy.value, texto)]):
+        sessao = await _sessao(get_session_store().criar_async, texto)
+        async with sessao.lock:
+            return RespostaJSON(await _resultado_sessao(sessao), status_code=201)
+
+@app.post("/sessions/{sessao_id}/append", response_model=ResultadoSessao)
+async def anexar_sessao_endpoint(sessao_id: str, req: SessaoRequest, request: Request):
+    """Acrescenta linhas à transcrição e devolve o resultado atual. Só os blocos de fala novos ou alterados são reprocessados."""
+    store = get_session_store()
+    sessao = await _sessao(store.obter_async, sessao_id)
+    # A cota é cobrada pelo trecho novo, que é o que vai para o spaCy.
+    with _admitir(request, [(ProvedorEnum.spacy.value, req.texto)]):
+        # Anexos à mesma sessão são processados um de cada vez, na ordem de chegada.
+        async with sessao.lock:
+            sessao = await _sessao(store.anexar_async, sessao_id, req.texto)
+            return RespostaJSON(await _resultado_sessao(sessao))
+
+@app.get("/sessions/{sessao_id}", response_model=ResultadoSessao)
+async def obter_sessao_endpoint(sessao_id: str):
+    sessao = await _sessao(get_session_store().obter_async, sessao_id)
+    async with sessao.lock:
+        return RespostaJSON(await _resultado_sessao(sessao))
+
+@app.delete("/sessions/{sessao_id}", status_code=204)
+async def remover_sessao_endpoint(sessao_id: str):
+    await _sessao(get_session_store().remover_async, sessao_id)
+
+def _fila_jobs():
+    fila = get_job_queue()
+    if fila is None:
+        raise HTTPException(status_code=503, detail="Fila de jobs não iniciada.")
+    return fila
+
+async def _job(operacao, *args) -> dict:
+    try:
+        return await operacao(*args)
+    except JobNaoEncontradoError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/jobs", status_code=202)
+async def criar_job_endpoint(req: TextoRequest, request: Request):
+    """
+    Enfileira a extração de uma transcrição grande (até JOBS_MAX_CARACTERES) e responde na hora com {"id", "status"}.
+    Acompanhe em GET /jobs/{id}.
+    """
+    fila = _fila_jobs()
+    # Cobra a cota do cliente, mas não ocupa vaga: quem limita a concorrência dos jobs são os workers da fila.
+    _admitir(request, [(req.provedor.value, req.texto)], max_caracteres=fila.max_caracteres).liberar()
+    try:
+        job = await fila.criar_async(req.texto, req.provedor.value)
+    except FilaCheiaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return JSONResponse({"id": job["id"], "status": job["status"]}, status_code=202, headers={"Location": f"/jobs/{job['id']}"})
+
+@app.get("/jobs/{job_id}", response_model=Job)
+async def obter_job_endpoint(job_id: str):
+    """Status, progresso (blocos de fala feitos/total) e, quando concluído, o resultado do job."""
+    return RespostaJSON(await _job(_fila_jobs().obter_async, job_id))
+
+@app.delete("/jobs/{job_id}", response_model=Job)
+async def cancelar_job_endpoint(job_id: str):
+    """Cancela o job se ainda estiver pendente ou em andamento e devolve o estado final dele."""
+    return RespostaJSON(await _job(_fila_jobs().cancelar_async, job_id))
@@ -1,9 +1,43 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class TarefaAFazer(BaseModel):
     """Representa uma tarefa a fazer, com prazo, data normalizada e descrição opcional."""
     task: str
     prazo: Optional[str] = None
     data_prazo: Optional[str] = None
-    descricao: Optional[str] = None
\ No newline at end of file
+    descricao: Optional[str] = None
+
+class PessoaTarefas(BaseModel):
+    """Tarefas feitas e a fazer de um responsável: um item da resposta de extração."""
+    responsavel: str
+    feitas: List[str] = []
+    a_fazer: List[TarefaAFazer] = []
+
+class ItemLote(BaseModel):
+    """Um item da resposta de /extract-tasks/batch: o resultado ou o erro do texto de mesmo índice."""
+    indice: int
+    resultado: Optional[List[PessoaTarefas]] = None
+    erro: Optional[str] = None
+
+class ResultadoSessao(BaseModel):
+    """Resultado atual de uma sessão incremental."""
+    sessao: str
+    resultado: List[PessoaTarefas]
+    blocos: int
+    reprocessados: int
+
+class ProgressoJob(BaseModel):
+    feitos: int
+    total: int
+
+class Job(BaseModel):
+    """Estado de um job assíncrono; `resultado` só vem quando o status é "concluido"."""
+    id: str
+    provedor: str
+    status: str
+    progresso: ProgressoJob
+    resultado: Optional[List[PessoaTarefas]] = None
+    erro: Optional[str] = None
+    criado_em: str
+    atualizado_em: str
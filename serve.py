@@ -0,0 +1,117 @@
+"""
+Launcher de produção com pré-fork.
+
+Carrega e aquece o modelo spaCy no processo pai, congela o heap (gc.freeze) e só então faz fork dos workers.
+Os workers herdam as páginas do modelo por copy-on-write, então N workers não custam N cópias do pt_core_news_lg.
+
+Uso: python serve.py   (configurável por HOST, PORT, WEB_CONCURRENCY e LOG_LEVEL)
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from utils.config import get_env_var
+from utils.logging import setup_logging
+
+setup_logging()
+logger = logging.getLogger("serve")
+
+def _abrir_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+# Só conexões vindas destes endereços podem trocar o IP do cliente pelo X-Forwarded-For. Com "*", o uvicorn usa a
+# entrada mais à esquerda, que o próprio cliente escreve, e o balde de tokens por IP deixa de valer.
+FORWARDED_ALLOW_IPS = get_env_var("FORWARDED_ALLOW_IPS", default="127.0.0.1")
+
+def _rodar_worker(app, sock: socket.socket, log_level: str) -> None:
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on", proxy_headers=True, forwarded_allow_ips=FORWARDED_ALLOW_IPS)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def _fork_worker(app, sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            _rodar_worker(app, sock, log_level)
+        finally:
+            os._exit(0)
+    return pid
+
+def main() -> None:
+    inicio = time.perf_counter()
+    host = get_env_var("HOST", default="0.0.0.0")
+    port = int(get_env_var("PORT", default="8000"))
+    workers = int(get_env_var("WEB_CONCURRENCY", default="1"))
+    log_level = get_env_var("LOG_LEVEL", default="info")
+
+    # Importa o app e carrega o modelo antes do fork para que as páginas sejam compartilhadas.
+    from main import app
+    from services.warmup import aquecer_modelo, registrar_tempo, estado
+    # Com SPACY_POOL_WORKERS > 0 o modelo vive nos workers do pool de processos, não no app.
+    pool_workers = int(get_env_var("SPACY_POOL_WORKERS", default="0"))
+    usa_pool = pool_workers > 0
+    if usa_pool and workers > 1:
+        # O pool é criado no lifespan de cada worker web: não dá para compartilhá-lo pelo fork.
+        from services.spacy_pool import workers_do_processo
+        logger.warning(
+            "WEB_CONCURRENCY=%s com SPACY_POOL_WORKERS=%s: cada worker web sobe o seu pool, com a sua cópia do modelo "
+            "no forkserver (%s cópias) e %s processos spaCy cada. Para economizar memória, prefira WEB_CONCURRENCY=1 "
+            "com o pool.", workers, pool_workers, workers, workers_do_processo(),
+        )
+    if get_env_var("SPACY_PRELOAD", default="true").lower() == "true" and not usa_pool:
+        aquecer_modelo()
+    # Tira os objetos já carregados do alcance do GC: sem isso a coleta toca nos refcounts e quebra o copy-on-write.
+    gc.freeze()
+    registrar_tempo("ate_fork_s", time.perf_counter() - inicio)
+    logger.info("Startup pré-fork concluído: %s", estado()["tempos"])
+
+    sock = _abrir_socket(host, port)
+    if workers <= 1:
+        logger.info("Servindo em %s:%s com 1 worker (pid %s)", host, port, os.getpid())
+        _rodar_worker(app, sock, log_level)
+        return
+
+    filhos = {_fork_worker(app, sock, log_level) for _ in range(workers)}
+    logger.info("Servindo em %s:%s com %s workers: %s", host, port, workers, sorted(filhos))
+    encerrando = False
+
+    def _encerrar(signum, frame):
+        nonlocal encerrando
+        encerrando = True
+        for pid in filhos:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _encerrar)
+    signal.signal(signal.SIGINT, _encerrar)
+
+    while filhos:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        filhos.discard(pid)
+        if not encerrando:
+            logger.warning("Worker %s terminou (status %s). Subindo outro.", pid, status)
+            filhos.add(_fork_worker(app, sock, log_level))
+    sock.close()
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
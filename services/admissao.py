@@ -0,0 +1,216 @@
+"""
+Controle de admissão das extrações: decide, antes de qualquer trabalho, se a requisição entra.
+
+- Tamanho: textos acima de TEXTO_MAX_CARACTERES são recusados com 413 antes do separar_falas e do spaCy
+  (e corpos acima de CORPO_MAX_BYTES, pelo Content-Length, antes mesmo do JSON ser lido).
+- Vagas por provedor: no máximo ADMISSAO_MAX_<PROVEDOR> extrações em andamento; acima disso, 503 na hora
+  com Retry-After, em vez de deixar a fila e a latência crescerem sem limite.
+- Balde de tokens por cliente (IP da conexão ou o cabeçalho gravado pelo proxy, ADMISSAO_CLIENTE_HEADER): cada requisição custa
+  peso do provedor x (1 + caracteres / ADMISSAO_CARACTERES_POR_UNIDADE); sem saldo, 429 com Retry-After.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from slowapi.util import get_remote_address
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+
+from utils.config import get_env_var
+from utils.metrics import REGISTRO
+
+logger = logging.getLogger(__name__)
+
+ADMISSAO_REJEICOES = REGISTRO.contador("tarefai_admissao_rejeicoes_total", "Requisições recusadas pelo controle de admissão.", ("motivo", "provedor"))
+
+class AdmissaoNegadaError(Exception):
+    def __init__(self, status_code: int, mensagem: str, retry_after: Optional[float] = None):
+        super().__init__(mensagem)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def resposta(self) -> JSONResponse:
+        headers = {"Retry-After": str(max(1, math.ceil(self.retry_after)))} if self.retry_after is not None else None
+        return JSONResponse({"detail": str(self)}, status_code=self.status_code, headers=headers)
+
+class Vaga:
+    """Vaga de extração em andamento; liberada ao sair do `with` (ou por liberar(), no streaming)."""
+
+    def __init__(self, controle: "ControleAdmissao", provedores: Tuple[str, ...]):
+        self._controle = controle
+        self._provedores = provedores
+        self._liberada = False
+
+    def liberar(self) -> None:
+        if not self._liberada:
+            self._liberada = True
+            self._controle._liberar(self._provedores)
+
+    def __enter__(self) -> "Vaga":
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar()
+        return False
+
+class StreamingComVaga(StreamingResponse):
+    """
+    StreamingResponse que segura a vaga de admissão enquanto é enviada e a libera no fim, mesmo que o corpo nem
+    comece a ser gerado (cliente que desconecta antes do http.response.start): o finally do gerador não cobre isso.
+    """
+
+    def __init__(self, conteudo, vaga: Vaga, **kwargs):
+        super().__init__(conteudo, **kwargs)
+        self.vaga = vaga
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.vaga.liberar()
+
+class ControleAdmissao:
+    def __init__(self, max_caracteres: int = 100_000, capacidade: float = 100.0, taxa: float = 2.0,
+                 caracteres_por_unidade: int = 2000, pesos: Dict[str, float] = None,
+                 max_em_andamento: Dict[str, int] = None, max_clientes: int = 10_000, habilitado: bool = True):
+        self.max_caracteres = max_caracteres
+        self.capacidade = capacidade
+        self.taxa = taxa
+        self.caracteres_por_unidade = caracteres_por_unidade
+        self.pesos = pesos or {"spacy": 1.0, "gemini": 4.0, "auto": 2.0}
+        self.max_em_andamento = max_em_andamento or {"spacy": 16, "gemini": 32, "auto": 16}
+        self.max_clientes = max_clientes
+        self.habilitado = habilitado
+        self.em_andamento = {provedor: 0 for provedor in self.max_em_andamento}
+        self.admitidas = 0
+        self.rejeitadas: Dict[str, int] = {"tamanho": 0, "cota": 0, "fila": 0}
+        # cliente -> (tokens, instante da última recarga), em ordem LRU.
+        self._baldes: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def custo(self, provedor: str, caracteres: int) -> float:
+        return self.pesos.get(provedor, 1.0) * (1 + caracteres / self.caracteres_por_unidade)
+
+    def checar_tamanho(self, texto: str, provedor: str = "", max_caracteres: Optional[int] = None) -> None:
+        max_caracteres = max_caracteres or self.max_caracteres
+        if len(texto) > max_caracteres:
+            self._rejeitar("tamanho", provedor)
+            raise AdmissaoNegadaError(413, f"Texto com mais de {max_caracteres} caracteres.")
+
+    def _rejeitar(self, motivo: str, provedor: str) -> None:
+        self.rejeitadas[motivo] += 1
+        ADMISSAO_REJEICOES.inc(motivo=motivo, provedor=provedor)
+
+    def admitir(self, cliente: str, itens: Iterable[Tuple[str, str]], max_caracteres: Optional[int] = None) -> Vaga:
+        """
+        Admite uma requisição com os (provedor, texto) informados ou levanta AdmissaoNegadaError.
+        Ocupa uma vaga de cada provedor envolvido até a Vaga ser liberada.
+        `max_caracteres` troca o limite de tamanho (os jobs assíncronos aceitam textos maiores).
+        """
+        itens = list(itens)
+        for provedor, texto in itens:
+            self.checar_tamanho(texto, provedor, max_caracteres)
+        provedores = tuple(sorted({provedor for provedor, _ in itens}))
+        if not self.habilitado:
+            return Vaga(self, ())
+        custo = min(self.capacidade, sum(self.custo(provedor, len(texto)) for provedor, texto in itens))
+        with self._lock:
+            # Vagas primeiro: uma recusa por fila cheia não gasta o saldo do cliente.
+            for provedor in provedores:
+                if self.em_andamento.get(provedor, 0) >= self.max_em_andamento.get(provedor, math.inf):
+                    self._rejeitar("fila", provedor)
+                    raise AdmissaoNegadaError(503, f"Muitas extrações com {provedor} em andamento. Tente novamente em instantes.", retry_after=1)
+            agora = time.monotonic()
+            tokens, ultima = self._baldes.pop(cliente, (self.capacidade, agora))
+            tokens = min(self.capacidade, tokens + (agora - ultima) * self.taxa)
+            if tokens < custo:
+                self._baldes[cliente] = (tokens, agora)
+                self._rejeitar("cota", ",".join(provedores))
+                raise AdmissaoNegadaError(429, "Limite de uso excedido. Tente novamente mais tarde.", retry_after=(custo - tokens) / self.taxa)
+            self._baldes[cliente] = (tokens - custo, agora)
+            while len(self._baldes) > self.max_clientes:
+                self._baldes.popitem(last=False)
+            for provedor in provedores:
+                self.em_andamento[provedor] = self.em_andamento.get(provedor, 0) + 1
+            self.admitidas += 1
+        return Vaga(self, provedores)
+
+    def _liberar(self, provedores: Tuple[str, ...]) -> None:
+        with self._lock:
+            for provedor in provedores:
+                self.em_andamento[provedor] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "habilitado": self.habilitado,
+                "admitidas": self.admitidas,
+                "rejeitadas": dict(self.rejeitadas),
+                "em_andamento": dict(self.em_andamento),
+                "max_em_andamento": dict(self.max_em_andamento),
+                "clientes": len(self._baldes),
+            }
+
+# Cabeçalho com o IP do cliente gravado pelo proxy da frente (ex.: Fly-Client-IP no Fly.io).
+CLIENTE_HEADER = get_env_var("ADMISSAO_CLIENTE_HEADER", default="")
+
+def cliente_da_requisicao(request: Request, header: Optional[str] = None) -> str:
+    """
+    Identifica o cliente do balde de tokens. Com ADMISSAO_CLIENTE_HEADER, usa o valor que o proxy grava nele
+    (no X-Forwarded-For, o último salto, que é o que o proxy acrescentou); sem ele, o IP da conexão, que o uvicorn
+    só troca pelo X-Forwarded-For quando a conexão vem de FORWARDED_ALLOW_IPS. A entrada mais à esquerda do
+    X-Forwarded-For nunca é usada: quem escreve é o cliente, e cada valor inventado ganharia um balde cheio.
+    """
+    header = CLIENTE_HEADER if header is None else header
+    if header:
+        valor = request.headers.get(header, "")
+        if header.lower() == "x-forwarded-for":
+            valor = valor.rsplit(",", 1)[-1]
+        if valor.strip():
+            return valor.strip()
+    return get_remote_address(request)
+
+class LimiteCorpoMiddleware:
+    """Recusa com 413, pelo Content-Length, corpos acima de max_bytes antes de o JSON ser lido."""
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for nome, valor in scope["headers"]:
+                if nome == b"content-length":
+                    if valor.isdigit() and int(valor) > self.max_bytes:
+                        ADMISSAO_REJEICOES.inc(motivo="tamanho", provedor="")
+                        resposta = JSONResponse({"detail": f"Corpo da requisição acima de {self.max_bytes} bytes."}, status_code=413)
+                        await resposta(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+_controle: Optional[ControleAdmissao] = None
+
+def get_controle_admissao() -> ControleAdmissao:
+    """
+    Retorna o controle de admissão do processo, configurado por ADMISSAO_ENABLED, TEXTO_MAX_CARACTERES,
+    ADMISSAO_CAPACIDADE, ADMISSAO_TAXA, ADMISSAO_CARACTERES_POR_UNIDADE, ADMISSAO_PESO_<PROVEDOR>
+    e ADMISSAO_MAX_<PROVEDOR>.
+    """
+    global _controle
+    if _controle is None:
+        provedores = (("spacy", "1", "16"), ("gemini", "4", "32"), ("auto", "2", "16"))
+        _controle = ControleAdmissao(
+            max_caracteres=int(get_env_var("TEXTO_MAX_CARACTERES", default="100000")),
+            capacidade=float(get_env_var("ADMISSAO_CAPACIDADE", default="100")),
+            taxa=float(get_env_var("ADMISSAO_TAXA", default="2")),
+            caracteres_por_unidade=int(get_env_var("ADMISSAO_CARACTERES_POR_UNIDADE", default="2000")),
+            pesos={p: float(get_env_var(f"ADMISSAO_PESO_{p.upper()}", default=peso)) for p, peso, _ in provedores},
+            max_em_andamento={p: int(get_env_var(f"ADMISSAO_MAX_{p.upper()}", default=maximo)) for p, _, maximo in provedores},
+            habilitado=get_env_var("ADMISSAO_ENABLED", default="true").lower() == "true",
+        )
+        logger.info("Controle de admissão iniciado: %s", _controle.stats())
+    return _controle
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from services.validator import postprocess_tasks
+from utils.config import get_env_var
+
+logger = logging.getLogger(__name__)
+
+def normalizar_texto(texto: str) -> str:
+    """
+    Normaliza o texto para a chave do cache sem mudar o resultado da extração:
+    Unicode NFC, quebras de linha unificadas e espaços removidos do fim das linhas e das pontas.
+    """
+    texto = unicodedata.normalize("NFC", texto).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(linha.rstrip() for linha in texto.split("\n")).strip()
+
+def cache_key(texto: str, provedor: str, versao: str) -> str:
+    """Chave do cache: hash do texto normalizado + provedor + versão do modelo/prompt."""
+    base = "\x1f".join([provedor, versao, normalizar_texto(texto)])
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+def _sem_datas(resultado: List[Dict[str, Any]]) -> str:
+    """Serializa o resultado guardando só a expressão de prazo; data_prazo é resolvida de novo a cada leitura."""
+    bruto = []
+    for pessoa in resultado:
+        pessoa = dict(pessoa)
+        if "a_fazer" in pessoa:
+            pessoa["a_fazer"] = [{**tarefa, "data_prazo": ""} for tarefa in pessoa["a_fazer"]]
+        bruto.append(pessoa)
+    return json.dumps(bruto, ensure_ascii=False)
+
+class ResultCache:
+    """
+    Cache de resultados de extração: LRU em memória com TTL e, opcionalmente, uma camada persistente em SQLite.
+    Guarda os prazos como expressões ("amanhã", "sexta-feira") e resolve data_prazo na leitura,
+    para que uma resposta em cache não fique com datas vencidas de um dia para o outro.
+    Os endpoints usam get_async/set_async: com a camada SQLite, a consulta vai para o threadpool e um disco lento
+    ou um arquivo travado não seguram o event loop.
+    """
+
+    def __init__(self, max_itens: int = 1024, ttl: float = 86400, sqlite_path: Optional[str] = None):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._memoria: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+        self.evictions = 0
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA busy_timeout=5000")
+            self._db.execute("CREATE TABLE IF NOT EXISTS resultados (chave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira_em REAL NOT NULL)")
+            self._db.execute("DELETE FROM resultados WHERE expira_em < ?", (time.time(),))
+            self._db.commit()
+
+    def _guardar_memoria(self, chave: str, valor: str, expira_em: float) -> None:
+        self._memoria[chave] = (valor, expira_em)
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens:
+            self._memoria.popitem(last=False)
+            self.evictions += 1
+
+    def _buscar(self, chave: str) -> Optional[str]:
+        agora = time.time()
+        with self._lock:
+            item = self._memoria.get(chave)
+            if item is not None:
+                valor, expira_em = item
+                if expira_em >= agora:
+                    self._memoria.move_to_end(chave)
+                    self.hits_memoria += 1
+                    return valor
+                del self._memoria[chave]
+            if self._db is not None:
+                linha = self._db.execute("SELECT valor, expira_em FROM resultados WHERE chave = ?", (chave,)).fetchone()
+                if linha is not None:
+                    valor, expira_em = linha
+                    if expira_em >= agora:
+                        self._guardar_memoria(chave, valor, expira_em)
+                        self.hits_disco += 1
+                        return valor
+                    self._db.execute("DELETE FROM resultados WHERE chave = ?", (chave,))
+                    self._db.commit()
+            self.misses += 1
+            return None
+
+    def get(self, chave: str, base_date=None) -> Optional[List[Dict[str, Any]]]:
+        """Retorna uma cópia do resultado em cache, com data_prazo resolvida em relação a hoje (ou base_date)."""
+        valor = self._buscar(chave)
+        if valor is None:
+            return None
+        return postprocess_tasks(json.loads(valor), base_date=base_date)
+
+    def set(self, chave: str, resultado: List[Dict[str, Any]]) -> None:
+        valor = _sem_datas(resultado)
+        expira_em = time.time() + self.ttl
+        with self._lock:
+            self._guardar_memoria(chave, valor, expira_em)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO resultados (chave, valor, expira_em) VALUES (?, ?, ?)", (chave, valor, expira_em))
+                self._db.commit()
+
+    async def get_async(self, chave: str, base_date=None) -> Optional[List[Dict[str, Any]]]:
+        return await self._fora_do_loop(self.get, chave, base_date)
+
+    async def set_async(self, chave: str, resultado: List[Dict[str, Any]]) -> None:
+        await self._fora_do_loop(self.set, chave, resultado)
+
+    async def _fora_do_loop(self, operacao, *args):
+        # Só na memória a consulta é instantânea e não vale o salto para o threadpool.
+        if self._db is None:
+            return operacao(*args)
+        return await run_in_threadpool(operacao, *args)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memoria.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM resultados")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "itens_memoria": len(self._memoria),
+                "max_itens": self.max_itens,
+                "hits_memoria": self.hits_memoria,
+                "hits_disco": self.hits_disco,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "persistente": self._db is not None,
+            }
+
+_cache: Optional[ResultCache] = None
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Retorna o cache do processo, configurado por CACHE_ENABLED, CACHE_MAX_ITENS, CACHE_TTL_SEGUNDOS e CACHE_SQLITE_PATH."""
+    global _cache
+    if get_env_var("CACHE_ENABLED", default="true").lower() != "true":
+        return None
+    if _cache is None:
+        _cache = ResultCache(
+            max_itens=int(get_env_var("CACHE_MAX_ITENS", default="1024")),
+            ttl=float(get_env_var("CACHE_TTL_SEGUNDOS", default="86400")),
+            sqlite_path=get_env_var("CACHE_SQLITE_PATH") or None,
+        )
+        logger.info("Cache de resultados iniciado: %s", _cache.stats())
+    return _cache
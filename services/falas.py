@@ -0,0 +1,81 @@
+import re
+import logging
+from datetime import datetime
+from typing import List, Dict, Any
+from services.lexico import NOMES_EQUIPE, APELIDOS, lexico_atual  # noqa: F401
+from services.validator import postprocess_tasks
+
+logger = logging.getLogger(__name__)
+
+# Funções de texto puro (sem spaCy): podem ser usadas por qualquer provedor sem carregar o modelo.
+# NOMES_EQUIPE e APELIDOS vêm do léxico, recarregável de LEXICO_PATH; reexportados aqui.
+
+def normalize_nome(nome: str) -> str:
+    """Normaliza nomes e apelidos conhecidos para nomes completos e capitalizados. Não agrupa nomes diferentes."""
+    # Só normaliza apelidos conhecidos, não nomes diferentes
+    return lexico_atual().normalizar_nome(nome.strip())
+
+# Regex: início de linha, possíveis espaços, nome (letra maiúscula/acento), dois pontos
+_INICIO_FALA = re.compile(r'(?m)^[ \t]*([A-ZÁÉÍÓÚÂÊÔÃÕÇ][\wáéíóúâêôãõç\s]*)\s*:')
+
+def separar_falas(texto: str) -> List[Dict[str, str]]:
+    """Separa o texto em blocos de fala por participante, tolerando espaços e quebras de linha."""
+    blocos = _INICIO_FALA.split(texto)
+    falas = []
+    i = 1
+    while i < len(blocos):
+        nome = blocos[i].strip()
+        fala = blocos[i+1].strip() if i+1 < len(blocos) else ""
+        falas.append({"responsavel": normalize_nome(nome), "fala": fala})
+        i += 2
+    if not falas:
+        logger.warning(f"Nenhuma fala separada! Texto: {texto[:200]}")
+    else:
+        logger.debug(f"Falas separadas: {[f['responsavel'] for f in falas]}")
+    return falas
+
+def texto_antes_das_falas(texto: str) -> str:
+    """Trecho sem responsável antes da primeira fala (cabeçalho, pauta...), que separar_falas descarta."""
+    return _INICIO_FALA.split(texto, maxsplit=1)[0].strip()
+
+def agrupar_por_pessoa(lista_falas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Agrupa tarefas feitas e a fazer por responsável, sem misturar nomes diferentes."""
+    agrupado = {}
+    for item in lista_falas:
+        nome = item["responsavel"]
+        if nome not in agrupado:
+            agrupado[nome] = {"responsavel": nome, "feitas": [], "a_fazer": []}
+        agrupado[nome]["feitas"].extend(item["feitas"])
+        agrupado[nome]["a_fazer"].extend(item["a_fazer"])
+    # Debug: print agrupamento se houver nomes diferentes agrupados
+    if len(agrupado) != len(lista_falas):
+        logger.debug(f"Agrupamento de responsáveis: {list(agrupado.keys())}")
+    return list(agrupado.values())
+
+class AgrupadorIncremental:
+    """
+    Versão incremental de agrupar_por_pessoa para respostas em streaming.
+    Cada bloco adicionado gera um evento: "responsavel" na primeira vez que a pessoa aparece
+    e "patch" (só com os itens novos) quando ela volta a aparecer.
+    """
+
+    def __init__(self, base_date: datetime = None):
+        self.base_date = base_date or datetime.now()
+        self._agrupado: Dict[str, Dict[str, Any]] = {}
+
+    def adicionar(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        nome = item["responsavel"]
+        novo = postprocess_tasks([{
+            "responsavel": nome,
+            "feitas": list(item.get("feitas") or []),
+            "a_fazer": [dict(tarefa) for tarefa in item.get("a_fazer") or []],
+        }], base_date=self.base_date)[0]
+        if nome not in self._agrupado:
+            self._agrupado[nome] = {"responsavel": nome, "feitas": list(novo["feitas"]), "a_fazer": list(novo["a_fazer"])}
+            return {"evento": "responsavel", "dados": novo}
+        self._agrupado[nome]["feitas"].extend(novo["feitas"])
+        self._agrupado[nome]["a_fazer"].extend(novo["a_fazer"])
+        return {"evento": "patch", "dados": novo}
+
+    def resultado(self) -> List[Dict[str, Any]]:
+        return list(self._agrupado.values())
@@ -1,81 +1,355 @@
+import asyncio
 import os
+import hashlib
 import requests
-from typing import List, Dict, Any
+import httpx
+from typing import List, Dict, Any, AsyncIterator, Optional
 import json
 import re
 from dotenv import load_dotenv
 import logging
+from pydantic import TypeAdapter, ValidationError
+from models.task import PessoaTarefas
+from services.gemini_transporte import get_transporte, CircuitoAbertoError
+from services.falas import AgrupadorIncremental, separar_falas, texto_antes_das_falas, agrupar_por_pessoa
 from services.validator import postprocess_tasks
 from utils.config import get_env_var
 from utils.logging import setup_logging
+from utils.http_client import get_async_client
+from utils.json_stream import JSONArrayStreamParser
+from utils.metrics import etapa, GEMINI_RESPOSTAS, GEMINI_JSON_INVALIDO, GEMINI_TOKENS, TEXTOS_PROCESSADOS, FALANTES_PROCESSADOS
 
 setup_logging()
 
 logger = logging.getLogger(__name__)
 
-PROMPT_TEMPLATE = """
-Analise o texto abaixo, identifique para cada pessoa:
-- O que foi feito
-- O que vai ser feito
-
-Para cada tarefa a fazer, retorne um objeto com:
-- task: nome da tarefa
-- prazo: expressão do prazo (ex: amanhã, sexta-feira, fim do dia)
-- data_prazo: data no formato AAAA-MM-DD se possível identificar, senão deixe vazio
-- descricao: pequena descrição adicional se houver
-
-Retorne um JSON no formato:
-[
-  {{
-    "responsavel": "Nome",
-    "feitas": ["tarefa1", ...],
-    "a_fazer": [
-      {{
-        "task": "nome da tarefa",
-        "prazo": "expressão do prazo",
-        "data_prazo": "AAAA-MM-DD",
-        "descricao": "descrição adicional"
-      }}
-    ]
-  }}
-]
+# O formato da resposta vai no responseSchema (modo JSON da API), não no prompt.
+PROMPT_TEMPLATE = """Transcrição de uma daily. Para cada pessoa, liste o que ela já fez (feitas) e o que vai fazer (a_fazer).
+Em a_fazer: task é a tarefa; prazo é a expressão de prazo como aparece no texto (ex.: amanhã, sexta-feira, fim do dia), ou vazio; descricao é um detalhe curto, se houver.
+Texto:
+{texto}"""
 
-Texto: {texto}
-"""
+# Campos que a Gemini não precisa gerar: data_prazo é resolvida aqui a partir do prazo (postprocess_tasks).
+CAMPOS_CALCULADOS = {"data_prazo"}
 
-def extract_tasks_with_gemini(texto: str) -> List[Dict[str, Any]]:
+def schema_gemini(tipo: Any) -> Dict[str, Any]:
+    """
+    Converte o JSON Schema de um tipo pydantic para o subconjunto OpenAPI aceito no responseSchema da Gemini:
+    resolve os $ref, troca Optional por nullable e marca como obrigatórios os campos que não aceitam null.
+    """
+    schema = TypeAdapter(tipo).json_schema()
+    defs = schema.get("$defs", {})
+
+    def converter(no: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in no:
+            return converter(defs[no["$ref"].rsplit("/", 1)[-1]])
+        if "anyOf" in no:
+            opcoes = [o for o in no["anyOf"] if o.get("type") != "null"]
+            convertido = converter(opcoes[0])
+            if len(opcoes) < len(no["anyOf"]):
+                convertido["nullable"] = True
+            return convertido
+        if no["type"] == "array":
+            return {"type": "ARRAY", "items": converter(no["items"])}
+        if no["type"] == "object":
+            propriedades = {nome: converter(p) for nome, p in no["properties"].items() if nome not in CAMPOS_CALCULADOS}
+            return {
+                "type": "OBJECT",
+                "properties": propriedades,
+                "required": [nome for nome, p in propriedades.items() if not p.get("nullable")],
+                "propertyOrdering": list(propriedades),
+            }
+        return {"type": no["type"].upper()}
+
+    return converter(schema)
+
+RESPONSE_SCHEMA = schema_gemini(List[PessoaTarefas])
+# Valida a resposta direto do texto com o parser JSON do pydantic-core, sem passar por json.loads.
+_RESPOSTA = TypeAdapter(List[PessoaTarefas])
+
+GEMINI_MODEL = "gemini-2.0-flash"
+# Muda sempre que o modelo, o prompt ou o schema mudam, invalidando o cache de resultados.
+VERSAO_CACHE = f"{GEMINI_MODEL}/{hashlib.sha256((PROMPT_TEMPLATE + json.dumps(RESPONSE_SCHEMA, sort_keys=True)).encode('utf-8')).hexdigest()[:12]}"
+
+# Teto de maxOutputTokens, proporcional ao tamanho da entrada: a saída são trechos da própria transcrição.
+SAIDA_MIN_TOKENS = int(get_env_var("GEMINI_SAIDA_MIN_TOKENS", default="256"))
+SAIDA_POR_TOKEN = float(get_env_var("GEMINI_SAIDA_POR_TOKEN", default="1.5"))
+MAX_SAIDA_TOKENS = int(get_env_var("GEMINI_MAX_SAIDA_TOKENS", default="8192"))
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa barata de tokens (~4 caracteres por token em português), sem chamar a API."""
+    return (len(texto) + 3) // 4
+
+def limite_saida(texto: str) -> int:
+    """maxOutputTokens para uma transcrição: SAIDA_MIN_TOKENS + SAIDA_POR_TOKEN por token de entrada, até MAX_SAIDA_TOKENS."""
+    return min(MAX_SAIDA_TOKENS, SAIDA_MIN_TOKENS + int(estimar_tokens(texto) * SAIDA_POR_TOKEN))
+
+def _gemini_url(metodo: str = "generateContent") -> str:
+    return f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:{metodo}"
+
+def _gemini_headers() -> Dict[str, str]:
+    # A chave vai no header (e não na query string) para não aparecer em logs de erro com a URL.
     GEMINI_API_KEY = get_env_var("GEMINI_API_KEY", required=True)
-    GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
+    return {"x-goog-api-key": GEMINI_API_KEY}
+
+def _build_payload(texto: str) -> Dict[str, Any]:
     prompt = PROMPT_TEMPLATE.format(texto=texto)
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}]
+    return {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "generationConfig": {
+            "responseMimeType": "application/json",
+            "responseSchema": RESPONSE_SCHEMA,
+            "maxOutputTokens": limite_saida(texto),
+        },
     }
+
+class GeminiError(Exception):
+    """Falha numa chamada à Gemini; a mensagem é a que vai para o usuário."""
+
+class GeminiTransporteError(GeminiError):
+    """A chamada não teve resposta útil (rede, status de erro ou circuito aberto), já depois das novas tentativas do transporte."""
+
+MENSAGEM_INDISPONIVEL = "A IA está indisponível no momento. Tente novamente em instantes."
+
+def gemini_indisponivel() -> bool:
+    """True enquanto o circuit breaker da Gemini não está fechado (falhas recentes seguidas)."""
+    return not get_transporte().circuito.disponivel
+
+def _registrar_tokens(response_data: Dict[str, Any]) -> None:
+    """Loga e conta os tokens de entrada e saída informados pela API (usageMetadata)."""
+    uso = response_data.get("usageMetadata") or {}
+    entrada, saida = uso.get("promptTokenCount", 0), uso.get("candidatesTokenCount", 0)
+    if entrada or saida:
+        logger.info("Tokens da Gemini: entrada=%s, saída=%s", entrada, saida)
+        GEMINI_TOKENS.inc(entrada, tipo="entrada")
+        GEMINI_TOKENS.inc(saida, tipo="saida")
+
+def _extrair_json(response_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Extrai e valida o JSON de tarefas (ainda sem pós-processamento) da resposta da Gemini."""
+    if "candidates" not in response_data or not response_data["candidates"]:
+        logger.error("Resposta da Gemini não contém 'candidates'. Resposta: %s", response_data)
+        raise GeminiError("Formato de resposta inesperado da IA.")
+    _registrar_tokens(response_data)
+
+    candidato = response_data["candidates"][0]
+    if candidato.get("finishReason") == "MAX_TOKENS":
+        GEMINI_JSON_INVALIDO.inc()
+        logger.error("Resposta da Gemini cortada em maxOutputTokens. Uso: %s", response_data.get("usageMetadata"))
+        raise GeminiError("Erro ao processar a resposta da IA. Formato JSON inválido.")
+    partes = candidato.get("content", {}).get("parts") or []
+    if not partes:
+        logger.error("Resposta da Gemini sem conteúdo. Candidato: %s", candidato)
+        raise GeminiError("Formato de resposta inesperado da IA.")
+    result_text = partes[0]["text"]
+
+    # Com responseSchema a resposta já é JSON puro; as cercas de Markdown só aparecem sem o modo JSON.
+    if result_text.lstrip().startswith("```"):
+        result_text = re.sub(r'```json\n?|```', '', result_text.strip())
+
+    try:
+        return _RESPOSTA.dump_python(_RESPOSTA.validate_json(result_text))
+    except ValidationError as e:
+        GEMINI_JSON_INVALIDO.inc()
+        logger.error("Resposta da Gemini fora do formato esperado: %s. Resposta recebida: %s", e, result_text)
+        raise GeminiError("Erro ao processar a resposta da IA. Formato JSON inválido.")
+
+def _parse_response_data(response_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Extrai o JSON de tarefas da resposta da Gemini e aplica o pós-processamento."""
+    try:
+        return postprocess_tasks(_extrair_json(response_data))
+    except GeminiError as e:
+        return [{"erro": str(e)}]
+
+def extract_tasks_with_gemini(texto: str) -> List[Dict[str, Any]]:
+    GEMINI_URL = _gemini_url()
+    headers = _gemini_headers()
+    payload = _build_payload(texto)
     logger.info("Enviando requisição para Gemini API.")
     try:
-        response = requests.post(GEMINI_URL, json=payload, timeout=30)
+        response = requests.post(GEMINI_URL, json=payload, headers=headers, timeout=30)
         response.raise_for_status()
         logger.info("Resposta recebida da Gemini API com status %s", response.status_code)
-        
-        response_data = response.json()
-        
-        if "candidates" not in response_data or not response_data["candidates"]:
-            logger.error("Resposta da Gemini não contém 'candidates'. Resposta: %s", response_data)
-            return [{"erro": "Formato de resposta inesperado da IA."}]
-
-        result_text = response_data["candidates"][0]["content"]["parts"][0]["text"]
-        
-        clean_text = re.sub(r'```json\n?|```', '', result_text.strip())
-
-        try:
-            data = json.loads(clean_text)
-            return postprocess_tasks(data)
-        except json.JSONDecodeError as e:
-            logger.error("Erro ao decodificar o JSON da Gemini: %s. Resposta recebida: %s", e, clean_text)
-            return [{"erro": "Erro ao processar a resposta da IA. Formato JSON inválido."}]
-            
+        return _parse_response_data(response.json())
     except requests.RequestException as e:
         logger.error("Erro de comunicação com a Gemini API: %s", e)
         return [{"erro": "Erro de comunicação com a IA. Tente novamente mais tarde."}]
     except Exception as e:
         logger.critical("Erro inesperado: %s", e)
-        return [{"erro": "Erro inesperado. Tente novamente mais tarde."}]
\ No newline at end of file
+        return [{"erro": "Erro inesperado. Tente novamente mais tarde."}]
+
+# Modo para textos longos: divide nas fronteiras de fala e manda os trechos em paralelo.
+CHUNK_MAX_TOKENS = int(get_env_var("GEMINI_CHUNK_MAX_TOKENS", default="4000"))
+LONGO_MIN_TOKENS = int(get_env_var("GEMINI_LONGO_MIN_TOKENS", default="6000"))
+CHUNK_CONCORRENCIA = int(get_env_var("GEMINI_CHUNK_CONCORRENCIA", default="4"))
+CHUNK_TENTATIVAS = int(get_env_var("GEMINI_CHUNK_TENTATIVAS", default="2"))
+
+def dividir_em_chunks(texto: str, max_tokens: int = None) -> List[str]:
+    """
+    Divide a transcrição em trechos de até max_tokens, sempre em fronteiras de fala (separar_falas).
+    Uma fala maior que o limite fica sozinha no seu trecho. Sem falas identificadas, retorna o texto inteiro.
+    O texto antes da primeira fala (cabeçalho, pauta) vai no início do primeiro trecho, fora do orçamento.
+    """
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    falas = separar_falas(texto)
+    if not falas:
+        return [texto]
+    chunks, atual, tokens_atual = [], [], 0
+    for bloco in falas:
+        linha = f"{bloco['responsavel']}: {bloco['fala']}"
+        tokens = estimar_tokens(linha)
+        if atual and tokens_atual + tokens > max_tokens:
+            chunks.append("\n".join(atual))
+            atual, tokens_atual = [], 0
+        atual.append(linha)
+        tokens_atual += tokens
+    if atual:
+        chunks.append("\n".join(atual))
+    preambulo = texto_antes_das_falas(texto)
+    if preambulo:
+        chunks[0] = f"{preambulo}\n{chunks[0]}"
+    return chunks
+
+async def _chamar_gemini(client: httpx.AsyncClient, texto: str, headers: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Uma chamada generateContent; retorna o JSON bruto ou levanta GeminiError."""
+    try:
+        with etapa("gemini", "http"):
+            response = await get_transporte().post(client, _gemini_url(), json=_build_payload(texto), headers=headers)
+        GEMINI_RESPOSTAS.inc(status=response.status_code)
+        response.raise_for_status()
+    except CircuitoAbertoError as e:
+        logger.warning("Chamada à Gemini não enviada: %s", e)
+        raise GeminiTransporteError(MENSAGEM_INDISPONIVEL)
+    except httpx.HTTPError as e:
+        if not isinstance(e, httpx.HTTPStatusError):
+            GEMINI_RESPOSTAS.inc(status="erro_conexao")
+        logger.error("Erro de comunicação com a Gemini API: %s", e)
+        raise GeminiTransporteError("Erro de comunicação com a IA. Tente novamente mais tarde.")
+    logger.info("Resposta recebida da Gemini API com status %s", response.status_code)
+    with etapa("gemini", "json"):
+        return _extrair_json(response.json())
+
+async def _extrair_em_chunks(client: httpx.AsyncClient, chunks: List[str], headers: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    Manda os trechos em paralelo (até CHUNK_CONCORRENCIA) e junta por responsável, na ordem dos trechos,
+    com a mesma regra de agrupar_por_pessoa. Só os trechos com resposta inválida (JSON fora do schema, corte por
+    MAX_TOKENS) são repetidos aqui: falhas de rede e de status já foram repetidas pelo transporte.
+    """
+    resultados: List[Optional[List[Dict[str, Any]]]] = [None] * len(chunks)
+    erros: Dict[int, GeminiError] = {}
+    limite = asyncio.Semaphore(CHUNK_CONCORRENCIA)
+
+    async def _um(i: int) -> None:
+        async with limite:
+            try:
+                resultados[i] = await _chamar_gemini(client, chunks[i], headers)
+            except GeminiError as e:
+                erros[i] = e
+
+    pendentes = list(range(len(chunks)))
+    for tentativa in range(CHUNK_TENTATIVAS + 1):
+        if tentativa:
+            logger.warning("Repetindo %s trecho(s) que falharam: %s", len(pendentes), pendentes)
+        await asyncio.gather(*(_um(i) for i in pendentes))
+        falhas = [i for i in pendentes if resultados[i] is None]
+        pendentes = [i for i in falhas if not isinstance(erros[i], GeminiTransporteError)]
+        if len(pendentes) < len(falhas) or not pendentes:
+            break
+    falhas = [i for i in range(len(chunks)) if resultados[i] is None]
+    if falhas:
+        raise erros[falhas[0]]
+    itens = [
+        {"responsavel": item.get("responsavel", "Desconhecido"), "feitas": item.get("feitas") or [], "a_fazer": item.get("a_fazer") or []}
+        for resultado in resultados for item in resultado
+    ]
+    return agrupar_por_pessoa(itens)
+
+async def extract_tasks_with_gemini_async(texto: str, client: Optional[httpx.AsyncClient] = None) -> List[Dict[str, Any]]:
+    """
+    Versão assíncrona de extract_tasks_with_gemini. Usa o AsyncClient compartilhado do processo
+    (pool de conexões keep-alive), sem ocupar uma thread durante a chamada à IA.
+    Textos acima de GEMINI_LONGO_MIN_TOKENS são divididos em trechos enviados em paralelo.
+    """
+    client = client or get_async_client()
+    headers = _gemini_headers()
+    try:
+        chunks = dividir_em_chunks(texto) if estimar_tokens(texto) > LONGO_MIN_TOKENS else [texto]
+        if len(chunks) > 1:
+            logger.info("Texto longo: enviando %s trechos em paralelo para Gemini API.", len(chunks))
+            data = await _extrair_em_chunks(client, chunks, headers)
+        else:
+            logger.info("Enviando requisição assíncrona para Gemini API (~%s tokens de entrada, maxOutputTokens=%s).",
+                        estimar_tokens(PROMPT_TEMPLATE) + estimar_tokens(texto), limite_saida(texto))
+            data = await _chamar_gemini(client, texto, headers)
+        with etapa("gemini", "prazos"):
+            resultado = postprocess_tasks(data)
+        TEXTOS_PROCESSADOS.inc(provedor="gemini")
+        FALANTES_PROCESSADOS.inc(len(resultado), provedor="gemini")
+        return resultado
+    except GeminiError as e:
+        return [{"erro": str(e)}]
+    except Exception as e:
+        logger.critical("Erro inesperado: %s", e)
+        return [{"erro": "Erro inesperado. Tente novamente mais tarde."}]
+
+async def stream_tasks_with_gemini(texto: str, client: Optional[httpx.AsyncClient] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Versão em streaming: consome o streamGenerateContent (SSE) e gera um evento por pessoa assim que o objeto
+    dela fica completo no JSON, sem esperar a resposta inteira. Termina com um evento "fim" ou "erro".
+    """
+    client = client or get_async_client()
+    GEMINI_URL = _gemini_url("streamGenerateContent")
+    headers = _gemini_headers()
+    payload = _build_payload(texto)
+    parser = JSONArrayStreamParser()
+    agrupador = AgrupadorIncremental()
+    uso: Dict[str, Any] = {}
+    logger.info("Enviando requisição em streaming para Gemini API.")
+    transporte = get_transporte()
+    try:
+        # Streaming não é repetido (eventos já podem ter saído), mas passa pelo circuit breaker e pelo limite.
+        transporte.circuito.permitir()
+        async with transporte.limite(), client.stream("POST", GEMINI_URL, params={"alt": "sse"}, json=payload, headers=headers) as response:
+            GEMINI_RESPOSTAS.inc(status=response.status_code)
+            if response.status_code >= 500 or response.status_code == 429:
+                transporte.circuito.falha()
+            else:
+                transporte.circuito.sucesso()
+            response.raise_for_status()
+            async for linha in response.aiter_lines():
+                if not linha.startswith("data:"):
+                    continue
+                parte = json.loads(linha[len("data:"):])
+                uso = parte.get("usageMetadata") or uso
+                for candidate in parte.get("candidates", [])[:1]:
+                    for trecho in candidate.get("content", {}).get("parts", []):
+                        for obj in parser.feed(trecho.get("text", "")):
+                            try:
+                                pessoa = PessoaTarefas.model_validate(obj)
+                            except ValidationError:
+                                logger.warning("Objeto ignorado no streaming da Gemini: %s", obj)
+                                continue
+                            yield agrupador.adicionar(pessoa.model_dump())
+    except CircuitoAbertoError as e:
+        logger.warning("Streaming da Gemini não enviado: %s", e)
+        yield {"evento": "erro", "dados": {"erro": MENSAGEM_INDISPONIVEL}}
+        return
+    except httpx.HTTPError as e:
+        if not isinstance(e, httpx.HTTPStatusError):
+            GEMINI_RESPOSTAS.inc(status="erro_conexao")
+            if isinstance(e, httpx.TransportError):
+                transporte.circuito.falha()
+        logger.error("Erro de comunicação com a Gemini API: %s", e)
+        yield {"evento": "erro", "dados": {"erro": "Erro de comunicação com a IA. Tente novamente mais tarde."}}
+        return
+    except json.JSONDecodeError as e:
+        GEMINI_JSON_INVALIDO.inc()
+        logger.error("Erro ao decodificar o JSON da Gemini em streaming: %s", e)
+        yield {"evento": "erro", "dados": {"erro": "Erro ao processar a resposta da IA. Formato JSON inválido."}}
+        return
+    _registrar_tokens({"usageMetadata": uso})
+    if not parser.completo:
+        GEMINI_JSON_INVALIDO.inc()
+        logger.error("Streaming da Gemini terminou sem fechar o array JSON.")
+        yield {"evento": "erro", "dados": {"erro": "Erro ao processar a resposta da IA. Formato JSON inválido."}}
+        return
+    yield {"evento": "fim", "dados": agrupador.resultado()}
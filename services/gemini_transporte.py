@@ -0,0 +1,295 @@
+"""
+Transporte resiliente das chamadas à Gemini.
+
+Envolve cada POST com:
+- limite global de chamadas simultâneas (GEMINI_CONCORRENCIA_MAX), para ficar dentro da cota;
+- novas tentativas em erros de rede, 429 e 5xx, com backoff exponencial com jitter (full jitter) e respeito ao
+  Retry-After, dentro de um prazo total (GEMINI_PRAZO_TOTAL_SEGUNDOS) que também corta a tentativa em andamento;
+- circuit breaker: depois de GEMINI_CB_FALHAS falhas seguidas, as chamadas falham na hora por
+  GEMINI_CB_ABERTO_SEGUNDOS; depois disso uma chamada de teste decide se o circuito fecha de novo;
+- hedging opcional (GEMINI_HEDGE): se a resposta passa do p95 das latências recentes, uma segunda requisição
+  igual é disparada e vale a que chegar primeiro.
+Os contadores ficam em stats() e no /metrics.
+"""
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from utils.config import get_env_var
+
+logger = logging.getLogger(__name__)
+
+# Status que indicam problema do lado da Gemini (ou cota) e valem nova tentativa.
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+
+class CircuitoAbertoError(Exception):
+    """A Gemini está marcada como indisponível; a chamada nem foi feita."""
+
+def retry_after_segundos(valor: Optional[str]) -> Optional[float]:
+    """Interpreta o cabeçalho Retry-After (segundos ou data HTTP)."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        data = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return max(0.0, (data - datetime.now(timezone.utc)).total_seconds())
+
+class CircuitBreaker:
+    """Circuit breaker por falhas consecutivas: fechado -> aberto -> meio_aberto (uma chamada de teste) -> fechado."""
+
+    def __init__(self, falhas: int = 5, aberto_segundos: float = 30):
+        self.limite_falhas = falhas
+        self.aberto_segundos = aberto_segundos
+        self.estado = "fechado"
+        self.falhas_seguidas = 0
+        self.aberturas = 0
+        self.rejeitadas = 0
+        self._aberto_em = 0.0
+        self._teste_em: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def permitir(self) -> None:
+        """Levanta CircuitoAbertoError se a chamada não deve ser feita agora."""
+        with self._lock:
+            agora = time.monotonic()
+            if self.estado == "aberto" and agora - self._aberto_em >= self.aberto_segundos:
+                self.estado = "meio_aberto"
+                self._teste_em = None
+            if self.estado == "meio_aberto":
+                # Só uma chamada de teste por vez; se ela sumir (cancelada), outra é liberada depois do mesmo intervalo.
+                if self._teste_em is None or agora - self._teste_em >= self.aberto_segundos:
+                    self._teste_em = agora
+                    return
+            if self.estado == "fechado":
+                return
+            self.rejeitadas += 1
+        raise CircuitoAbertoError("Gemini indisponível no momento (circuit breaker aberto).")
+
+    def sucesso(self) -> None:
+        with self._lock:
+            if self.estado != "fechado":
+                logger.info("Circuit breaker da Gemini fechado.")
+            self.estado = "fechado"
+            self.falhas_seguidas = 0
+            self._teste_em = None
+
+    def falha(self) -> None:
+        with self._lock:
+            self.falhas_seguidas += 1
+            if self.estado == "meio_aberto" or (self.estado == "fechado" and self.falhas_seguidas >= self.limite_falhas):
+                logger.warning("Circuit breaker da Gemini aberto por %ss após %s falhas seguidas.", self.aberto_segundos, self.falhas_seguidas)
+                self.estado = "aberto"
+                self.aberturas += 1
+                self._aberto_em = time.monotonic()
+                self._teste_em = None
+
+    @property
+    def disponivel(self) -> bool:
+        return self.estado == "fechado"
+
+class TransporteGemini:
+    def __init__(self, tentativas: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 retry_after_max: float = 10.0, prazo_total: float = 45.0, concorrencia_max: int = 8,
+                 cb_falhas: int = 5, cb_aberto_segundos: float = 30.0, hedge: bool = False,
+                 hedge_min_ms: float = 500.0, hedge_amostras_min: int = 20):
+        self.tentativas = tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.prazo_total = prazo_total
+        self.concorrencia_max = concorrencia_max
+        self.hedge = hedge
+        self.hedge_min_ms = hedge_min_ms
+        self.hedge_amostras_min = hedge_amostras_min
+        self.circuito = CircuitBreaker(cb_falhas, cb_aberto_segundos)
+        self._latencias: deque = deque(maxlen=200)
+        # Um semáforo por event loop (os testes e a suíte de benchmark criam vários).
+        self._semaforos: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self.em_andamento = 0
+        self.chamadas = 0
+        self.retentativas = 0
+        self.hedges = 0
+        self.hedges_vencedores = 0
+        self.prazos_esgotados = 0
+
+    def _semaforo(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaforo = self._semaforos.get(loop)
+        if semaforo is None:
+            semaforo = self._semaforos[loop] = asyncio.Semaphore(self.concorrencia_max)
+        return semaforo
+
+    @asynccontextmanager
+    async def limite(self):
+        """Ocupa uma das GEMINI_CONCORRENCIA_MAX vagas de chamada à Gemini enquanto o bloco roda."""
+        async with self._semaforo():
+            self.em_andamento += 1
+            try:
+                yield
+            finally:
+                self.em_andamento -= 1
+
+    def p95_ms(self) -> Optional[float]:
+        if not self._latencias:
+            return None
+        ordenadas = sorted(self._latencias)
+        return ordenadas[max(0, math.ceil(0.95 * len(ordenadas)) - 1)]
+
+    def _atraso_hedge(self) -> Optional[float]:
+        if not self.hedge or len(self._latencias) < self.hedge_amostras_min:
+            return None
+        return max(self.hedge_min_ms, self.p95_ms()) / 1000
+
+    def _backoff(self, tentativa: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** tentativa))
+
+    async def _enviar(self, enviar: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        async with self.limite():
+            inicio = time.perf_counter()
+            resposta = await enviar()
+        if resposta.status_code not in STATUS_REPETIVEIS:
+            self._latencias.append((time.perf_counter() - inicio) * 1000)
+        return resposta
+
+    async def _tentativa(self, enviar: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """Uma tentativa, com a requisição de hedge se a primeira demorar além do p95."""
+        atraso = self._atraso_hedge()
+        if atraso is None:
+            return await self._enviar(enviar)
+        primeira = asyncio.ensure_future(self._enviar(enviar))
+        try:
+            await asyncio.wait_for(asyncio.shield(primeira), timeout=atraso)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            primeira.cancel()
+            raise
+        if primeira.done() or self._semaforo().locked():
+            # Sem vaga livre, o hedge só aumentaria a fila.
+            return await primeira
+        self.hedges += 1
+        segunda = asyncio.ensure_future(self._enviar(enviar))
+        pendentes = {primeira, segunda}
+        ultima = None
+        try:
+            while pendentes:
+                prontas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in prontas:
+                    ultima = tarefa
+                    if tarefa.exception() is None and tarefa.result().status_code not in STATUS_REPETIVEIS:
+                        if tarefa is segunda:
+                            self.hedges_vencedores += 1
+                        return tarefa.result()
+            return ultima.result()
+        finally:
+            for tarefa in pendentes:
+                tarefa.cancel()
+
+    async def post(self, client: httpx.AsyncClient, url: str, **kwargs: Any) -> httpx.Response:
+        """
+        POST com limite de concorrência, novas tentativas, circuit breaker e hedging.
+        Retorna a última resposta (que pode ter status de erro) ou levanta o último erro de rede
+        ou CircuitoAbertoError.
+        """
+        self.chamadas += 1
+        inicio = time.monotonic()
+        anterior: Optional[httpx.Response] = None
+        for tentativa in range(self.tentativas + 1):
+            self.circuito.permitir()
+            erro: Optional[Exception] = None
+            resposta: Optional[httpx.Response] = None
+            restante = self.prazo_total - (time.monotonic() - inicio)
+            try:
+                # O prazo total também corta a tentativa em andamento, não só impede a próxima.
+                resposta = await asyncio.wait_for(self._tentativa(lambda: client.post(url, **kwargs)), timeout=max(restante, 0))
+            except asyncio.TimeoutError:
+                self.circuito.falha()
+                self.prazos_esgotados += 1
+                logger.warning("Prazo total de %ss da chamada à Gemini esgotado.", self.prazo_total)
+                if anterior is not None:
+                    return anterior
+                raise httpx.TimeoutException(f"Prazo total de {self.prazo_total}s da chamada à Gemini esgotado.")
+            except httpx.TransportError as e:
+                erro = e
+                espera = self._backoff(tentativa)
+            else:
+                if resposta.status_code not in STATUS_REPETIVEIS:
+                    self.circuito.sucesso()
+                    return resposta
+                espera = retry_after_segundos(resposta.headers.get("Retry-After"))
+                if espera is None:
+                    espera = self._backoff(tentativa)
+                elif espera > self.retry_after_max:
+                    self.circuito.falha()
+                    logger.warning("Gemini pediu Retry-After de %ss; desistindo sem nova tentativa.", espera)
+                    return resposta
+            self.circuito.falha()
+            if tentativa == self.tentativas or time.monotonic() - inicio + espera > self.prazo_total:
+                break
+            logger.warning("Falha na chamada à Gemini (%s); nova tentativa em %.2fs.",
+                           erro or f"status {resposta.status_code}", espera)
+            self.retentativas += 1
+            anterior = resposta
+            await asyncio.sleep(espera)
+        if erro is not None:
+            raise erro
+        return resposta
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuito": self.circuito.estado,
+            "circuito_aberto": self.circuito.estado != "fechado",
+            "falhas_seguidas": self.circuito.falhas_seguidas,
+            "aberturas": self.circuito.aberturas,
+            "rejeitadas_circuito": self.circuito.rejeitadas,
+            "chamadas": self.chamadas,
+            "retentativas": self.retentativas,
+            "prazos_esgotados": self.prazos_esgotados,
+            "hedges": self.hedges,
+            "hedges_vencedores": self.hedges_vencedores,
+            "em_andamento": self.em_andamento,
+            "concorrencia_max": self.concorrencia_max,
+            "p95_ms": round(self.p95_ms() or 0.0, 1),
+        }
+
+_transporte: Optional[TransporteGemini] = None
+
+def get_transporte() -> TransporteGemini:
+    """
+    Retorna o transporte do processo, configurado por GEMINI_TENTATIVAS, GEMINI_BACKOFF_BASE, GEMINI_BACKOFF_MAX,
+    GEMINI_RETRY_AFTER_MAX, GEMINI_PRAZO_TOTAL_SEGUNDOS, GEMINI_CONCORRENCIA_MAX, GEMINI_CB_FALHAS,
+    GEMINI_CB_ABERTO_SEGUNDOS, GEMINI_HEDGE e GEMINI_HEDGE_MIN_MS.
+    """
+    global _transporte
+    if _transporte is None:
+        _transporte = TransporteGemini(
+            tentativas=int(get_env_var("GEMINI_TENTATIVAS", default="2")),
+            backoff_base=float(get_env_var("GEMINI_BACKOFF_BASE", default="0.5")),
+            backoff_max=float(get_env_var("GEMINI_BACKOFF_MAX", default="8")),
+            retry_after_max=float(get_env_var("GEMINI_RETRY_AFTER_MAX", default="10")),
+            prazo_total=float(get_env_var("GEMINI_PRAZO_TOTAL_SEGUNDOS", default="45")),
+            concorrencia_max=int(get_env_var("GEMINI_CONCORRENCIA_MAX", default="8")),
+            cb_falhas=int(get_env_var("GEMINI_CB_FALHAS", default="5")),
+            cb_aberto_segundos=float(get_env_var("GEMINI_CB_ABERTO_SEGUNDOS", default="30")),
+            hedge=get_env_var("GEMINI_HEDGE", default="false").lower() == "true",
+            hedge_min_ms=float(get_env_var("GEMINI_HEDGE_MIN_MS", default="500")),
+        )
+    return _transporte
@@ -0,0 +1,369 @@
+"""
+Jobs assíncronos para transcrições muito grandes.
+
+POST /jobs grava o job numa fila em SQLite (JOBS_SQLITE_PATH) e responde na hora com o id; workers asyncio do
+próprio processo (JOBS_WORKERS) pegam os jobs pendentes e rodam os mesmos motores do /extract-tasks.
+Com o spaCy, os blocos de fala são processados em passos de JOBS_BLOCOS_POR_PASSO: entre um passo e outro o
+progresso (blocos feitos/total) é gravado e o cancelamento é verificado. Com a Gemini e o modo auto a chamada é
+uma só, então o progresso vai de 0 ao total no fim.
+
+Como a fila está no SQLite, ela sobrevive a um restart: quem está rodando um job atualiza atualizado_em a cada
+JOBS_HEARTBEAT_SEGUNDOS, e um job "processando" sem sinal de vida há JOBS_HEARTBEAT_TIMEOUT_SEGUNDOS (o processo
+morreu) volta a ser pego por qualquer worker, do zero, até JOBS_MAX_TENTATIVAS vezes. Jobs terminados (concluídos,
+com erro ou cancelados) ficam disponíveis por JOBS_TTL_SEGUNDOS e depois são apagados.
+
+O SQLite nunca é acessado do event loop: os workers e os endpoints usam os métodos *_async, que levam as
+consultas para o threadpool. Com vários processos na mesma fila, uma espera pelo lock de escrita (até o
+busy_timeout) trava só uma thread, não as requisições do worker web.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from services.falas import separar_falas, agrupar_por_pessoa
+from services.spacy_pool import processar_falas_async
+from services.validator import postprocess_tasks
+from utils.config import get_env_var
+from utils.metrics import REGISTRO
+
+logger = logging.getLogger(__name__)
+
+JOBS_FINALIZADOS = REGISTRO.contador("tarefai_jobs_finalizados_total", "Jobs assíncronos finalizados, por provedor e status.", ("provedor", "status"))
+
+STATUS = ("pendente", "processando", "concluido", "erro", "cancelado")
+
+class JobNaoEncontradoError(Exception):
+    pass
+
+class FilaCheiaError(Exception):
+    pass
+
+class _JobInterrompido(Exception):
+    """O job deixou de ser nosso no meio do caminho (cancelado, ou retomado por outro processo)."""
+
+def _job(linha: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": linha["id"],
+        "provedor": linha["provedor"],
+        "status": linha["status"],
+        "progresso": {"feitos": linha["feitos"], "total": linha["total"]},
+        "resultado": json.loads(linha["resultado"]) if linha["resultado"] is not None else None,
+        "erro": linha["erro"],
+        "criado_em": datetime.fromtimestamp(linha["criado_em"]).isoformat(timespec="seconds"),
+        "atualizado_em": datetime.fromtimestamp(linha["atualizado_em"]).isoformat(timespec="seconds"),
+    }
+
+class JobQueue:
+    def __init__(self, sqlite_path: str = "jobs.sqlite3", workers: int = 2, poll_segundos: float = 1.0,
+                 ttl: float = 86400, max_pendentes: int = 100, max_caracteres: int = 1_000_000,
+                 blocos_por_passo: int = 16, heartbeat_segundos: float = 30, heartbeat_timeout: float = 120,
+                 max_tentativas: int = 3):
+        self.workers = workers
+        self.poll_segundos = poll_segundos
+        self.ttl = ttl
+        self.max_pendentes = max_pendentes
+        self.max_caracteres = max_caracteres
+        self.blocos_por_passo = blocos_por_passo
+        self.heartbeat_segundos = heartbeat_segundos
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_tentativas = max_tentativas
+        # isolation_level=None: as transações são abertas à mão (BEGIN IMMEDIATE) onde a atomicidade importa.
+        self._db = sqlite3.connect(sqlite_path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, provedor TEXT NOT NULL, texto TEXT NOT NULL, status TEXT NOT NULL, "
+            "feitos INTEGER NOT NULL DEFAULT 0, total INTEGER NOT NULL DEFAULT 0, resultado TEXT, erro TEXT, "
+            "tentativas INTEGER NOT NULL DEFAULT 0, criado_em REAL NOT NULL, atualizado_em REAL NOT NULL, expira_em REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, criado_em)")
+        self._lock = threading.Lock()
+        # Jobs rodando neste processo: id -> task, para o cancelamento e o heartbeat.
+        self._tarefas: Dict[str, asyncio.Task] = {}
+        self._workers: List[asyncio.Task] = []
+        self._novo: Optional[asyncio.Event] = None
+        self.recuperados = 0
+
+    def criar(self, texto: str, provedor: str) -> Dict[str, Any]:
+        id = self._inserir(texto, provedor)
+        self._acordar()
+        return self.obter(id)
+
+    async def criar_async(self, texto: str, provedor: str) -> Dict[str, Any]:
+        id = await run_in_threadpool(self._inserir, texto, provedor)
+        self._acordar()
+        return await run_in_threadpool(self.obter, id)
+
+    def _inserir(self, texto: str, provedor: str) -> str:
+        agora = time.time()
+        id = uuid.uuid4().hex
+        with self._lock:
+            pendentes = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'pendente'").fetchone()[0]
+            if pendentes >= self.max_pendentes:
+                raise FilaCheiaError(f"Fila de jobs cheia ({pendentes} pendentes). Tente novamente mais tarde.")
+            self._db.execute(
+                "INSERT INTO jobs (id, provedor, texto, status, criado_em, atualizado_em) VALUES (?, ?, ?, 'pendente', ?, ?)",
+                (id, provedor, texto, agora, agora),
+            )
+        return id
+
+    def _acordar(self) -> None:
+        # Só do event loop: o asyncio.Event não é thread-safe.
+        if self._novo is not None:
+            self._novo.set()
+
+    def obter(self, id: str) -> Dict[str, Any]:
+        with self._lock:
+            linha = self._db.execute(
+                "SELECT * FROM jobs WHERE id = ? AND (expira_em IS NULL OR expira_em > ?)", (id, time.time())
+            ).fetchone()
+        if linha is None:
+            raise JobNaoEncontradoError(f"Job {id} não encontrado ou expirado.")
+        return _job(linha)
+
+    async def obter_async(self, id: str) -> Dict[str, Any]:
+        return await run_in_threadpool(self.obter, id)
+
+    def cancelar(self, id: str) -> Dict[str, Any]:
+        """Cancela um job pendente ou em andamento. Jobs já terminados ficam como estão."""
+        self._marcar_cancelado(id)
+        self._interromper(id)
+        return self.obter(id)
+
+    async def cancelar_async(self, id: str) -> Dict[str, Any]:
+        await run_in_threadpool(self._marcar_cancelado, id)
+        self._interromper(id)
+        return await run_in_threadpool(self.obter, id)
+
+    def _marcar_cancelado(self, id: str) -> None:
+        agora = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'cancelado', texto = '', atualizado_em = ?, expira_em = ? "
+                "WHERE id = ? AND status IN ('pendente', 'processando')",
+                (agora, agora + self.ttl, id),
+            )
+
+    def _interromper(self, id: str) -> None:
+        tarefa = self._tarefas.get(id)
+        if tarefa is not None:
+            # Rodando neste processo: para já. Em outro processo, ele percebe no próximo passo.
+            tarefa.cancel()
+
+    def _reivindicar(self) -> Optional[sqlite3.Row]:
+        """Pega o job pendente mais antigo (ou um "processando" abandonado) de forma atômica entre processos."""
+        agora = time.time()
+        consulta = (
+            "SELECT {} FROM jobs WHERE status = 'pendente' OR (status = 'processando' AND atualizado_em < ?) "
+            "ORDER BY criado_em LIMIT 1"
+        )
+        with self._lock:
+            # Leitura sem lock de escrita primeiro (o WAL deixa ler enquanto outro processo escreve): a fila vazia,
+            # que é o caso de quase todo poll, não disputa o BEGIN IMMEDIATE com ninguém.
+            if self._db.execute(consulta.format("1"), (agora - self.heartbeat_timeout,)).fetchone() is None:
+                return None
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # De novo dentro da transação: outro worker pode ter pegado o job nesse meio-tempo.
+                linha = self._db.execute(consulta.format("*"), (agora - self.heartbeat_timeout,)).fetchone()
+                if linha is not None:
+                    if linha["status"] == "processando":
+                        self.recuperados += 1
+                        logger.warning("Job %s abandonado por outro processo; retomando do início.", linha["id"])
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'processando', feitos = 0, tentativas = tentativas + 1, atualizado_em = ? WHERE id = ?",
+                        (agora, linha["id"]),
+                    )
+                    linha = self._db.execute("SELECT * FROM jobs WHERE id = ?", (linha["id"],)).fetchone()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return linha
+
+    def _progresso(self, id: str, feitos: int, total: int) -> None:
+        with self._lock:
+            ativo = self._db.execute(
+                "UPDATE jobs SET feitos = ?, total = ?, atualizado_em = ? WHERE id = ? AND status = 'processando'",
+                (feitos, total, time.time(), id),
+            ).rowcount
+        if not ativo:
+            raise _JobInterrompido(id)
+
+    def _finalizar(self, id: str, provedor: str, status: str, resultado: Any = None, erro: Optional[str] = None) -> None:
+        agora = time.time()
+        with self._lock:
+            finalizado = self._db.execute(
+                "UPDATE jobs SET status = ?, resultado = ?, erro = ?, texto = '', feitos = total, atualizado_em = ?, expira_em = ? "
+                "WHERE id = ? AND status = 'processando'",
+                (status, json.dumps(resultado, ensure_ascii=False) if resultado is not None else None, erro, agora, agora + self.ttl, id),
+            ).rowcount
+        if finalizado:
+            JOBS_FINALIZADOS.inc(provedor=provedor, status=status)
+
+    def _limpar(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE expira_em IS NOT NULL AND expira_em <= ?", (time.time(),))
+
+    def _heartbeat(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET atualizado_em = ? WHERE status = 'processando' AND id IN ({','.join('?' * len(ids))})",
+                (time.time(), *ids),
+            )
+
+    async def _executar(self, job: sqlite3.Row) -> Any:
+        id, provedor, texto = job["id"], job["provedor"], job["texto"]
+        if provedor == "spacy":
+            falas = await run_in_threadpool(separar_falas, texto)
+            await run_in_threadpool(self._progresso, id, 0, len(falas))
+            blocos: List[Dict[str, Any]] = []
+            for inicio in range(0, len(falas), self.blocos_por_passo):
+                ultimo_nome = falas[inicio - 1]["responsavel"] if inicio else ""
+                blocos.extend(await processar_falas_async(falas[inicio:inicio + self.blocos_por_passo], ultimo_nome))
+                await run_in_threadpool(self._progresso, id, len(blocos), len(falas))
+            return postprocess_tasks(agrupar_por_pessoa(blocos))
+        # Gemini e auto: uma chamada só, sem progresso intermediário.
+        await run_in_threadpool(self._progresso, id, 0, 1)
+        if provedor == "gemini":
+            from services.gemini_llm import extract_tasks_with_gemini_async
+            return await extract_tasks_with_gemini_async(texto)
+        from services.router import extract_tasks_auto
+        resultado, _ = await extract_tasks_auto(texto)
+        return resultado
+
+    async def _rodar(self, job: sqlite3.Row) -> None:
+        id, provedor = job["id"], job["provedor"]
+        if job["tentativas"] > self.max_tentativas:
+            await run_in_threadpool(self._finalizar, id, provedor, "erro", erro=f"Job interrompido {self.max_tentativas} vezes; desistindo.")
+            return
+        tarefa = asyncio.ensure_future(self._executar(job))
+        self._tarefas[id] = tarefa
+        try:
+            # wait() não propaga o cancelamento da tarefa: cancelar o job não derruba o worker.
+            await asyncio.wait({tarefa})
+        except asyncio.CancelledError:
+            tarefa.cancel()
+            raise
+        finally:
+            self._tarefas.pop(id, None)
+        if tarefa.cancelled():
+            JOBS_FINALIZADOS.inc(provedor=provedor, status="cancelado")
+            return
+        erro = tarefa.exception()
+        if isinstance(erro, _JobInterrompido):
+            return
+        if erro is not None:
+            logger.exception("Erro no job %s", id, exc_info=erro)
+            await run_in_threadpool(self._finalizar, id, provedor, "erro", erro=f"Erro interno: {erro}")
+            return
+        resultado = tarefa.result()
+        if isinstance(resultado, list) and resultado and isinstance(resultado[0], dict) and "erro" in resultado[0]:
+            await run_in_threadpool(self._finalizar, id, provedor, "erro", erro=resultado[0]["erro"])
+        else:
+            await run_in_threadpool(self._finalizar, id, provedor, "concluido", resultado=resultado)
+
+    async def _worker(self) -> None:
+        while True:
+            # Limpo antes de olhar a fila: um job criado depois disso acorda o worker na hora.
+            self._novo.clear()
+            try:
+                job = await run_in_threadpool(self._reivindicar)
+            except sqlite3.Error:
+                logger.exception("Erro ao ler a fila de jobs")
+                job = None
+            if job is not None:
+                await self._rodar(job)
+                continue
+            try:
+                await asyncio.wait_for(self._novo.wait(), timeout=self.poll_segundos)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _manutencao(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self._heartbeat, list(self._tarefas))
+                await run_in_threadpool(self._limpar)
+            except sqlite3.Error:
+                logger.exception("Erro na manutenção da fila de jobs")
+            await asyncio.sleep(self.heartbeat_segundos)
+
+    def start(self) -> None:
+        """Sobe os workers no event loop atual (chamado no lifespan)."""
+        if self._workers:
+            return
+        self._novo = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._workers.append(asyncio.create_task(self._manutencao()))
+        logger.info("Fila de jobs iniciada com %s workers.", self.workers)
+
+    async def stop(self) -> None:
+        """Para os workers; os jobs interrompidos voltam para "pendente" e são retomados no próximo start."""
+        ids = list(self._tarefas)
+        tarefas = self._workers + list(self._tarefas.values())
+        for tarefa in self._workers:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        self._workers = []
+        self._novo = None
+        if ids:
+            await run_in_threadpool(self._devolver, ids)
+
+    def _devolver(self, ids: List[str]) -> None:
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET status = 'pendente', feitos = 0, tentativas = tentativas - 1 "
+                f"WHERE status = 'processando' AND id IN ({','.join('?' * len(ids))})",
+                ids,
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            contagem = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {**{status: contagem.get(status, 0) for status in STATUS}, "rodando_aqui": len(self._tarefas), "recuperados": self.recuperados}
+
+_fila: Optional[JobQueue] = None
+
+def get_job_queue() -> Optional[JobQueue]:
+    """Retorna a fila de jobs do processo, ou None se start_jobs() ainda não foi chamado."""
+    return _fila
+
+def start_jobs() -> JobQueue:
+    """
+    Cria (na primeira vez) e sobe a fila de jobs do processo, configurada por JOBS_SQLITE_PATH, JOBS_WORKERS,
+    JOBS_POLL_SEGUNDOS, JOBS_TTL_SEGUNDOS, JOBS_MAX_PENDENTES, JOBS_MAX_CARACTERES, JOBS_BLOCOS_POR_PASSO,
+    JOBS_HEARTBEAT_SEGUNDOS, JOBS_HEARTBEAT_TIMEOUT_SEGUNDOS e JOBS_MAX_TENTATIVAS.
+    """
+    global _fila
+    if _fila is None:
+        _fila = JobQueue(
+            sqlite_path=get_env_var("JOBS_SQLITE_PATH", default="jobs.sqlite3"),
+            workers=int(get_env_var("JOBS_WORKERS", default="2")),
+            poll_segundos=float(get_env_var("JOBS_POLL_SEGUNDOS", default="1")),
+            ttl=float(get_env_var("JOBS_TTL_SEGUNDOS", default="86400")),
+            max_pendentes=int(get_env_var("JOBS_MAX_PENDENTES", default="100")),
+            max_caracteres=int(get_env_var("JOBS_MAX_CARACTERES", default="1000000")),
+            blocos_por_passo=int(get_env_var("JOBS_BLOCOS_POR_PASSO", default="16")),
+            heartbeat_segundos=float(get_env_var("JOBS_HEARTBEAT_SEGUNDOS", default="30")),
+            heartbeat_timeout=float(get_env_var("JOBS_HEARTBEAT_TIMEOUT_SEGUNDOS", default="120")),
+            max_tentativas=int(get_env_var("JOBS_MAX_TENTATIVAS", default="3")),
+        )
+    _fila.start()
+    return _fila
+
+async def stop_jobs() -> None:
+    if _fila is not None:
+        await _fila.stop()
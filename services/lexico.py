@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Any, List, NamedTuple, FrozenSet, Optional
+
+from utils.config import get_env_var
+
+logger = logging.getLogger(__name__)
+
+# Arquivo JSON opcional com listas que substituem as padrão (mesmas chaves de _dados_padrao()).
+# É relido sem restart quando muda, verificando o mtime no máximo a cada LEXICO_RECARGA_SEGUNDOS.
+LEXICO_PATH = get_env_var("LEXICO_PATH", default="")
+LEXICO_RECARGA_SEGUNDOS = float(get_env_var("LEXICO_RECARGA_SEGUNDOS", default="5"))
+
+# Listas padrão. Continuam exportadas com os nomes antigos e são atualizadas no lugar quando o arquivo é recarregado.
+NOMES_EQUIPE = [
+    "Eduardo", "João", "Alessandra", "Alê", "Vinícius", "Vini", "Isabela", "Isa", "Caio", "Marcela", "Leonardo", "Leozão", "Ana", "Renata"
+]
+APELIDOS = {"Alê": "Alessandra", "Vini": "Vinícius", "Isa": "Isabela", "Leozão": "Leonardo"}
+PRONOMES = ["ele", "ela", "dele", "dela"]
+NEGATIVOS = [
+    "não consegui", "não terminei", "não deu tempo", "não consegui finalizar", "não consegui entregar", "não consegui implementar", "não consegui corrigir"
+]
+PAIRING = ["pairing com", "parear com", "fazer pairing com", "em dupla com"]
+REUNIAO = ["reunião com", "call com", "encontro com"]
+BLOQUEIO = ["bloqueado por", "impedido por", "dependendo de", "aguardando"]
+VERBOS_PASSADO = [
+    "corrigir", "fazer", "concluir", "finalizar", "terminar", "realizar", "entregar", "implementar", "testar", "revisar", "desenvolver", "validar", "aprovar", "ajustar", "refatorar", "subir", "atualizar", "alinhar", "criar", "preparar", "marcar", "rever"
+]
+VERBOS_FUTURO = VERBOS_PASSADO + [
+    "precisar", "dever", "planejar", "pretender"
+]
+# Palavras que indicam intenção/futuro em qualquer token da subfrase.
+MARCADORES_FUTURO = [
+    "vai", "irá", "deverá", "precisa", "precisará", "deve", "fará", "fazer", "começar", "começará", "iniciar", "iniciará",
+    "planeja", "planejar", "pretende", "pretender", "pendente", "deveriam"
+]
+# Auxiliares que, junto de um lema de VERBOS_FUTURO, marcam futuro mesmo sem a morfologia Fut.
+AUXILIARES_FUTURO = ["vai", "irá", "deverá", "precisará"]
+
+PRAZO_REGEX = (
+    r"amanhã|hoje|depois de amanhã|próxima semana|[0-9]{1,2}/[0-9]{1,2}|[0-9]{1,2}-[0-9]{1,2}|[0-9]{1,2} de [a-zç]+"
+    r"|segunda-feira|terça-feira|quarta-feira|quinta-feira|sexta-feira|sábado|domingo|até [a-zç]+|em [0-9]+ dias?|no próximo mês"
+)
+
+class Marcas(NamedTuple):
+    """Resultado de Lexico.marcar: categorias encontradas na subfrase."""
+    categorias: FrozenSet[str]
+
+def _dados_padrao() -> Dict[str, Any]:
+    return {
+        "nomes_equipe": list(NOMES_EQUIPE),
+        "apelidos": dict(APELIDOS),
+        "pronomes": list(PRONOMES),
+        "negativos": list(NEGATIVOS),
+        "pairing": list(PAIRING),
+        "reuniao": list(REUNIAO),
+        "bloqueio": list(BLOQUEIO),
+        "verbos_passado": list(VERBOS_PASSADO),
+        "verbos_futuro": list(VERBOS_FUTURO),
+        "marcadores_futuro": list(MARCADORES_FUTURO),
+        "auxiliares_futuro": list(AUXILIARES_FUTURO),
+    }
+
+def _regex_trie(frases: List[str]) -> str:
+    """
+    Monta uma alternação fatorada por prefixo (trie) das frases: em cada posição o motor de regex segue um só
+    caminho em vez de tentar todas as alternativas. Quantificadores gulosos fazem a frase mais longa ganhar.
+    """
+    trie: Dict[str, Any] = {}
+    for frase in frases:
+        no = trie
+        for c in frase:
+            no = no.setdefault(c, {})
+        no[""] = True
+
+    def _emitir(no: Dict[str, Any]) -> str:
+        ramos = []
+        for c, filho in sorted((c, f) for c, f in no.items() if c):
+            literal = re.escape(c)
+            # Cadeias sem bifurcação viram um literal só.
+            while len(filho) == 1 and "" not in filho:
+                (c, filho), = filho.items()
+                literal += re.escape(c)
+            ramos.append(literal + _emitir(filho))
+        if not ramos:
+            return ""
+        corpo = "(?:" + "|".join(ramos) + ")"
+        return corpo + "?" if "" in no else corpo
+
+    return _emitir(trie) if trie else r"(?!)"
+
+def _e_palavra(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+def _borda(texto: str, pos: int) -> bool:
+    """Equivalente a \\b do re na posição pos."""
+    antes = pos > 0 and _e_palavra(texto[pos - 1])
+    depois = pos < len(texto) and _e_palavra(texto[pos])
+    return antes != depois
+
+class Lexico:
+    """
+    Léxico compilado uma vez: todas as categorias de frase (pairing, reunião, bloqueio, negativos, formas de passado,
+    marcadores de futuro) viram um único padrão em trie, aplicado em uma passada por subfrase.
+
+    As listas de frases casam como substring (como o `p in subfrase.lower()` antigo) e as de palavras com \\b,
+    conferido em Python. Em cada posição o padrão pega a frase mais longa; as categorias das frases que são prefixo
+    dela (ex.: "fazer" dentro de "fazer pairing com") são somadas na hora, então nada se perde por sobreposição.
+    """
+
+    def __init__(self, dados: Dict[str, Any]):
+        self.dados = dados
+        self.versao = hashlib.sha256(json.dumps(dados, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+        self.nomes_conhecidos = frozenset(dados["nomes_equipe"]) | frozenset(dados["apelidos"].values())
+        self.apelidos = dict(dados["apelidos"])
+        self.pronomes = tuple(p.lower() for p in dados["pronomes"])
+        self.verbos_passado = frozenset(dados["verbos_passado"])
+        self.verbos_futuro = frozenset(dados["verbos_futuro"])
+        self.auxiliares_futuro = frozenset(a.lower() for a in dados["auxiliares_futuro"])
+
+        # frase -> [(categoria, exige_borda)]
+        frases: Dict[str, List[tuple]] = {}
+        def _adicionar(lista, categoria, exige_borda):
+            for frase in lista:
+                frases.setdefault(frase.lower(), []).append((categoria, exige_borda))
+        _adicionar(dados["pairing"], "pairing", False)
+        _adicionar(dados["reuniao"], "reuniao", False)
+        _adicionar(dados["bloqueio"], "bloqueio", False)
+        _adicionar(dados["negativos"], "negativo", False)
+        # Formas "verbo+u" (ex.: "finalizaru") e marcadores de futuro eram testados token a token com \b.
+        # Só entram palavras soltas: um token nunca contém espaço, então frases com espaço nunca casavam.
+        _adicionar([v + "u" for v in dados["verbos_passado"] if " " not in v], "passado", True)
+        _adicionar([m for m in dados["marcadores_futuro"] if " " not in m], "futuro", True)
+
+        # Para cada frase, as frases (inclusive ela) que são prefixo dela, com o tamanho e as categorias.
+        self._prefixos = {
+            frase: [(len(outra), cats) for outra, cats in frases.items() if frase.startswith(outra)]
+            for frase in frases
+        }
+        self._padrao = re.compile(f"(?=({_regex_trie(list(frases))}))", re.IGNORECASE)
+        # O regex de prazo só é usado quando a subfrase é "a fazer" e o EntityRuler não achou PRAZO.
+        self._prazo = re.compile(f"({PRAZO_REGEX})", re.IGNORECASE)
+
+    def marcar(self, texto: str) -> Marcas:
+        """Marca numa única varredura todas as categorias presentes no texto."""
+        categorias = set()
+        for m in self._padrao.finditer(texto):
+            encontrada = m.group(1)
+            inicio = m.start()
+            for tamanho, cats in self._prefixos.get(encontrada.lower(), ()):
+                for categoria, exige_borda in cats:
+                    if categoria in categorias:
+                        continue
+                    if exige_borda and not (_borda(texto, inicio) and _borda(texto, inicio + tamanho)):
+                        continue
+                    categorias.add(categoria)
+        return Marcas(frozenset(categorias))
+
+    def prazo(self, texto: str) -> str:
+        """Primeira expressão de prazo do texto, ou "" se não houver."""
+        m = self._prazo.search(texto)
+        return m.group(0) if m else ""
+
+    def normalizar_nome(self, nome: str) -> str:
+        return self.apelidos.get(nome, " ".join([n.capitalize() for n in nome.split()]))
+
+_lock = threading.Lock()
+_lexico = Lexico(_dados_padrao())
+_mtime: Optional[float] = None
+_ultima_verificacao = float("-inf")
+
+def _aplicar(dados: Dict[str, Any]) -> None:
+    """Atualiza no lugar as listas exportadas por este módulo (e reexportadas por falas/spacy_local)."""
+    for lista, chave in ((NOMES_EQUIPE, "nomes_equipe"), (PRONOMES, "pronomes"), (NEGATIVOS, "negativos"),
+                         (PAIRING, "pairing"), (REUNIAO, "reuniao"), (BLOQUEIO, "bloqueio"),
+                         (VERBOS_PASSADO, "verbos_passado"), (VERBOS_FUTURO, "verbos_futuro"),
+                         (MARCADORES_FUTURO, "marcadores_futuro"), (AUXILIARES_FUTURO, "auxiliares_futuro")):
+        lista[:] = dados[chave]
+    APELIDOS.clear()
+    APELIDOS.update(dados["apelidos"])
+
+def recarregar_lexico(path: str = None) -> Lexico:
+    """
+    Relê o arquivo de léxico (LEXICO_PATH por padrão) e troca o léxico compilado de uma vez.
+    Chaves ausentes no arquivo ficam com o valor padrão. Se o arquivo for inválido, o léxico atual é mantido.
+    """
+    global _lexico, _mtime
+    path = path or LEXICO_PATH
+    with _lock:
+        try:
+            mtime = os.path.getmtime(path)
+            with open(path, encoding="utf-8") as f:
+                arquivo = json.load(f)
+            dados = {**_DADOS_PADRAO, **{k: v for k, v in arquivo.items() if k in _DADOS_PADRAO}}
+            novo = Lexico(dados)
+        except (OSError, ValueError, TypeError, AttributeError, KeyError) as e:
+            logger.error("Falha ao carregar o léxico de %s: %s. Mantendo a versão %s.", path, e, _lexico.versao)
+            return _lexico
+        _aplicar(dados)
+        _lexico, _mtime = novo, mtime
+    logger.info("Léxico carregado de %s (versão %s).", path, novo.versao)
+    return novo
+
+def lexico_atual() -> Lexico:
+    """Léxico em uso. Com LEXICO_PATH, confere o mtime do arquivo de tempos em tempos e recarrega se mudou."""
+    global _ultima_verificacao
+    if not LEXICO_PATH:
+        return _lexico
+    agora = time.monotonic()
+    if agora - _ultima_verificacao < LEXICO_RECARGA_SEGUNDOS:
+        return _lexico
+    _ultima_verificacao = agora
+    try:
+        mtime = os.path.getmtime(LEXICO_PATH)
+    except OSError:
+        return _lexico
+    if mtime != _mtime:
+        return recarregar_lexico()
+    return _lexico
+
+_DADOS_PADRAO = _dados_padrao()
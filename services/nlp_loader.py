@@ -0,0 +1,113 @@
+import logging
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import spacy
+from spacy import util
+
+from utils.config import get_env_var
+
+logger = logging.getLogger(__name__)
+
+# Aceita o nome do pacote ou só o tamanho: "sm", "md" ou "lg" viram pt_core_news_<tamanho>.
+TAMANHOS_MODELO = {"sm", "md", "lg"}
+
+def nome_do_modelo(valor: str) -> str:
+    return f"pt_core_news_{valor}" if valor in TAMANHOS_MODELO else valor
+
+SPACY_MODEL = nome_do_modelo(get_env_var("SPACY_MODEL", default="pt_core_news_lg"))
+
+# Perfil de carga: "completo" carrega o pipeline inteiro; "enxuto" só o que spacy_local usa
+# (sentenças, lemas, morfologia e o EntityRuler de prazos). SPACY_VETORES: auto | manter | remover.
+SPACY_PERFIL = get_env_var("SPACY_PERFIL", default="completo").lower()
+SPACY_VETORES = get_env_var("SPACY_VETORES", default="auto").lower()
+# Lista explícita de componentes a excluir (separados por vírgula); tem prioridade sobre o perfil.
+SPACY_EXCLUIR = get_env_var("SPACY_EXCLUIR", default="")
+
+# Componentes que o perfil enxuto descarta: o parser só servia para as sentenças (o senter faz isso bem mais barato)
+# e o NER estatístico só alimenta o termo de nomes do modo auto (sem ele, o roteador olha só o responsável).
+COMPONENTES_NAO_USADOS = ["parser", "ner"]
+
+# Versão das regras de spacy_local: incremente ao mudar listas/heurísticas para invalidar o cache de resultados.
+VERSAO_REGRAS = "1"
+
+def versao_modelo() -> str:
+    """Versão do pacote do modelo instalado, sem precisar carregá-lo."""
+    try:
+        return metadata.version(SPACY_MODEL)
+    except metadata.PackageNotFoundError:
+        return "desconhecida"
+
+# (versão do léxico, versão do cache): metadata.version lê o disco e custaria ~0,3 ms em cada consulta ao cache.
+_versao_cache: Tuple[str, str] = ("", "")
+
+def versao_cache() -> str:
+    """
+    Versão usada na chave do cache de resultados do provedor spaCy (muda também quando o léxico é recarregado).
+    Fica memorizada por versão do léxico: uma recarga do léxico invalida a memória.
+    """
+    global _versao_cache
+    from services.lexico import lexico_atual
+    lexico = lexico_atual().versao
+    if _versao_cache[0] != lexico:
+        _versao_cache = (lexico, f"{SPACY_MODEL}-{versao_modelo()}/perfil-{SPACY_PERFIL}-{SPACY_VETORES}/regras-{VERSAO_REGRAS}/lexico-{lexico}")
+    return _versao_cache[1]
+
+def _config_modelo() -> Dict[str, Any]:
+    """Lê o config.cfg do modelo sem carregá-lo (pacote instalado ou diretório)."""
+    caminho = util.get_package_path(SPACY_MODEL) if util.is_package(SPACY_MODEL) else Path(SPACY_MODEL)
+    arquivos = [caminho / "config.cfg"] + sorted(caminho.glob("*/config.cfg"))
+    for arquivo in arquivos:
+        if arquivo.exists():
+            return util.load_config(arquivo)
+    raise OSError(f"config.cfg não encontrado para o modelo '{SPACY_MODEL}'")
+
+def _usa_vetores_estaticos(config: Any) -> bool:
+    """True se algum componente usa os vetores estáticos como feature (ex.: tok2vec dos modelos md/lg)."""
+    if isinstance(config, dict):
+        return config.get("include_static_vectors") is True or any(_usa_vetores_estaticos(v) for v in config.values())
+    if isinstance(config, (list, tuple)):
+        return any(_usa_vetores_estaticos(v) for v in config)
+    return False
+
+def perfil_de_carga(config: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """
+    Retorna (exclude, enable) para o spacy.load conforme SPACY_PERFIL, SPACY_EXCLUIR e SPACY_VETORES.
+    Os vetores só saem no modo "auto" se nenhum componente os usa: nos modelos md/lg o tok2vec lê os vetores,
+    e tirá-los muda as predições. Para economizar essa memória, prefira o modelo "sm".
+    """
+    componentes = list(config["nlp"]["pipeline"])
+    excluir, habilitar = [], []
+    if SPACY_EXCLUIR:
+        excluir = [c.strip() for c in SPACY_EXCLUIR.split(",") if c.strip()]
+    elif SPACY_PERFIL == "enxuto":
+        excluir = [c for c in COMPONENTES_NAO_USADOS if c in componentes]
+        if "senter" in componentes:
+            habilitar = ["senter"]
+    elif SPACY_PERFIL != "completo":
+        logger.warning("SPACY_PERFIL '%s' desconhecido; usando 'completo'.", SPACY_PERFIL)
+
+    if SPACY_VETORES == "remover":
+        if _usa_vetores_estaticos(config.get("components", {})):
+            logger.warning("SPACY_VETORES=remover com %s: o tok2vec usa os vetores, a precisão vai cair.", SPACY_MODEL)
+        excluir.append("vectors")
+    elif SPACY_VETORES == "auto" and SPACY_PERFIL == "enxuto" and not _usa_vetores_estaticos(config.get("components", {})):
+        excluir.append("vectors")
+    return excluir, habilitar
+
+def carregar_modelo():
+    """Carrega o modelo spaCy configurado em SPACY_MODEL com o perfil de SPACY_PERFIL."""
+    try:
+        excluir, habilitar = perfil_de_carga(_config_modelo())
+        nlp = spacy.load(SPACY_MODEL, exclude=excluir)
+    except OSError:
+        raise RuntimeError(f"O modelo '{SPACY_MODEL}' do spaCy não está instalado. Rode: python -m spacy download {SPACY_MODEL}")
+    for componente in habilitar:
+        nlp.enable_pipe(componente)
+    if not any(nlp.has_pipe(c) for c in ("parser", "senter", "sentencizer")):
+        # Sem parser nem senter o doc.sents não funciona; o sentencizer por pontuação resolve.
+        nlp.add_pipe("sentencizer", first=True)
+    logger.info("Modelo %s carregado (perfil %s): componentes %s, excluídos %s, vetores %s",
+                SPACY_MODEL, SPACY_PERFIL, nlp.pipe_names, excluir, nlp.vocab.vectors.shape)
+    return nlp
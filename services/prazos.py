@@ -0,0 +1,90 @@
+import re
+import unicodedata
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+
+from dateparser.date import DateDataParser
+
+# Dias da semana como aparecem no EntityRuler de PRAZO (com e sem "-feira").
+DIAS_SEMANA = {
+    "segunda": 0, "terca": 1, "quarta": 2, "quinta": 3, "sexta": 4, "sabado": 5, "domingo": 6,
+}
+MESES = {
+    "janeiro": 1, "fevereiro": 2, "marco": 3, "abril": 4, "maio": 5, "junho": 6,
+    "julho": 7, "agosto": 8, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+    "jan": 1, "fev": 2, "mar": 3, "abr": 4, "mai": 5, "jun": 6,
+    "jul": 7, "ago": 8, "set": 9, "out": 10, "nov": 11, "dez": 12,
+}
+RELATIVOS = {"hoje": 0, "amanha": 1, "depois de amanha": 2, "proxima semana": 7}
+
+DIA_SEMANA_REGEX = re.compile(r"^(segunda|terca|quarta|quinta|sexta|sabado|domingo)(-feira)?$")
+DIA_MES_REGEX = re.compile(r"^(\d{1,2})[/-](\d{1,2})$")
+DIA_DE_MES_REGEX = re.compile(r"^(\d{1,2}) de ([a-z]+)$")
+EM_N_DIAS_REGEX = re.compile(r"^em (\d+) dias?$")
+
+# Mesmas preferências usadas antes em cada chamada, agora fixadas em português e montadas uma vez por data base.
+DATEPARSER_SETTINGS = {"PREFER_DATES_FROM": "future", "DATE_ORDER": "DMY"}
+
+def _normalizar_expr(expr: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados: "Terça-Feira " -> "terca-feira"."""
+    sem_acento = unicodedata.normalize("NFKD", expr.lower())
+    sem_acento = "".join(c for c in sem_acento if not unicodedata.combining(c))
+    return " ".join(sem_acento.split())
+
+def _proxima_data(dia: int, mes: int, base: date) -> Optional[date]:
+    """Próxima ocorrência de dia/mês estritamente depois de base (mesmo critério "future" do dateparser)."""
+    for ano in range(base.year, base.year + 9):
+        try:
+            candidata = date(ano, mes, dia)
+        except ValueError:
+            continue
+        if candidata > base:
+            return candidata
+    return None
+
+def _resolver_tabela(expr: str, base: date) -> Optional[date]:
+    """Resolve as expressões fechadas que o EntityRuler de PRAZO emite. Retorna None se não reconhecer."""
+    if expr in RELATIVOS:
+        return base + timedelta(days=RELATIVOS[expr])
+    m = DIA_SEMANA_REGEX.match(expr)
+    if m:
+        dias = (DIAS_SEMANA[m.group(1)] - base.weekday()) % 7
+        return base + timedelta(days=dias or 7)
+    m = EM_N_DIAS_REGEX.match(expr)
+    if m:
+        return base + timedelta(days=int(m.group(1)))
+    m = DIA_MES_REGEX.match(expr)
+    if m:
+        dia, mes = int(m.group(1)), int(m.group(2))
+        return _proxima_data(dia, mes, base) if 1 <= mes <= 12 else None
+    m = DIA_DE_MES_REGEX.match(expr)
+    if m and m.group(2) in MESES:
+        return _proxima_data(int(m.group(1)), MESES[m.group(2)], base)
+    return None
+
+@lru_cache(maxsize=8)
+def _dateparser_para(base: date) -> DateDataParser:
+    settings = dict(DATEPARSER_SETTINGS, RELATIVE_BASE=datetime.combine(base, datetime.min.time()))
+    return DateDataParser(languages=["pt"], settings=settings)
+
+@lru_cache(maxsize=4096)
+def _resolver(expr: str, base: date) -> str:
+    normalizada = _normalizar_expr(expr)
+    if not normalizada:
+        return ""
+    dt = _resolver_tabela(normalizada, base)
+    if dt is None:
+        dt = _dateparser_para(base).get_date_data(expr).date_obj
+    return dt.strftime("%Y-%m-%d") if dt else ""
+
+def resolver_prazo(expr: str, base_date: datetime = None) -> str:
+    """
+    Resolve a expressão de prazo para AAAA-MM-DD.
+    Tenta primeiro a tabela pré-compilada de expressões do EntityRuler e só cai no dateparser (português)
+    para o que não reconhecer. O resultado é memorizado por (expressão, dia base).
+    """
+    if not expr:
+        return ""
+    base = (base_date or datetime.now()).date()
+    return _resolver(expr, base)
@@ -0,0 +1,105 @@
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from services.falas import separar_falas, agrupar_por_pessoa
+from services.lexico import lexico_atual
+from services.prazos import resolver_prazo
+from services.spacy_pool import get_pool
+from services.validator import postprocess_tasks
+from utils.config import get_env_var
+from utils.metrics import etapa
+
+logger = logging.getLogger(__name__)
+
+CONFIANCA_MINIMA = float(get_env_var("AUTO_CONFIANCA_MINIMA", default="0.5"))
+PESO_COBERTURA = float(get_env_var("AUTO_PESO_COBERTURA", default="0.5"))
+PESO_PRAZOS = float(get_env_var("AUTO_PESO_PRAZOS", default="0.2"))
+PESO_FALANTES = float(get_env_var("AUTO_PESO_FALANTES", default="0.1"))
+PESO_NOMES = float(get_env_var("AUTO_PESO_NOMES", default="0.2"))
+
+def _nome_conhecido(nome: str, conhecidos) -> bool:
+    return nome in conhecidos or nome.split(" ", 1)[0] in conhecidos
+
+def pontuar_bloco(bloco: Dict[str, Any], base_date: datetime = None, falantes: Optional[Set[str]] = None) -> float:
+    """
+    Confiança (0 a 1) no resultado do spaCy para um bloco de fala, combinando:
+    - cobertura: fração das subfrases classificadas como feita/a fazer;
+    - prazos: fração das expressões de prazo que viraram data (1 se não houver prazo);
+    - falantes: fração das pessoas citadas no bloco (o responsável e as entidades PER) que estão entre os falantes
+      que o separar_falas achou no texto. Gente citada que nunca fala sugere narração ("Lucas disse que..."),
+      que as regras atribuem mal;
+    - nomes: 1 menos a proporção de nomes desconhecidos (fora do léxico da equipe) entre as pessoas citadas.
+    `falantes` é o conjunto de responsáveis do texto inteiro; sem ele, vale só o responsável do bloco.
+    """
+    metricas = bloco.get("metricas", {})
+    subfrases = metricas.get("subfrases", 0)
+    classificadas = len(bloco["feitas"]) + len(bloco["a_fazer"])
+    cobertura = min(1.0, classificadas / subfrases) if subfrases else 0.0
+    prazos = [t["prazo"] for t in bloco["a_fazer"] if t.get("prazo")]
+    resolvidos = sum(1 for p in prazos if resolver_prazo(p, base_date)) / len(prazos) if prazos else 1.0
+    citados = {bloco["responsavel"], *metricas.get("nomes", [])}
+    falantes = falantes if falantes is not None else {bloco["responsavel"]}
+    falando = sum(1 for nome in citados if _nome_conhecido(nome, falantes)) / len(citados)
+    conhecidos = lexico_atual().nomes_conhecidos
+    nomes = 1.0 - sum(1 for nome in citados if not _nome_conhecido(nome, conhecidos)) / len(citados)
+    total = PESO_COBERTURA + PESO_PRAZOS + PESO_FALANTES + PESO_NOMES
+    return (PESO_COBERTURA * cobertura + PESO_PRAZOS * resolvidos + PESO_FALANTES * falando + PESO_NOMES * nomes) / total
+
+async def _processar_falas_spacy(falas: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    pool = get_pool()
+    if pool is not None:
+        return await pool.processar_falas(falas)
+    from services.spacy_local import processar_falas
+    return await run_in_threadpool(processar_falas, falas)
+
+async def extract_tasks_auto(texto: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Modo auto: extrai localmente com spaCy e só manda para a Gemini os blocos de fala com confiança abaixo de
+    AUTO_CONFIANCA_MINIMA (em uma única chamada). Sem falas identificadas, o texto inteiro vai para a Gemini.
+    Retorna (resultado, roteamento), onde roteamento diz qual provedor atendeu cada bloco e com que pontuação.
+    Se a Gemini falhar, os blocos escalados ficam com o resultado local.
+    """
+    from services.gemini_llm import extract_tasks_with_gemini_async
+
+    base_date = datetime.now()
+    falas = separar_falas(texto)
+    if not falas:
+        resultado = await extract_tasks_with_gemini_async(texto)
+        return resultado, [{"bloco": None, "responsavel": None, "provedor": "gemini", "score": 0.0}]
+
+    blocos = await _processar_falas_spacy(falas)
+    with etapa("auto", "pontuacao"):
+        falantes = {fala["responsavel"] for fala in falas}
+        scores = [pontuar_bloco(bloco, base_date, falantes) for bloco in blocos]
+    baixos = [i for i, score in enumerate(scores) if score < CONFIANCA_MINIMA and falas[i]["fala"]]
+    provedores = ["spacy"] * len(blocos)
+
+    if baixos:
+        texto_gemini = "\n".join(f"{falas[i]['responsavel']}: {falas[i]['fala']}" for i in baixos)
+        logger.info("Modo auto: %s de %s blocos escalados para a Gemini.", len(baixos), len(blocos))
+        remoto = await extract_tasks_with_gemini_async(texto_gemini)
+        if remoto and "erro" in remoto[0]:
+            logger.warning("Modo auto: Gemini falhou (%s). Mantendo o resultado local.", remoto[0]["erro"])
+            provedores = ["spacy" if i not in baixos else "spacy_fallback" for i in range(len(blocos))]
+        else:
+            # Os itens da Gemini entram no lugar do primeiro bloco escalado daquela pessoa, preservando a ordem.
+            por_pessoa = {p.get("responsavel"): p for p in remoto}
+            for i in baixos:
+                provedores[i] = "gemini"
+                pessoa = por_pessoa.pop(falas[i]["responsavel"], None)
+                blocos[i] = {
+                    "responsavel": falas[i]["responsavel"],
+                    "feitas": (pessoa or {}).get("feitas") or [],
+                    "a_fazer": (pessoa or {}).get("a_fazer") or [],
+                }
+            for pessoa in por_pessoa.values():
+                blocos.append({"responsavel": pessoa.get("responsavel", "Desconhecido"), "feitas": pessoa.get("feitas") or [], "a_fazer": pessoa.get("a_fazer") or []})
+
+    roteamento = [
+        {"bloco": i, "responsavel": falas[i]["responsavel"], "provedor": provedores[i], "score": round(scores[i], 3)}
+        for i in range(len(falas))
+    ]
+    return postprocess_tasks(agrupar_por_pessoa(blocos), base_date=base_date), roteamento
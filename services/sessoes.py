@@ -0,0 +1,310 @@
+"""
+Sessões de transcrição incremental, para dailies ao vivo.
+
+O cliente cria uma sessão, envia só as linhas novas e recebe o resultado atual. O texto é separado em blocos de
+fala a cada envio (separar_falas é só uma regex), mas cada bloco já processado fica guardado pelo hash do seu
+conteúdo: só os blocos novos ou alterados (normalmente o último e os recém-chegados) passam de novo pelo spaCy.
+O agrupamento por pessoa dos blocos que já não mudam também fica guardado e só é refeito a partir do primeiro
+bloco alterado.
+
+O estado processado vive na memória do processo e é limitado por SESSOES_MAX e SESSOES_MAX_MB (LRU) e por
+SESSOES_TTL_SEGUNDOS de inatividade. Com SESSOES_SQLITE_PATH, o texto das sessões também vai para o SQLite:
+qualquer worker do serve.py atende a sessão e, se o estado não estiver na memória dele, reprocessa uma vez.
+Nesse caso as chamadas dos endpoints vão para o threadpool (métodos *_async), como na fila de jobs, e uma leitura
+só renova a validade da sessão no banco uma vez a cada décimo do TTL. As sessões expiradas são apagadas do banco
+a cada SESSOES_LIMPEZA_SEGUNDOS, por uma tarefa em segundo plano, e não a cada requisição.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from services.falas import separar_falas
+from services.nlp_loader import versao_cache
+from services.spacy_pool import processar_falas_async
+from services.validator import postprocess_tasks
+from utils.config import get_env_var
+from utils.metrics import etapa
+
+logger = logging.getLogger(__name__)
+
+class SessaoNaoEncontradaError(Exception):
+    pass
+
+class SessaoMuitoGrandeError(Exception):
+    pass
+
+def chave_bloco(fala: Dict[str, str], ultimo_nome: str, versao: str) -> str:
+    """Hash do conteúdo do bloco. Entra quem falou antes, que decide a correferência de "ele"/"ela"."""
+    base = "\x1f".join([versao, ultimo_nome, fala["responsavel"], fala["fala"]])
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+def _juntar(agrupado: Dict[str, Dict[str, Any]], bloco: Dict[str, Any]) -> None:
+    """Um passo de agrupar_por_pessoa."""
+    pessoa = agrupado.get(bloco["responsavel"])
+    if pessoa is None:
+        pessoa = agrupado[bloco["responsavel"]] = {"responsavel": bloco["responsavel"], "feitas": [], "a_fazer": []}
+    pessoa["feitas"].extend(bloco["feitas"])
+    pessoa["a_fazer"].extend(bloco["a_fazer"])
+
+class Sessao:
+    def __init__(self, id: str, texto: str = ""):
+        self.id = id
+        self.texto = texto
+        self.usada_em = time.monotonic()
+        self.lock = asyncio.Lock()
+        # (chave, bloco processado, tamanho estimado em bytes), na ordem das falas.
+        self.blocos: List[Tuple[str, Dict[str, Any], int]] = []
+        # Agrupamento por pessoa de todos os blocos menos o último, que ainda pode crescer.
+        self._fechados: Dict[str, Dict[str, Any]] = {}
+        self._n_fechados = 0
+        self._bytes_blocos = 0
+
+    @property
+    def tamanho(self) -> int:
+        return len(self.texto) + self._bytes_blocos
+
+    async def atualizar(self) -> Dict[str, Any]:
+        """Reprocessa só os blocos de fala que mudaram desde a última chamada e devolve o resultado atual."""
+        with etapa("sessao", "separar_falas"):
+            falas = separar_falas(self.texto)
+        versao = versao_cache()
+        chaves = [chave_bloco(fala, falas[i - 1]["responsavel"] if i else "", versao) for i, fala in enumerate(falas)]
+        conhecidos = {chave: (bloco, tamanho) for chave, bloco, tamanho in self.blocos}
+        faltando = [i for i, chave in enumerate(chaves) if chave not in conhecidos]
+
+        # Blocos novos vizinhos vão juntos para o spaCy, com o responsável do bloco anterior.
+        i = 0
+        while i < len(faltando):
+            inicio = fim = faltando[i]
+            while i + 1 < len(faltando) and faltando[i + 1] == fim + 1:
+                i += 1
+                fim = faltando[i]
+            i += 1
+            ultimo_nome = falas[inicio - 1]["responsavel"] if inicio else ""
+            processados = await processar_falas_async(falas[inicio:fim + 1], ultimo_nome)
+            for j, bloco in zip(range(inicio, fim + 1), processados):
+                conhecidos[chaves[j]] = (bloco, len(json.dumps(bloco, ensure_ascii=False).encode("utf-8")))
+
+        primeira_mudanca = next((j for j, (a, b) in enumerate(zip(chaves, (c for c, _, _ in self.blocos))) if a != b), None)
+        if primeira_mudanca is None:
+            primeira_mudanca = min(len(chaves), len(self.blocos))
+        self.blocos = [(chave, *conhecidos[chave]) for chave in chaves]
+        self._bytes_blocos = sum(t for _, _, t in self.blocos)
+
+        with etapa("sessao", "agrupar"):
+            n_fechados = max(len(self.blocos) - 1, 0)
+            if primeira_mudanca < self._n_fechados or n_fechados < self._n_fechados:
+                self._fechados, self._n_fechados = {}, 0
+            for _, bloco, _ in self.blocos[self._n_fechados:n_fechados]:
+                _juntar(self._fechados, bloco)
+            self._n_fechados = n_fechados
+            agrupado = {
+                nome: {"responsavel": nome, "feitas": list(p["feitas"]), "a_fazer": [dict(t) for t in p["a_fazer"]]}
+                for nome, p in self._fechados.items()
+            }
+            if self.blocos:
+                ultimo = self.blocos[-1][1]
+                _juntar(agrupado, {**ultimo, "a_fazer": [dict(t) for t in ultimo["a_fazer"]]})
+        with etapa("sessao", "prazos"):
+            resultado = postprocess_tasks(list(agrupado.values()), base_date=datetime.now())
+        return {"sessao": self.id, "resultado": resultado, "blocos": len(falas), "reprocessados": len(faltando)}
+
+class SessionStore:
+    """Sessões do processo, com expiração por inatividade e limite de quantidade e de memória (LRU)."""
+
+    def __init__(self, ttl: float = 3600, max_sessoes: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 max_caracteres: int = 500_000, sqlite_path: Optional[str] = None, limpeza_segundos: float = 60):
+        self.ttl = ttl
+        self.limpeza_segundos = limpeza_segundos
+        self.max_sessoes = max_sessoes
+        self.max_bytes = max_bytes
+        self.max_caracteres = max_caracteres
+        self._sessoes: "OrderedDict[str, Sessao]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.criadas = 0
+        self.expiradas = 0
+        self.despejadas = 0
+        self._manutencao_tarefa: Optional[asyncio.Task] = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            # Vários workers do serve.py no mesmo arquivo: WAL deixa ler durante uma escrita, e quem pega o banco
+            # travado espera um pouco em vez de falhar com "database is locked".
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA busy_timeout=5000")
+            self._db.execute("CREATE TABLE IF NOT EXISTS sessoes (id TEXT PRIMARY KEY, texto TEXT NOT NULL, usada_em REAL NOT NULL)")
+            self._db.commit()
+
+    def _limpar(self) -> None:
+        """Remove as sessões ociosas e, se passar dos limites, as menos usadas. Chamado com o lock."""
+        limite = time.monotonic() - self.ttl
+        for id in [id for id, s in self._sessoes.items() if s.usada_em < limite]:
+            del self._sessoes[id]
+            self.expiradas += 1
+        total = sum(s.tamanho for s in self._sessoes.values())
+        while self._sessoes and (len(self._sessoes) > self.max_sessoes or total > self.max_bytes):
+            _, sessao = self._sessoes.popitem(last=False)
+            total -= sessao.tamanho
+            self.despejadas += 1
+
+    def criar(self, texto: str = "") -> Sessao:
+        self._checar_tamanho(texto)
+        sessao = Sessao(uuid.uuid4().hex, texto)
+        with self._lock:
+            self._sessoes[sessao.id] = sessao
+            self.criadas += 1
+            if self._db is not None:
+                self._db.execute("INSERT INTO sessoes (id, texto, usada_em) VALUES (?, ?, ?)", (sessao.id, texto, time.time()))
+                self._db.commit()
+            self._limpar()
+        return sessao
+
+    async def criar_async(self, texto: str = "") -> Sessao:
+        return await self._fora_do_loop(self.criar, texto)
+
+    def obter(self, id: str) -> Sessao:
+        with self._lock:
+            self._limpar()
+            sessao = self._sessoes.get(id)
+            texto = self._texto_persistido(id)
+            if self._db is not None and texto is None:
+                # Com SQLite, ele é a fonte da verdade: a sessão pode ter sido removida ou expirada em outro worker.
+                self._sessoes.pop(id, None)
+                sessao = None
+            if sessao is None:
+                if texto is None:
+                    raise SessaoNaoEncontradaError(f"Sessão {id} não encontrada ou expirada.")
+                # Sessão criada em outro worker (ou despejada daqui): o estado é refeito a partir do texto.
+                sessao = self._sessoes[id] = Sessao(id, texto)
+            elif texto is not None:
+                sessao.texto = texto
+            sessao.usada_em = time.monotonic()
+            self._sessoes.move_to_end(id)
+            return sessao
+
+    async def obter_async(self, id: str) -> Sessao:
+        return await self._fora_do_loop(self.obter, id)
+
+    def anexar(self, id: str, texto: str) -> Sessao:
+        """Acrescenta linhas ao fim da transcrição da sessão."""
+        sessao = self.obter(id)
+        novo = f"{sessao.texto}\n{texto}" if sessao.texto else texto
+        self._checar_tamanho(novo)
+        with self._lock:
+            if self._db is not None:
+                # Concatenação no próprio SQLite: dois workers anexando à mesma sessão não perdem linhas.
+                self._db.execute(
+                    "UPDATE sessoes SET texto = CASE WHEN texto = '' THEN ? ELSE texto || char(10) || ? END, usada_em = ? WHERE id = ?",
+                    (texto, texto, time.time(), id),
+                )
+                self._db.commit()
+                novo = self._texto_persistido(id)
+            sessao.texto = novo
+        return sessao
+
+    async def anexar_async(self, id: str, texto: str) -> Sessao:
+        return await self._fora_do_loop(self.anexar, id, texto)
+
+    def remover(self, id: str) -> None:
+        with self._lock:
+            existia = self._sessoes.pop(id, None) is not None
+            if self._db is not None:
+                existia = self._db.execute("DELETE FROM sessoes WHERE id = ?", (id,)).rowcount > 0 or existia
+                self._db.commit()
+        if not existia:
+            raise SessaoNaoEncontradaError(f"Sessão {id} não encontrada ou expirada.")
+
+    async def remover_async(self, id: str) -> None:
+        await self._fora_do_loop(self.remover, id)
+
+    async def _fora_do_loop(self, operacao, *args):
+        # Só na memória as operações são instantâneas e não valem o salto para o threadpool.
+        if self._db is None:
+            return operacao(*args)
+        return await run_in_threadpool(operacao, *args)
+
+    def _texto_persistido(self, id: str) -> Optional[str]:
+        if self._db is None:
+            return None
+        agora = time.time()
+        linha = self._db.execute(
+            "SELECT texto, usada_em FROM sessoes WHERE id = ? AND usada_em >= ?", (id, agora - self.ttl)
+        ).fetchone()
+        if linha is None:
+            return None
+        if agora - linha[1] > self.ttl / 10:
+            # Ler não precisa virar escrita toda vez: a validade no banco é renovada aos poucos.
+            self._db.execute("UPDATE sessoes SET usada_em = ? WHERE id = ?", (agora, id))
+            self._db.commit()
+        return linha[0]
+
+    def _limpar_persistido(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessoes WHERE usada_em < ?", (time.time() - self.ttl,))
+            self._db.commit()
+
+    async def _manutencao(self) -> None:
+        while True:
+            await asyncio.sleep(self.limpeza_segundos)
+            try:
+                await run_in_threadpool(self._limpar_persistido)
+            except sqlite3.Error:
+                logger.exception("Erro na limpeza das sessões no SQLite")
+
+    def start(self) -> None:
+        """Com SQLite, sobe a limpeza periódica das sessões expiradas no event loop atual (chamado no lifespan)."""
+        if self._db is not None and self._manutencao_tarefa is None:
+            self._manutencao_tarefa = asyncio.create_task(self._manutencao())
+
+    async def stop(self) -> None:
+        if self._manutencao_tarefa is not None:
+            self._manutencao_tarefa.cancel()
+            await asyncio.gather(self._manutencao_tarefa, return_exceptions=True)
+            self._manutencao_tarefa = None
+
+    def _checar_tamanho(self, texto: str) -> None:
+        if len(texto) > self.max_caracteres:
+            raise SessaoMuitoGrandeError(f"A transcrição da sessão passou de {self.max_caracteres} caracteres.")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessoes": len(self._sessoes),
+                "bytes": sum(s.tamanho for s in self._sessoes.values()),
+                "max_sessoes": self.max_sessoes,
+                "max_bytes": self.max_bytes,
+                "criadas": self.criadas,
+                "expiradas": self.expiradas,
+                "despejadas": self.despejadas,
+                "persistente": self._db is not None,
+            }
+
+_store: Optional[SessionStore] = None
+
+def get_session_store() -> SessionStore:
+    """
+    Retorna as sessões do processo, configuradas por SESSOES_TTL_SEGUNDOS, SESSOES_MAX, SESSOES_MAX_MB,
+    SESSOES_MAX_CARACTERES, SESSOES_SQLITE_PATH e SESSOES_LIMPEZA_SEGUNDOS.
+    """
+    global _store
+    if _store is None:
+        _store = SessionStore(
+            ttl=float(get_env_var("SESSOES_TTL_SEGUNDOS", default="3600")),
+            max_sessoes=int(get_env_var("SESSOES_MAX", default="1000")),
+            max_bytes=int(float(get_env_var("SESSOES_MAX_MB", default="64")) * 1024 * 1024),
+            max_caracteres=int(get_env_var("SESSOES_MAX_CARACTERES", default="500000")),
+            sqlite_path=get_env_var("SESSOES_SQLITE_PATH") or None,
+            limpeza_segundos=float(get_env_var("SESSOES_LIMPEZA_SEGUNDOS", default="60")),
+        )
+        logger.info("Sessões incrementais iniciadas: %s", _store.stats())
+    return _store
@@ -1,39 +1,35 @@
-import spacy
-from typing import List, Dict, Any
+from spacy.tokens import Doc, Span
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 import re
+import threading
+import time
 from services.validator import postprocess_tasks, normalize_date
 import logging
-from collections import defaultdict
+from services.falas import normalize_nome, separar_falas, agrupar_por_pessoa, AgrupadorIncremental
+from services.lexico import (  # noqa: F401
+    PRONOMES, NEGATIVOS, PAIRING, REUNIAO, BLOQUEIO, VERBOS_PASSADO, VERBOS_FUTURO, Marcas, lexico_atual,
+)
+from services.nlp_loader import carregar_modelo
+from utils.config import get_env_var
+from utils.metrics import etapa, medindo, registrar_etapa, TEXTOS_PROCESSADOS, FALANTES_PROCESSADOS
 
 logger = logging.getLogger(__name__)
 
-try:
-    nlp = spacy.load("pt_core_news_lg")
-except OSError:
-    raise RuntimeError("O modelo 'pt_core_news_lg' do spaCy não está instalado. Rode: python -m spacy download pt_core_news_lg")
+# Parse único: cada bloco de fala é analisado uma vez e as subfrases viram Spans do mesmo Doc.
+# Com SPACY_SINGLE_PARSE=false volta ao comportamento antigo (nlp() por subfrase), útil para comparação.
+SINGLE_PARSE = get_env_var("SPACY_SINGLE_PARSE", default="true").lower() == "true"
+PIPE_BATCH_SIZE = int(get_env_var("SPACY_PIPE_BATCH_SIZE", default="32"))
+# No streaming o lote é pequeno para o primeiro responsável sair logo.
+STREAM_BATCH_SIZE = int(get_env_var("SPACY_STREAM_BATCH_SIZE", default="1"))
 
-# Padrões e listas globais
-NOMES_EQUIPE = [
-    "Eduardo", "João", "Alessandra", "Alê", "Vinícius", "Vini", "Isabela", "Isa", "Caio", "Marcela", "Leonardo", "Leozão", "Ana", "Renata"
-]
-APELIDOS = {"Alê": "Alessandra", "Vini": "Vinícius", "Isa": "Isabela", "Leozão": "Leonardo"}
-PRONOMES = ["ele", "ela", "dele", "dela"]
-NEGATIVOS = [
-    "não consegui", "não terminei", "não deu tempo", "não consegui finalizar", "não consegui entregar", "não consegui implementar", "não consegui corrigir"
-]
-PAIRING = ["pairing com", "parear com", "fazer pairing com", "em dupla com"]
-REUNIAO = ["reunião com", "call com", "encontro com"]
-BLOQUEIO = ["bloqueado por", "impedido por", "dependendo de", "aguardando"]
-VERBOS_PASSADO = [
-    "corrigir", "fazer", "concluir", "finalizar", "terminar", "realizar", "entregar", "implementar", "testar", "revisar", "desenvolver", "validar", "aprovar", "ajustar", "refatorar", "subir", "atualizar", "alinhar", "criar", "preparar", "marcar", "rever"
-]
-VERBOS_FUTURO = VERBOS_PASSADO + [
-    "precisar", "dever", "planejar", "pretender"
-]
+nlp = carregar_modelo()
+
+# Listas globais (PRONOMES, NEGATIVOS, PAIRING, ...) vêm de services.lexico, que as recarrega de LEXICO_PATH sem restart.
 
 # EntityRuler para prazos e tarefas
-ruler = nlp.add_pipe("entity_ruler", before="ner", config={"overwrite_ents": True})
-ruler.add_patterns([
+# No perfil enxuto não há NER estatístico: o ruler vai para o fim do pipeline.
+ruler = nlp.add_pipe("entity_ruler", config={"overwrite_ents": True}, **({"before": "ner"} if nlp.has_pipe("ner") else {}))
+PADROES_PRAZO = [
     {"label": "PRAZO", "pattern": "amanhã"},
     {"label": "PRAZO", "pattern": "hoje"},
     {"label": "PRAZO", "pattern": "depois de amanhã"},
@@ -41,51 +37,90 @@ ruler.add_patterns([
     {"label": "PRAZO", "pattern": {"REGEX": r"\\b(segunda|terça|quarta|quinta|sexta|sábado|domingo)(-feira)?\\b"}},
     {"label": "PRAZO", "pattern": {"REGEX": r"\\b(\d{1,2}/\d{1,2}|\d{1,2}-\d{1,2}|\d{1,2} de [a-zç]+)\\b"}},
     {"label": "PRAZO", "pattern": {"REGEX": r"\\b(at[eé] [a-zç]+|em [0-9]+ dias?|no pr[oó]ximo m[eê]s)\\b"}},
-] + [
-    {"label": "TAREFA", "pattern": [{"LEMMA": verbo}]} for verbo in VERBOS_PASSADO
-])
+]
+
+def _padroes_tarefa(verbos: Iterable[str]) -> List[Dict[str, Any]]:
+    return [{"label": "TAREFA", "pattern": [{"LEMMA": verbo}]} for verbo in sorted(verbos)]
+
+# Os padrões TAREFA vêm dos verbos do léxico: numa recarga do léxico, _sincronizar_ruler os refaz.
+_ruler_lock = threading.Lock()
+_versao_ruler = lexico_atual().versao
+ruler.add_patterns(PADROES_PRAZO + _padroes_tarefa(lexico_atual().verbos_passado))
 
-def normalize_nome(nome: str) -> str:
-    """Normaliza nomes e apelidos conhecidos para nomes completos e capitalizados. Não agrupa nomes diferentes."""
-    nome = nome.strip()
-    # Só normaliza apelidos conhecidos, não nomes diferentes
-    return APELIDOS.get(nome, " ".join([n.capitalize() for n in nome.split()]))
+def _sincronizar_ruler() -> None:
+    """Refaz os padrões do EntityRuler se o léxico foi recarregado desde a última vez (os regex do léxico já seguem sozinhos)."""
+    global _versao_ruler
+    lexico = lexico_atual()
+    if lexico.versao == _versao_ruler:
+        return
+    with _ruler_lock:
+        if lexico.versao != _versao_ruler:
+            ruler.clear()
+            ruler.add_patterns(PADROES_PRAZO + _padroes_tarefa(lexico.verbos_passado))
+            _versao_ruler = lexico.versao
+
+SEPARADORES_SUBFRASE = ["e", "mas", "ou", ";", ",", ".", "hoje", "ontem", "amanhã"]
+SEPARADORES_REGEX = re.compile(r"\b(e|mas|ou|;|,|\.|hoje|ontem|amanhã)\b")
+
+def _limites_subfrases(frase: str) -> List[Tuple[int, int]]:
+    """Retorna os offsets (início, fim) de cada subfrase, já sem espaços nas pontas, na mesma ordem de split_subfrases."""
+    limites = []
+    pos = 0
+    for m in SEPARADORES_REGEX.finditer(frase):
+        limites.append((pos, m.start()))
+        pos = m.end()
+    limites.append((pos, len(frase)))
+    resultado = []
+    for inicio, fim in limites:
+        trecho = frase[inicio:fim]
+        if not trecho or trecho.strip() in SEPARADORES_SUBFRASE:
+            continue
+        inicio += len(trecho) - len(trecho.lstrip())
+        fim -= len(trecho) - len(trecho.rstrip())
+        resultado.append((inicio, max(inicio, fim)))
+    return resultado
 
 def split_subfrases(frase: str) -> List[str]:
     """Divide frases por conjunções, pontuação e marcadores temporais."""
-    return [s.strip() for s in re.split(r"\b(e|mas|ou|;|,|\.|hoje|ontem|amanhã)\b", frase) if s and s.strip() not in ["e", "mas", "ou", ";", ",", ".", "hoje", "ontem", "amanhã"]]
-
-def is_passado(doc) -> bool:
-    """Detecta se a subfrase (spaCy doc) está no passado com base em lemas e morfologia."""
-    for token in doc:
-        if token.lemma_ in VERBOS_PASSADO and "Past" in token.morph.get("Tense"):
-            return True
-        if re.search(r"\b({})\b".format("|".join([v+"u" for v in VERBOS_PASSADO])), token.text, re.IGNORECASE):
-            return True
-    if any(neg in doc.text.lower() for neg in NEGATIVOS):
-        return False
-    return False
-
-def is_futuro(doc) -> bool:
-    """Detecta se a subfrase (spaCy doc) está no futuro ou intenção."""
-    for token in doc:
-        if token.lemma_ in VERBOS_FUTURO and ("Fut" in token.morph.get("Tense") or token.text.lower() in ["vai", "irá", "deverá", "precisará"]):
-            return True
-        if re.search(r"\b(vai|irá|deverá|precisa|precisará|deve|fará|fazer|começar|começará|iniciar|iniciará|planeja|planejar|pretende|pretender|a fazer|pendente|ficou de|vai entregar|deveriam|deverá|deveriam)\b", token.text, re.IGNORECASE):
-            return True
-    if any(neg in doc.text.lower() for neg in NEGATIVOS):
+    return [frase[inicio:fim] for inicio, fim in _limites_subfrases(frase)]
+
+def split_subfrases_spans(sent: Span) -> List[Tuple[str, Span]]:
+    """Divide uma sentença em subfrases como Spans do mesmo Doc, sem rodar o pipeline de novo."""
+    doc = sent.doc
+    subfrases = []
+    for inicio, fim in _limites_subfrases(sent.text):
+        if inicio == fim:
+            continue
+        span = doc.char_span(sent.start_char + inicio, sent.start_char + fim, alignment_mode="expand")
+        if span is not None:
+            subfrases.append((sent.text[inicio:fim], span))
+    return subfrases
+
+def is_passado(doc, marcas: Marcas = None) -> bool:
+    """Detecta se a subfrase (spaCy Doc ou Span) está no passado com base em lemas e morfologia."""
+    lexico = lexico_atual()
+    marcas = marcas or lexico.marcar(doc.text)
+    if "passado" in marcas.categorias:
+        return True
+    return any(token.lemma_ in lexico.verbos_passado and "Past" in token.morph.get("Tense") for token in doc)
+
+def is_futuro(doc, marcas: Marcas = None) -> bool:
+    """Detecta se a subfrase (spaCy Doc ou Span) está no futuro ou intenção."""
+    lexico = lexico_atual()
+    marcas = marcas or lexico.marcar(doc.text)
+    if "futuro" in marcas.categorias or "negativo" in marcas.categorias:
         return True
-    return False
+    return any(
+        token.lemma_ in lexico.verbos_futuro and ("Fut" in token.morph.get("Tense") or token.lower_ in lexico.auxiliares_futuro)
+        for token in doc
+    )
 
 def extrair_prazo(doc) -> str:
-    """Extrai prazos de uma subfrase (spaCy doc) usando entidades e regex."""
+    """Extrai prazos de uma subfrase (spaCy Doc ou Span) usando entidades e regex."""
     for ent in doc.ents:
         if ent.label_ == "PRAZO":
             return ent.text
-    m = re.search(r"(amanhã|hoje|depois de amanhã|próxima semana|[0-9]{1,2}/[0-9]{1,2}|[0-9]{1,2}-[0-9]{1,2}|[0-9]{1,2} de [a-zç]+|segunda-feira|terça-feira|quarta-feira|quinta-feira|sexta-feira|sábado|domingo|até [a-zç]+|em [0-9]+ dias?|no próximo mês)", doc.text, re.IGNORECASE)
-    if m:
-        return m.group(0)
-    return ""
+    return lexico_atual().prazo(doc.text)
 
 def normalizar_data_prazo(prazo: str) -> str:
     """Normaliza prazos relativos para data absoluta."""
@@ -97,82 +132,125 @@ def identificar_padrao(subfrase: str, padroes: List[str]) -> bool:
 
 def coreferencia_simples(subfrase: str, ultimo_nome: str) -> str:
     """Se subfrase começa com pronome, retorna último nome citado."""
-    for pron in PRONOMES:
-        if subfrase.lower().startswith(pron):
-            return ultimo_nome
+    if subfrase.lower().startswith(lexico_atual().pronomes):
+        return ultimo_nome
     return ""
 
-def separar_falas(texto: str) -> List[Dict[str, str]]:
-    """Separa o texto em blocos de fala por participante, tolerando espaços e quebras de linha."""
-    # Regex: início de linha, possíveis espaços, nome (letra maiúscula/acento), dois pontos
-    blocos = re.split(r'(?m)^[ \t]*([A-ZÁÉÍÓÚÂÊÔÃÕÇ][\wáéíóúâêôãõç\s]*)\s*:', texto)
-    falas = []
-    i = 1
-    while i < len(blocos):
-        nome = blocos[i].strip()
-        fala = blocos[i+1].strip() if i+1 < len(blocos) else ""
-        falas.append({"responsavel": normalize_nome(nome), "fala": fala})
-        i += 2
-    if not falas:
-        logger.warning(f"Nenhuma fala separada! Texto: {texto[:200]}")
-    else:
-        logger.debug(f"Falas separadas: {[f['responsavel'] for f in falas]}")
-    return falas
-
-def agrupar_por_pessoa(lista_falas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Agrupa tarefas feitas e a fazer por responsável, sem misturar nomes diferentes."""
-    agrupado = {}
-    for item in lista_falas:
-        nome = item["responsavel"]
-        if nome not in agrupado:
-            agrupado[nome] = {"responsavel": nome, "feitas": [], "a_fazer": []}
-        agrupado[nome]["feitas"].extend(item["feitas"])
-        agrupado[nome]["a_fazer"].extend(item["a_fazer"])
-    # Debug: print agrupamento se houver nomes diferentes agrupados
-    if len(agrupado) != len(lista_falas):
-        logger.debug(f"Agrupamento de responsáveis: {list(agrupado.keys())}")
-    return list(agrupado.values())
+def _subfrases_do_bloco(doc: Doc) -> Iterable[Tuple[str, Any]]:
+    """Gera (texto, doc) de cada subfrase do bloco, reaproveitando o parse do bloco quando SINGLE_PARSE está ativo."""
+    for sent in doc.sents:
+        if SINGLE_PARSE:
+            yield from split_subfrases_spans(sent)
+        else:
+            for sub in split_subfrases(sent.text.strip()):
+                if sub:
+                    yield sub, nlp(sub)
 
-def extract_tasks_with_spacy(texto: str) -> List[Dict[str, Any]]:
+# Categorias que viram item "a fazer" direto, na ordem de prioridade, com a descrição de cada uma.
+ORDEM_CATEGORIAS = ("pairing", "reuniao", "bloqueio", "negativo")
+DESCRICOES = {"pairing": "pairing", "reuniao": "reunião", "bloqueio": "bloqueio", "negativo": "pendente/impedimento"}
+
+def _processar_bloco(doc: Doc, pessoa: str, ultimo_nome: str) -> Dict[str, Any]:
     """
-    Extrai tarefas feitas e a fazer de um texto de daily/reunião, agrupando por responsável.
-    Usa heurísticas de NLP, padrões e regras para identificar tarefas, prazos, pairing, reuniões, bloqueios e impedimentos.
+    Classifica as subfrases de um bloco de fala já processado pelo spaCy.
+    Em "metricas" vão quantas subfrases o bloco tinha e os nomes de pessoa (entidades PER) citados nele, usados
+    pelo roteador do modo auto para medir a cobertura e a proporção de nomes desconhecidos.
     """
-    falas = separar_falas(texto)
-    resultado = []
-    ultimo_nome = ""
+    feitas = []
+    a_fazer = []
+    subfrases = 0
+    lexico = lexico_atual()
+    for sub, doc_sub in _subfrases_do_bloco(doc):
+        subfrases += 1
+        responsavel = coreferencia_simples(sub, ultimo_nome) or pessoa
+        # Uma varredura do léxico compilado marca todas as categorias e o prazo da subfrase.
+        marcas = lexico.marcar(sub)
+        descricao = next((DESCRICOES[c] for c in ORDEM_CATEGORIAS if c in marcas.categorias), None)
+        if descricao:
+            a_fazer.append({"task": sub, "prazo": "", "data_prazo": "", "descricao": descricao})
+            continue
+        if is_passado(doc_sub, marcas):
+            feitas.append(sub)
+        elif is_futuro(doc_sub, marcas):
+            # data_prazo é resolvida uma única vez, em postprocess_tasks.
+            a_fazer.append({"task": sub, "prazo": extrair_prazo(doc_sub), "data_prazo": "", "descricao": ""})
+    # Sem o NER (perfil enxuto) a lista fica vazia e o roteador considera só o responsável.
+    nomes = [normalize_nome(ent.text) for ent in doc.ents if ent.label_ == "PER"]
+    return {"responsavel": pessoa, "feitas": feitas, "a_fazer": a_fazer, "metricas": {"subfrases": subfrases, "nomes": nomes}}
+
+def processar_falas(falas: List[Dict[str, str]], batch_size: int = None, ultimo_nome: str = "") -> List[Dict[str, Any]]:
+    """
+    Processa todos os blocos de fala num único lote nlp.pipe e retorna o resultado de cada bloco, na ordem.
+    ultimo_nome é o responsável do bloco anterior, quando a lista é um trecho de uma transcrição maior.
+    """
+    return list(iter_processar_falas(falas, batch_size=batch_size, ultimo_nome=ultimo_nome))
+
+def iter_processar_falas(falas: List[Dict[str, str]], batch_size: int = None, ultimo_nome: str = "") -> Iterator[Dict[str, Any]]:
+    """Como processar_falas, mas entrega cada bloco assim que ele é processado."""
+    _sincronizar_ruler()
+    docs = iter(nlp.pipe((bloco["fala"] for bloco in falas), batch_size=batch_size or PIPE_BATCH_SIZE))
+    # O nlp.pipe é preguiçoso e intercala com a classificação: os dois tempos são somados bloco a bloco.
+    tempo_nlp = tempo_classificacao = 0.0
     for bloco in falas:
-        pessoa = bloco["responsavel"]
-        fala = bloco["fala"]
-        feitas = []
-        a_fazer = []
-        frases = [sent.text.strip() for sent in nlp(fala).sents]
-        for frase in frases:
-            subfrases = split_subfrases(frase)
-            for sub in subfrases:
-                doc_sub = nlp(sub)
-                responsavel = coreferencia_simples(sub, ultimo_nome) or pessoa
-                if identificar_padrao(sub, PAIRING):
-                    a_fazer.append({"task": sub, "prazo": "", "data_prazo": "", "descricao": "pairing"})
-                    continue
-                if identificar_padrao(sub, REUNIAO):
-                    a_fazer.append({"task": sub, "prazo": "", "data_prazo": "", "descricao": "reunião"})
-                    continue
-                if identificar_padrao(sub, BLOQUEIO):
-                    a_fazer.append({"task": sub, "prazo": "", "data_prazo": "", "descricao": "bloqueio"})
-                    continue
-                if identificar_padrao(sub, NEGATIVOS):
-                    a_fazer.append({"task": sub, "prazo": "", "data_prazo": "", "descricao": "pendente/impedimento"})
-                    continue
-                if is_passado(doc_sub):
-                    feitas.append(sub)
-                elif is_futuro(doc_sub):
-                    prazo = extrair_prazo(doc_sub)
-                    data_prazo = normalizar_data_prazo(prazo)
-                    a_fazer.append({"task": sub, "prazo": prazo, "data_prazo": data_prazo, "descricao": ""})
-        resultado.append({"responsavel": pessoa, "feitas": feitas, "a_fazer": a_fazer})
-        ultimo_nome = pessoa
-    agrupado = agrupar_por_pessoa(resultado)
+        inicio = time.perf_counter()
+        doc = next(docs)
+        parseado = time.perf_counter()
+        resultado = _processar_bloco(doc, bloco["responsavel"], ultimo_nome)
+        tempo_nlp += parseado - inicio
+        tempo_classificacao += time.perf_counter() - parseado
+        ultimo_nome = bloco["responsavel"]
+        yield resultado
+    if falas and medindo():
+        registrar_etapa("spacy", "nlp_pipe", tempo_nlp)
+        registrar_etapa("spacy", "classificacao", tempo_classificacao)
+        FALANTES_PROCESSADOS.inc(len(falas), provedor="spacy")
+
+def _consolidar(texto: str, resultado: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Agrupa os blocos processados por responsável e resolve os prazos."""
+    with etapa("spacy", "agrupar"):
+        agrupado = agrupar_por_pessoa(resultado)
     if not any(p["feitas"] or p["a_fazer"] for p in agrupado):
         logger.warning(f"NENHUMA TAREFA extraída para o texto: {texto}")
-    return postprocess_tasks(agrupado) 
\ No newline at end of file
+    with etapa("spacy", "prazos"):
+        resultado = postprocess_tasks(agrupado)
+    TEXTOS_PROCESSADOS.inc(provedor="spacy")
+    return resultado
+
+def extract_tasks_with_spacy(texto: str) -> List[Dict[str, Any]]:
+    """
+    Extrai tarefas feitas e a fazer de um texto de daily/reunião, agrupando por responsável.
+    Usa heurísticas de NLP, padrões e regras para identificar tarefas, prazos, pairing, reuniões, bloqueios e impedimentos.
+    """
+    with etapa("spacy", "separar_falas"):
+        falas = separar_falas(texto)
+    return _consolidar(texto, processar_falas(falas))
+
+def extract_tasks_with_spacy_batch(textos: List[str], batch_size: int = None, n_process: int = 1) -> List[List[Dict[str, Any]]]:
+    """
+    Versão em lote de extract_tasks_with_spacy: os blocos de fala de todos os textos passam por um único nlp.pipe.
+    Retorna um resultado por texto, na mesma ordem.
+    """
+    with etapa("spacy", "separar_falas"):
+        falas_por_texto = [separar_falas(texto) for texto in textos]
+    todas = [(i, bloco) for i, falas in enumerate(falas_por_texto) for bloco in falas]
+    _sincronizar_ruler()
+    docs = nlp.pipe((bloco["fala"] for _, bloco in todas), batch_size=batch_size or PIPE_BATCH_SIZE, n_process=n_process)
+    blocos_por_texto = [[] for _ in textos]
+    ultimo_nome = [""] * len(textos)
+    # Com n_process > 1 o parse roda em outros processos; aqui o tempo do lote inteiro (parse + classificação).
+    with etapa("spacy", "lote_nlp_pipe"):
+        for (i, bloco), doc in zip(todas, docs):
+            blocos_por_texto[i].append(_processar_bloco(doc, bloco["responsavel"], ultimo_nome[i]))
+            ultimo_nome[i] = bloco["responsavel"]
+    FALANTES_PROCESSADOS.inc(len(todas), provedor="spacy")
+    return [_consolidar(texto, blocos) for texto, blocos in zip(textos, blocos_por_texto)]
+
+def stream_tasks_with_spacy(texto: str) -> Iterator[Dict[str, Any]]:
+    """
+    Versão em streaming de extract_tasks_with_spacy: gera um evento por bloco de fala assim que ele é processado
+    ("responsavel" ou "patch") e, no fim, um evento "fim" com o resultado agrupado completo.
+    """
+    agrupador = AgrupadorIncremental()
+    for bloco in iter_processar_falas(separar_falas(texto), batch_size=STREAM_BATCH_SIZE):
+        yield agrupador.adicionar(bloco)
+    yield {"evento": "fim", "dados": agrupador.resultado()}
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+
+from services.falas import separar_falas, agrupar_por_pessoa, AgrupadorIncremental
+from services.validator import postprocess_tasks
+from utils.config import get_env_var
+from utils.metrics import etapa, registrar_etapa, coletar_tempos, FALANTES_PROCESSADOS, TEXTOS_PROCESSADOS
+
+logger = logging.getLogger(__name__)
+
+class PoolSaturadoError(Exception):
+    """A fila do pool de processos spaCy está cheia."""
+
+class PoolTimeoutError(Exception):
+    """Um job do pool de processos spaCy passou do tempo limite."""
+
+def _inicializar_worker() -> None:
+    # Com forkserver o modelo já vem carregado do processo servidor; o import só garante isso.
+    import services.spacy_local  # noqa: F401
+
+def _processar_falas_worker(falas: List[Dict[str, str]], ultimo_nome: str) -> Tuple[List[Dict[str, Any]], List[Tuple[str, str, float]]]:
+    """Roda no worker; devolve também os tempos das etapas, que são registrados no processo do app."""
+    from services.spacy_local import processar_falas
+    with coletar_tempos() as tempos:
+        blocos = processar_falas(falas, ultimo_nome=ultimo_nome)
+    return blocos, tempos
+
+def _dividir(falas: List[Dict[str, str]], partes: int) -> List[List[Dict[str, str]]]:
+    """Divide os blocos de fala em até `partes` trechos contíguos de tamanho parecido."""
+    partes = max(1, min(partes, len(falas)))
+    tamanho, resto = divmod(len(falas), partes)
+    trechos, inicio = [], 0
+    for i in range(partes):
+        fim = inicio + tamanho + (1 if i < resto else 0)
+        trechos.append(falas[inicio:fim])
+        inicio = fim
+    return trechos
+
+class SpacyPool:
+    """
+    Pool de processos com um `nlp` carregado em cada worker, para usar mais de um núcleo com o spaCy.
+    Os workers saem de um forkserver que pré-carrega o modelo, então compartilham as páginas por copy-on-write.
+    O compartilhamento é só dentro do pool: cada processo web do serve.py sobe o seu forkserver, com a sua cópia do
+    modelo (ver workers_do_processo). Tem fila limitada, timeout por job e reciclagem dos workers depois de N jobs.
+    """
+
+    def __init__(self, workers: int, max_fila: int = 32, timeout: float = 60, max_jobs_por_worker: Optional[int] = 500, dividir_blocos: bool = False):
+        self.workers = workers
+        self.max_fila = max_fila
+        self.timeout = timeout
+        self.dividir_blocos = dividir_blocos
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["services.spacy_local"])
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_inicializar_worker,
+            max_tasks_per_child=max_jobs_por_worker or None,
+        )
+        self._lock = threading.Lock()
+        self.em_andamento = 0
+        self.concluidos = 0
+        self.rejeitados = 0
+        self.timeouts = 0
+
+    def _reservar(self, jobs: int) -> None:
+        with self._lock:
+            if self.em_andamento + jobs > self.workers + self.max_fila:
+                self.rejeitados += 1
+                raise PoolSaturadoError("Fila do spaCy cheia. Tente novamente em instantes.")
+            self.em_andamento += jobs
+
+    def _liberar(self, jobs: int) -> None:
+        with self._lock:
+            self.em_andamento -= jobs
+            self.concluidos += jobs
+
+    async def processar_falas(self, falas: List[Dict[str, str]], ultimo_nome: str = "") -> List[Dict[str, Any]]:
+        """
+        Processa os blocos de fala no pool, opcionalmente dividindo-os entre vários workers.
+        ultimo_nome é o responsável do bloco anterior, quando a lista é um trecho de uma transcrição maior.
+        """
+        if not falas:
+            return []
+        trechos = _dividir(falas, self.workers) if self.dividir_blocos else [falas]
+        self._reservar(len(trechos))
+        futuros = []
+        try:
+            for i, trecho in enumerate(trechos):
+                # O primeiro bloco de cada trecho precisa saber quem falou antes dele.
+                anterior = trechos[i - 1][-1]["responsavel"] if i > 0 else ultimo_nome
+                futuro = self._executor.submit(_processar_falas_worker, trecho, anterior)
+                # A vaga só volta quando o job termina de fato no worker: um job em execução não pode ser
+                # cancelado, então liberar no timeout deixaria entrar mais jobs do que o pool consegue rodar.
+                futuro.add_done_callback(lambda _: self._liberar(1))
+                futuros.append(futuro)
+        except BaseException:
+            self._liberar(len(trechos) - len(futuros))
+            raise
+        try:
+            # Inclui a espera na fila do pool e o IPC, além do trabalho nos workers.
+            with etapa("spacy", "pool"):
+                partes = await asyncio.wait_for(asyncio.gather(*(asyncio.wrap_future(f) for f in futuros)), timeout=self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # Os que ainda nem começaram saem da fila (e liberam a vaga); os que já rodam seguram a vaga até o fim.
+            for futuro in futuros:
+                futuro.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeoutError(f"Extração com spaCy passou de {self.timeout}s.")
+        for _, tempos in partes:
+            for provedor, nome, segundos in tempos:
+                registrar_etapa(provedor, nome, segundos)
+        FALANTES_PROCESSADOS.inc(len(falas), provedor="spacy")
+        return [bloco for blocos, _ in partes for bloco in blocos]
+
+    async def extract_tasks(self, texto: str) -> List[Dict[str, Any]]:
+        """Equivalente assíncrono de extract_tasks_with_spacy, executado no pool."""
+        with etapa("spacy", "separar_falas"):
+            falas = separar_falas(texto)
+        blocos = await self.processar_falas(falas)
+        with etapa("spacy", "agrupar"):
+            agrupado = agrupar_por_pessoa(blocos)
+        if not any(p["feitas"] or p["a_fazer"] for p in agrupado):
+            logger.warning(f"NENHUMA TAREFA extraída para o texto: {texto}")
+        with etapa("spacy", "prazos"):
+            resultado = postprocess_tasks(agrupado)
+        TEXTOS_PROCESSADOS.inc(provedor="spacy")
+        return resultado
+
+    async def stream_tasks(self, texto: str, passo: int = 1) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Equivalente assíncrono de stream_tasks_with_spacy, executado no pool: os blocos de fala vão para os workers
+        de `passo` em `passo`, e cada bloco vira um evento assim que o passo dele volta.
+        """
+        with etapa("spacy", "separar_falas"):
+            falas = separar_falas(texto)
+        agrupador = AgrupadorIncremental()
+        for inicio in range(0, len(falas), passo):
+            ultimo_nome = falas[inicio - 1]["responsavel"] if inicio else ""
+            for bloco in await self.processar_falas(falas[inicio:inicio + passo], ultimo_nome):
+                yield agrupador.adicionar(bloco)
+        TEXTOS_PROCESSADOS.inc(provedor="spacy")
+        yield {"evento": "fim", "dados": agrupador.resultado()}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_fila": self.max_fila,
+                "em_andamento": self.em_andamento,
+                "concluidos": self.concluidos,
+                "rejeitados": self.rejeitados,
+                "timeouts": self.timeouts,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+_pool: Optional[SpacyPool] = None
+
+def workers_do_processo() -> int:
+    """
+    Workers do pool deste processo. SPACY_POOL_WORKERS é o total da máquina: com WEB_CONCURRENCY > 1, cada processo
+    web do serve.py tem o seu pool (um ProcessPoolExecutor não sobrevive ao fork), então o total é dividido entre eles,
+    com pelo menos 1 worker por processo web.
+    """
+    total = int(get_env_var("SPACY_POOL_WORKERS", default="0"))
+    if total <= 0:
+        return 0
+    return max(1, total // max(1, int(get_env_var("WEB_CONCURRENCY", default="1"))))
+
+def start_pool() -> Optional[SpacyPool]:
+    """
+    Cria o pool se SPACY_POOL_WORKERS > 0 (dividido entre os processos web, ver workers_do_processo).
+    Configurável por SPACY_POOL_MAX_FILA, SPACY_POOL_TIMEOUT, SPACY_POOL_MAX_JOBS_POR_WORKER e SPACY_POOL_DIVIDIR_BLOCOS.
+    """
+    global _pool
+    workers = workers_do_processo()
+    if workers <= 0 or _pool is not None:
+        return _pool
+    _pool = SpacyPool(
+        workers=workers,
+        max_fila=int(get_env_var("SPACY_POOL_MAX_FILA", default="32")),
+        timeout=float(get_env_var("SPACY_POOL_TIMEOUT", default="60")),
+        max_jobs_por_worker=int(get_env_var("SPACY_POOL_MAX_JOBS_POR_WORKER", default="500")),
+        dividir_blocos=get_env_var("SPACY_POOL_DIVIDIR_BLOCOS", default="false").lower() == "true",
+    )
+    logger.info("Pool de processos spaCy iniciado: %s", _pool.stats())
+    return _pool
+
+def get_pool() -> Optional[SpacyPool]:
+    return _pool
+
+def stop_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+async def processar_falas_async(falas: List[Dict[str, str]], ultimo_nome: str = "") -> List[Dict[str, Any]]:
+    """Processa blocos de fala no pool de processos, se houver, ou no threadpool, sem bloquear o event loop."""
+    if _pool is not None:
+        return await _pool.processar_falas(falas, ultimo_nome=ultimo_nome)
+    from fastapi.concurrency import run_in_threadpool
+    from services.spacy_local import processar_falas
+    return await run_in_threadpool(processar_falas, falas, None, ultimo_nome)
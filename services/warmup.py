@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# Texto curto que passa por todas as etapas (separação de falas, parse, classificação e prazos).
+TEXTO_AQUECIMENTO = (
+    "João: Ontem finalizei o ajuste no endpoint e fiz o merge. Amanhã vou revisar o PR da Alê.\n"
+    "Alê: Não consegui terminar o deploy, vou fazer pairing com o Caio até sexta-feira."
+)
+
+_estado: Dict[str, Any] = {"pronto": False, "tempos": {}, "erro": None}
+
+def aquecer_modelo() -> Dict[str, Any]:
+    """
+    Carrega o modelo spaCy e roda uma extração de aquecimento, registrando o tempo de cada etapa.
+    Idempotente: se o modelo já foi carregado (ex.: antes do fork dos workers), só repete o aquecimento.
+    """
+    ja_carregado = "services.spacy_local" in sys.modules
+    inicio = time.perf_counter()
+    try:
+        from services.spacy_local import extract_tasks_with_spacy
+        carregado = time.perf_counter()
+        extract_tasks_with_spacy(TEXTO_AQUECIMENTO)
+        aquecido = time.perf_counter()
+    except Exception as e:
+        logger.critical("Falha ao carregar/aquecer o modelo spaCy: %s", e)
+        _estado["erro"] = str(e)
+        raise
+    if ja_carregado:
+        # Worker criado por fork: o modelo veio do processo pai, só o aquecimento local conta.
+        _estado["tempos"]["aquecimento_worker_s"] = round(aquecido - carregado, 3)
+    else:
+        _estado["tempos"].update({
+            "carregar_modelo_s": round(carregado - inicio, 3),
+            "aquecimento_s": round(aquecido - carregado, 3),
+        })
+    _estado["pronto"] = True
+    _estado["erro"] = None
+    logger.info("Modelo spaCy pronto (pid %s): %s", os.getpid(), _estado["tempos"])
+    return estado()
+
+async def aquecer_pool(pool) -> Dict[str, Any]:
+    """Aquece cada worker do pool de processos spaCy; o processo do app não carrega o modelo."""
+    inicio = time.perf_counter()
+    try:
+        await asyncio.gather(*(pool.extract_tasks(TEXTO_AQUECIMENTO) for _ in range(pool.workers)))
+    except Exception as e:
+        logger.critical("Falha ao aquecer o pool de processos spaCy: %s", e)
+        _estado["erro"] = str(e)
+        raise
+    _estado["tempos"]["aquecimento_pool_s"] = round(time.perf_counter() - inicio, 3)
+    _estado["pronto"] = True
+    _estado["erro"] = None
+    logger.info("Pool spaCy pronto (pid %s): %s", os.getpid(), _estado["tempos"])
+    return estado()
+
+def registrar_tempo(etapa: str, segundos: float) -> None:
+    """Acrescenta uma etapa ao relatório de startup (ex.: tempo até o fork dos workers)."""
+    _estado["tempos"][etapa] = round(segundos, 3)
+
+def marcar_pronto() -> None:
+    """Marca o processo como pronto quando o pré-carregamento está desativado."""
+    _estado["pronto"] = True
+
+def estado() -> Dict[str, Any]:
+    return {"pronto": _estado["pronto"], "pid": os.getpid(), "tempos": dict(_estado["tempos"]), "erro": _estado["erro"]}
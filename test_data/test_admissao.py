@@ -0,0 +1,122 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
+import main
+import services.admissao as admissao
+from services.admissao import ControleAdmissao, AdmissaoNegadaError, LimiteCorpoMiddleware, StreamingComVaga
+
+class TestControleAdmissao(unittest.TestCase):
+    def test_balde_ponderado_por_tamanho_e_provedor(self):
+        controle = ControleAdmissao(capacidade=10, taxa=1, caracteres_por_unidade=100, pesos={"spacy": 1, "gemini": 4})
+        self.assertEqual(controle.custo("spacy", 100), 2)
+        self.assertEqual(controle.custo("gemini", 0), 4)
+        for _ in range(5):
+            controle.admitir("a", [("spacy", "x" * 100)]).liberar()
+        with self.assertRaises(AdmissaoNegadaError) as ctx:
+            controle.admitir("a", [("gemini", "")])
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertAlmostEqual(ctx.exception.retry_after, 4, delta=0.1)
+        self.assertEqual(ctx.exception.resposta().headers["Retry-After"], "4")
+        # Cada cliente tem o seu balde.
+        controle.admitir("b", [("gemini", "")]).liberar()
+        self.assertEqual(controle.stats()["rejeitadas"]["cota"], 1)
+
+    def test_vagas_por_provedor(self):
+        controle = ControleAdmissao(capacidade=10, taxa=0.001, max_em_andamento={"spacy": 1, "gemini": 1})
+        with controle.admitir("a", [("spacy", "")]):
+            self.assertEqual(controle.stats()["em_andamento"]["spacy"], 1)
+            with self.assertRaises(AdmissaoNegadaError) as ctx:
+                controle.admitir("b", [("spacy", "")])
+            self.assertEqual((ctx.exception.status_code, ctx.exception.retry_after), (503, 1))
+            controle.admitir("b", [("gemini", "")]).liberar()
+        controle.admitir("b", [("spacy", "")]).liberar()
+        self.assertEqual(controle.stats()["em_andamento"], {"spacy": 0, "gemini": 0})
+        self.assertEqual(controle.stats()["rejeitadas"]["fila"], 1)
+
+    def test_stream_libera_vaga_se_o_cliente_cai_antes_do_corpo(self):
+        controle = ControleAdmissao(capacidade=10, taxa=0.001, max_em_andamento={"spacy": 1})
+        gerado = []
+
+        async def corpo():
+            gerado.append(True)
+            yield b"x"
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(mensagem):
+            raise OSError("cliente desconectou")
+
+        resposta = StreamingComVaga(corpo(), controle.admitir("a", [("spacy", "")]))
+        with self.assertRaises(ClientDisconnect):
+            asyncio.run(resposta({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send))
+        self.assertEqual(gerado, [])
+        self.assertEqual(controle.stats()["em_andamento"]["spacy"], 0)
+
+    def test_tamanho_maximo(self):
+        controle = ControleAdmissao(max_caracteres=10)
+        with self.assertRaises(AdmissaoNegadaError) as ctx:
+            controle.admitir("a", [("spacy", "x" * 11)])
+        self.assertEqual(ctx.exception.status_code, 413)
+
+    def test_limite_do_corpo_antes_do_json(self):
+        app = FastAPI()
+        app.add_middleware(LimiteCorpoMiddleware, max_bytes=50)
+
+        @app.post("/eco")
+        async def eco(dados: dict):
+            return dados
+
+        client = TestClient(app)
+        self.assertEqual(client.post("/eco", json={"texto": "curto"}).status_code, 200)
+        self.assertEqual(client.post("/eco", json={"texto": "x" * 100}).status_code, 413)
+
+class TestAdmissaoEndpoint(unittest.TestCase):
+    def test_429_com_retry_after(self):
+        controle = ControleAdmissao(capacidade=3, taxa=0.001, max_caracteres=1000)
+        texto = "Ana: entreguei o relatório."
+        with patch.object(admissao, "_controle", controle):
+            client = TestClient(main.app)
+            self.assertEqual(client.post("/extract-tasks", json={"texto": texto}).status_code, 200)
+            self.assertEqual(client.post("/extract-tasks", json={"texto": texto}).status_code, 200)
+            response = client.post("/extract-tasks", json={"texto": texto})
+            self.assertEqual(response.status_code, 429)
+            self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+            self.assertEqual(client.post("/extract-tasks", json={"texto": "x" * 1001}).status_code, 413)
+            self.assertEqual(controle.stats()["em_andamento"]["spacy"], 0)
+            self.assertIn('tarefai_admissao_rejeicoes_total{motivo="cota",provedor="spacy"}', client.get("/metrics").text)
+
+    def test_x_forwarded_for_inventado_nao_renova_a_cota(self):
+        import serve
+        from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+        controle = ControleAdmissao(capacidade=3, taxa=0.001)
+        texto = "Ana: entreguei o relatório."
+        # Mesma pilha do serve.py: proxy_headers com os FORWARDED_ALLOW_IPS padrão.
+        app = ProxyHeadersMiddleware(main.app, trusted_hosts=serve.FORWARDED_ALLOW_IPS)
+        with patch.object(admissao, "_controle", controle):
+            client = TestClient(app)
+            status = [client.post("/extract-tasks", json={"texto": texto}, headers={"X-Forwarded-For": f"10.0.0.{i}"}).status_code
+                      for i in range(3)]
+            self.assertEqual(status, [200, 200, 429])
+
+            # Atrás de um proxy que grava o IP real, só o cabeçalho dele conta.
+            controle = ControleAdmissao(capacidade=3, taxa=0.001)
+            with patch.object(admissao, "_controle", controle), patch.object(admissao, "CLIENTE_HEADER", "Fly-Client-IP"):
+                status = [client.post("/extract-tasks", json={"texto": texto},
+                                      headers={"X-Forwarded-For": f"10.0.0.{i}", "Fly-Client-IP": "203.0.113.7"}).status_code
+                          for i in range(3)]
+                self.assertEqual(status, [200, 200, 429])
+                self.assertEqual(list(controle._baldes), ["203.0.113.7"])
+
+    def test_ultimo_salto_do_x_forwarded_for(self):
+        from starlette.requests import Request
+        request = Request({"type": "http", "headers": [(b"x-forwarded-for", b"1.2.3.4, 198.51.100.9")], "client": ("10.0.0.1", 1)})
+        self.assertEqual(admissao.cliente_da_requisicao(request, "X-Forwarded-For"), "198.51.100.9")
+        self.assertEqual(admissao.cliente_da_requisicao(request, ""), "10.0.0.1")
+
+if __name__ == "__main__":
+    unittest.main()
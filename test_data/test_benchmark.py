@@ -0,0 +1,92 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+from unittest.mock import patch
+from benchmarks.gerador import gerar_transcricao, passado_1s
+from benchmarks.metricas import contar, precisao_recall, comparar, percentis
+from benchmarks import suite
+from services.falas import separar_falas
+from services.spacy_local import extract_tasks_with_spacy
+
+class TestGerador(unittest.TestCase):
+    def test_transcricao_deterministica_e_rotulada(self):
+        a = gerar_transcricao(3, 2, seed=7, base_date=datetime(2025, 3, 10))
+        b = gerar_transcricao(3, 2, seed=7, base_date=datetime(2025, 3, 10))
+        self.assertEqual(a, b)
+        falas = separar_falas(a["texto"])
+        self.assertEqual(len(falas), 3 * 2)
+        self.assertEqual({f["responsavel"] for f in falas}, {p["responsavel"] for p in a["esperado"]})
+
+    def test_passado_1s(self):
+        self.assertEqual([passado_1s(v) for v in ("finalizar", "entregar", "marcar", "corrigir", "fazer")],
+                         ["finalizei", "entreguei", "marquei", "corrigi", "fiz"])
+
+class TestMetricas(unittest.TestCase):
+    ESPERADO = [{"responsavel": "Ana", "feitas": ["entreguei o relatório"], "a_fazer": [
+        {"task": "vou ajustar o dashboard até sexta", "prazo": "sexta", "data_prazo": "2025-03-14"},
+        {"task": "preciso revisar o PR", "prazo": "", "data_prazo": ""},
+    ]}]
+
+    def test_contar(self):
+        previsto = [{"responsavel": "Ana", "feitas": ["Entreguei o relatório.", "tomei café"], "a_fazer": [
+            {"task": "vou ajustar o dashboard", "prazo": "sexta", "data_prazo": "2025-03-21"},
+        ]}]
+        m = precisao_recall(contar(previsto, self.ESPERADO))
+        self.assertEqual((m["feitas"]["tp"], m["feitas"]["fp"], m["feitas"]["fn"]), (1, 1, 0))
+        self.assertEqual((m["a_fazer"]["tp"], m["a_fazer"]["fp"], m["a_fazer"]["fn"]), (1, 0, 1))
+        # Data errada na tarefa certa conta como falso positivo e falso negativo.
+        self.assertEqual((m["data_prazo"]["tp"], m["data_prazo"]["fp"], m["data_prazo"]["fn"]), (0, 1, 1))
+        self.assertEqual(m["feitas"]["precisao"], 0.5)
+
+    def test_percentis(self):
+        self.assertEqual(percentis(list(range(1, 101))), {"p50": 50, "p90": 90, "p99": 99})
+
+    def test_comparar(self):
+        base = {"provedores": {"spacy": {"latencia_ms": {"total": {"p50": 10.0}}, "vazao": {"falas_s": 100.0},
+                                         "precisao": {"golden": {"feitas": {"recall": 0.9, "tp": 9}}}}}}
+        igual = json.loads(json.dumps(base))
+        self.assertEqual(comparar(igual, base), [])
+        pior = json.loads(json.dumps(base))
+        pior["provedores"]["spacy"]["latencia_ms"]["total"]["p50"] = 13.0
+        pior["provedores"]["spacy"]["precisao"]["golden"]["feitas"]["recall"] = 0.85
+        self.assertEqual({r["metrica"] for r in comparar(pior, base)},
+                         {"spacy.latencia_ms.total.p50", "spacy.precisao.golden.feitas.recall"})
+
+class TestSuite(unittest.TestCase):
+    def test_gemini_stub_acerta_o_golden_e_baseline_sem_regressao(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            saida = os.path.join(tmp, "baseline.json")
+            args = ["--provedores", "gemini", "--sinteticos", "2", "--repeticoes", "1", "--verboso"]
+            with redirect_stdout(io.StringIO()):
+                self.assertEqual(suite.main(args + ["--saida", saida]), 0)
+                self.assertEqual(suite.main(args + ["--baseline", saida, "--tolerancia", "10", "--piso-ms", "1000"]), 0)
+            with open(saida, encoding="utf-8") as f:
+                resultado = json.load(f)
+        gemini = resultado["provedores"]["gemini"]
+        for conjunto in ("golden", "sintetico"):
+            for campo in ("feitas", "a_fazer", "data_prazo"):
+                self.assertEqual(gemini["precisao"][conjunto][campo]["f1"], 1.0, (conjunto, campo))
+        self.assertIn("p99", gemini["latencia_ms"]["total"])
+
+    def test_spacy_mede_etapas(self):
+        with redirect_stdout(io.StringIO()):
+            parser_args = ["--provedores", "spacy", "--sinteticos", "0", "--repeticoes", "1", "--verboso"]
+            self.assertEqual(suite.main(parser_args), 0)
+        tempos = {}
+        # Cronometra a função da API, não uma cópia do pipeline.
+        with patch("services.spacy_local.extract_tasks_with_spacy", wraps=extract_tasks_with_spacy) as extrair:
+            suite._rodar_spacy("João: Ontem finalizei o ajuste.", datetime(2025, 3, 10), tempos)
+        extrair.assert_called_once_with("João: Ontem finalizei o ajuste.")
+        self.assertEqual(set(tempos), {"separar_falas", "nlp_pipe", "classificacao", "agrupar", "prazos", "total"})
+
+    def test_baseline_versionado(self):
+        baseline = suite.carregar_corpus(os.path.join(os.path.dirname(suite.__file__), "baseline.json"))
+        self.assertEqual(set(baseline["provedores"]), {"spacy", "gemini"})
+        self.assertIn("nlp_pipe", baseline["provedores"]["spacy"]["latencia_ms"])
+
+if __name__ == "__main__":
+    unittest.main()
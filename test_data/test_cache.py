@@ -0,0 +1,74 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from services.cache import ResultCache, cache_key
+
+RESULTADO = [{
+    "responsavel": "Lucas",
+    "feitas": ["finalizei o login"],
+    "a_fazer": [{"task": "vou revisar o PR amanhã", "prazo": "amanhã", "data_prazo": "2025-07-22", "descricao": ""}],
+}]
+
+class TestResultCache(unittest.TestCase):
+    def test_cache_key_normaliza_texto(self):
+        self.assertEqual(cache_key("Lucas: fiz o login  \r\n", "spacy", "v1"), cache_key("Lucas: fiz o login", "spacy", "v1"))
+        self.assertNotEqual(cache_key("Lucas: fiz o login", "spacy", "v1"), cache_key("Lucas: fiz o login", "gemini", "v1"))
+        self.assertNotEqual(cache_key("Lucas: fiz o login", "spacy", "v1"), cache_key("Lucas: fiz o login", "spacy", "v2"))
+
+    def test_get_resolve_data_prazo_na_leitura(self):
+        cache = ResultCache()
+        cache.set("k", RESULTADO)
+        resultado = cache.get("k", base_date=datetime(2030, 1, 10))
+        self.assertEqual(resultado[0]["a_fazer"][0]["prazo"], "amanhã")
+        self.assertEqual(resultado[0]["a_fazer"][0]["data_prazo"], "2030-01-11")
+        self.assertEqual(RESULTADO[0]["a_fazer"][0]["data_prazo"], "2025-07-22")
+
+    def test_lru_e_ttl(self):
+        cache = ResultCache(max_itens=2, ttl=60)
+        cache.set("a", RESULTADO)
+        cache.set("b", RESULTADO)
+        cache.get("a")
+        cache.set("c", RESULTADO)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        with patch("services.cache.time.time", return_value=10**12):
+            self.assertIsNone(cache.get("a"))
+        stats = cache.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["hits_memoria"], 2)
+        self.assertEqual(stats["misses"], 2)
+
+    def test_camada_sqlite_persiste(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            caminho = os.path.join(tmp, "cache.db")
+            ResultCache(sqlite_path=caminho).set("k", RESULTADO)
+            cache = ResultCache(sqlite_path=caminho)
+            self.assertEqual(cache.get("k")[0]["feitas"], ["finalizei o login"])
+            self.assertEqual(cache.stats()["hits_disco"], 1)
+            cache._db.close()
+
+    def test_camada_sqlite_fora_do_event_loop(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(sqlite_path=os.path.join(tmp, "cache.db"))
+            threads = []
+            buscar = cache._buscar
+
+            def _buscar(chave):
+                threads.append(threading.get_ident())
+                return buscar(chave)
+
+            async def _usar():
+                await cache.set_async("k", RESULTADO)
+                return await cache.get_async("k")
+
+            with patch.object(cache, "_buscar", _buscar):
+                self.assertEqual(asyncio.run(_usar())[0]["feitas"], ["finalizei o login"])
+            self.assertNotIn(threading.get_ident(), threads)
+            cache._db.close()
+
+if __name__ == "__main__":
+    unittest.main()
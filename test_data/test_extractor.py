@@ -1,4 +1,6 @@
+import asyncio
 import unittest
+import httpx
 from unittest.mock import patch, MagicMock
 from services.spacy_local import extract_tasks_with_spacy
 from services.gemini_llm import extract_tasks_with_gemini
@@ -37,6 +39,23 @@ class TestExtractor(unittest.TestCase):
         self.assertGreaterEqual(len(joao['feitas']), 1)
         self.assertGreaterEqual(len(joao['a_fazer']), 1)
 
+    def test_split_subfrases_spans_igual_split_subfrases(self):
+        from services.spacy_local import nlp, split_subfrases, split_subfrases_spans
+        frase = "Ontem finalizei o ajuste no endpoint, e fiz o merge mas hoje vou revisar o PR"
+        doc = nlp(frase)
+        spans = [sub for sent in doc.sents for sub, _ in split_subfrases_spans(sent)]
+        esperado = [sub for sent in doc.sents for sub in split_subfrases(sent.text.strip()) if sub]
+        self.assertEqual(spans, esperado)
+
+    def test_extract_tasks_with_spacy_single_parse_igual_legado(self):
+        import services.spacy_local as spacy_local
+        texto = """João: Ontem finalizei o ajuste no endpoint de faturamento e fiz o merge na develop. Hoje vou revisar o PR da Alê.
+Alê: Não consegui terminar o deploy, vou fazer pairing com o Caio amanhã."""
+        resultado = spacy_local.extract_tasks_with_spacy(texto)
+        with patch.object(spacy_local, "SINGLE_PARSE", False):
+            legado = spacy_local.extract_tasks_with_spacy(texto)
+        self.assertEqual(resultado, legado)
+
     @patch('services.gemini_llm.requests.post')
     def test_extract_tasks_with_gemini_success(self, mock_post):
         mock_response = MagicMock()
@@ -111,11 +130,8 @@ class TestExtractor(unittest.TestCase):
         nomes = [p["responsavel"] for p in response.json()]
         self.assertTrue("Lucas" in nomes or "Desconhecido" in nomes)
 
-    @patch('services.gemini_llm.requests.post')
-    def test_fastapi_endpoint_gemini(self, mock_post):
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+    def test_fastapi_endpoint_gemini(self):
+        resposta_gemini = {
             "candidates": [{
                 "content": {
                     "parts": [{
@@ -139,13 +155,68 @@ class TestExtractor(unittest.TestCase):
                 }
             }]
         }
-        mock_post.return_value = mock_response
-        client = TestClient(main.app)
-        response = client.post("/extract-tasks", json={"texto": "Lucas: Ontem finalizei o componente de login.", "provedor": "gemini"})
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=resposta_gemini))
+        with patch('services.gemini_llm.get_async_client', return_value=httpx.AsyncClient(transport=transport)):
+            client = TestClient(main.app)
+            response = client.post("/extract-tasks", json={"texto": "Lucas: Ontem finalizei o componente de login.", "provedor": "gemini"})
         print("FastAPI gemini response:", response.json())
         self.assertEqual(response.status_code, 200)
         nomes = [p["responsavel"] for p in response.json()]
         self.assertTrue("Lucas" in nomes or "Desconhecido" in nomes)
 
+    def test_extract_tasks_with_spacy_batch_igual_individual(self):
+        from services.spacy_local import extract_tasks_with_spacy_batch
+        textos = [
+            "João: Ontem finalizei o ajuste no endpoint. Hoje vou revisar o PR da Alê.",
+            "Lucas: Ontem finalizei o componente de login, mas ainda preciso revisar a integração com o backend.",
+            "Sem nenhum responsável identificado.",
+        ]
+        self.assertEqual(extract_tasks_with_spacy_batch(textos), [extract_tasks_with_spacy(t) for t in textos])
+
+    def test_fastapi_endpoint_batch(self):
+        def handler(request):
+            if b"falhar" in request.content:
+                return httpx.Response(503)
+            return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": '[{"responsavel": "Lucas", "feitas": ["login"], "a_fazer": []}]'}]}}]})
+        transport = httpx.MockTransport(handler)
+        itens = [
+            {"texto": "Lucas: Ontem finalizei o componente de login.", "provedor": "spacy"},
+            {"texto": "Lucas: lote gemini ok.", "provedor": "gemini"},
+            {"texto": "Lucas: lote gemini falhar.", "provedor": "gemini"},
+        ]
+        with patch('services.gemini_llm.get_async_client', return_value=httpx.AsyncClient(transport=transport)):
+            response = TestClient(main.app).post("/extract-tasks/batch", json=itens)
+        self.assertEqual(response.status_code, 200)
+        corpo = response.json()
+        self.assertEqual([item["indice"] for item in corpo], [0, 1, 2])
+        self.assertEqual(corpo[0]["resultado"][0]["responsavel"], "Lucas")
+        self.assertEqual(corpo[1]["resultado"][0]["feitas"], ["login"])
+        self.assertIsNone(corpo[2]["resultado"])
+        self.assertIn("comunicação", corpo[2]["erro"])
+
+    def test_ready_so_depois_do_aquecimento(self):
+        import services.warmup as warmup
+        with patch.dict(warmup._estado, {"pronto": False, "tempos": {}, "erro": None}):
+            client = TestClient(main.app)
+            self.assertEqual(client.get("/health").status_code, 200)
+            self.assertEqual(client.get("/ready").status_code, 503)
+            warmup.aquecer_modelo()
+            response = client.get("/ready")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()["pronto"])
+
+    def test_extract_tasks_with_gemini_async_error(self):
+        from services.gemini_llm import extract_tasks_with_gemini_async
+        def handler(request):
+            raise httpx.ConnectError("falha de conexão", request=request)
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        resultado = asyncio.run(extract_tasks_with_gemini_async("Texto qualquer.", client=client))
+        self.assertIn("erro", resultado[0])
+
+    def test_async_client_compartilhado(self):
+        from utils.http_client import get_async_client, close_async_client
+        self.assertIs(get_async_client(), get_async_client())
+        asyncio.run(close_async_client())
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+import unittest
+from unittest.mock import patch
+import httpx
+import services.gemini_llm as gemini_llm
+from services.gemini_llm import dividir_em_chunks, estimar_tokens, extract_tasks_with_gemini_async
+
+def _resposta(data):
+    return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": json.dumps(data)}]}}]})
+
+class TestGeminiChunks(unittest.TestCase):
+    def setUp(self):
+        os.environ["GEMINI_API_KEY"] = "fake-key"
+
+    def test_dividir_em_chunks_respeita_falas_e_orcamento(self):
+        texto = "\n".join(f"Pessoa{i}: " + "fiz a tarefa de número tal. " * 10 for i in range(6))
+        chunks = dividir_em_chunks(texto, max_tokens=200)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(c.startswith("Pessoa") for c in chunks))
+        self.assertEqual(sum(c.count(":") for c in chunks), 6)
+        self.assertTrue(all(estimar_tokens(c) <= 200 for c in chunks if c.count(":") > 1))
+        self.assertEqual(dividir_em_chunks("sem falas"), ["sem falas"])
+
+    def test_texto_antes_da_primeira_fala_vai_no_primeiro_chunk(self):
+        texto = "Daily 12/03, pauta do deploy\nCaio: " + "x " * 40 + "\nAna: " + "y " * 40
+        chunks = dividir_em_chunks(texto, max_tokens=30)
+        self.assertEqual(len(chunks), 2)
+        self.assertTrue(chunks[0].startswith("Daily 12/03, pauta do deploy\nCaio: "))
+        self.assertTrue(chunks[1].startswith("Ana: "))
+
+    def test_chunks_em_paralelo_mesclados_e_so_falhas_repetidas(self):
+        chamadas = []
+
+        def handler(request):
+            texto = json.loads(request.content)["contents"][0]["parts"][0]["text"]
+            chamadas.append(texto)
+            if "Ana:" in texto and sum("Ana:" in c for c in chamadas) == 1:
+                return httpx.Response(503)
+            if "Ana:" in texto:
+                return _resposta([{"responsavel": "Ana", "feitas": ["a1"], "a_fazer": []}])
+            return _resposta([{"responsavel": "Caio", "feitas": ["c1"], "a_fazer": [{"task": "t", "prazo": "amanhã"}]},
+                              {"responsavel": "Ana", "feitas": ["a0"], "a_fazer": []}])
+
+        texto = "Caio: " + "x " * 40 + "\nAna: " + "y " * 40
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch.object(gemini_llm, "LONGO_MIN_TOKENS", 10), patch.object(gemini_llm, "CHUNK_MAX_TOKENS", 30):
+            resultado = asyncio.run(extract_tasks_with_gemini_async(texto, client=client))
+        self.assertEqual([p["responsavel"] for p in resultado], ["Caio", "Ana"])
+        self.assertEqual(resultado[1]["feitas"], ["a0", "a1"])
+        self.assertTrue(resultado[0]["a_fazer"][0]["data_prazo"])
+        self.assertEqual(sum("Caio:" in c for c in chamadas), 1)
+        self.assertEqual(sum("Ana:" in c for c in chamadas), 2)
+
+    def test_repeticao_por_trecho_so_para_resposta_invalida(self):
+        import services.gemini_transporte as gemini_transporte
+        from services.gemini_transporte import TransporteGemini
+        chamadas = []
+
+        def handler(request):
+            texto = json.loads(request.content)["contents"][0]["parts"][0]["text"]
+            chamadas.append(texto)
+            if "Ana:" in texto and "503" in texto:
+                return httpx.Response(503)
+            if "Caio:" in texto and sum("Caio:" in c for c in chamadas) == 1:
+                return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": "não é json"}]}}]})
+            return _resposta([{"responsavel": "Ana" if "Ana:" in texto else "Caio", "feitas": ["f"], "a_fazer": []}])
+
+        def extrair(texto):
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            transporte = TransporteGemini(tentativas=1, backoff_base=0, cb_falhas=100)
+            with patch.object(gemini_llm, "LONGO_MIN_TOKENS", 10), patch.object(gemini_llm, "CHUNK_MAX_TOKENS", 30), \
+                    patch.object(gemini_transporte, "_transporte", transporte):
+                return asyncio.run(extract_tasks_with_gemini_async(texto, client=client))
+
+        # O JSON inválido, que o transporte não repete, ganha nova tentativa do trecho.
+        resultado = extrair("Caio: " + "x " * 40 + "\nAna: " + "y " * 40)
+        self.assertEqual([p["responsavel"] for p in resultado], ["Caio", "Ana"])
+        self.assertEqual(sum("Caio:" in c for c in chamadas), 2)
+        self.assertEqual(sum("Ana:" in c for c in chamadas), 1)
+
+        # O 503 só passa pelas tentativas do transporte (1 + 1), sem rodadas extras por trecho.
+        chamadas.clear()
+        resultado = extrair("Caio: " + "x " * 40 + "\nAna: 503 " + "y " * 40)
+        self.assertIn("erro", resultado[0])
+        self.assertEqual(sum("Ana:" in c for c in chamadas), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import asyncio
+import json
+import os
+import unittest
+import httpx
+import services.gemini_llm as gemini_llm
+from services.gemini_llm import RESPONSE_SCHEMA, _build_payload, extract_tasks_with_gemini_async, limite_saida
+from utils.metrics import GEMINI_JSON_INVALIDO, GEMINI_TOKENS
+
+def _resposta(texto, **extra):
+    return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": texto}]}, **extra}],
+                                     "usageMetadata": {"promptTokenCount": 120, "candidatesTokenCount": 40}})
+
+def _extrair(handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return asyncio.run(extract_tasks_with_gemini_async("Lucas: vou revisar o PR amanhã.", client=client))
+
+class TestGeminiEstruturado(unittest.TestCase):
+    def setUp(self):
+        os.environ["GEMINI_API_KEY"] = "fake-key"
+
+    def test_schema_derivado_dos_modelos(self):
+        pessoa = RESPONSE_SCHEMA["items"]
+        tarefa = pessoa["properties"]["a_fazer"]["items"]
+        self.assertEqual(RESPONSE_SCHEMA["type"], "ARRAY")
+        self.assertEqual(pessoa["required"], ["responsavel", "feitas", "a_fazer"])
+        self.assertEqual(list(tarefa["properties"]), ["task", "prazo", "descricao"])
+        self.assertEqual(tarefa["required"], ["task"])
+        self.assertTrue(tarefa["properties"]["prazo"]["nullable"])
+        self.assertNotIn("$ref", json.dumps(RESPONSE_SCHEMA))
+
+    def test_payload_modo_json_com_limite_de_saida(self):
+        config = _build_payload("Lucas: oi.")["generationConfig"]
+        self.assertEqual(config["responseMimeType"], "application/json")
+        self.assertIs(config["responseSchema"], RESPONSE_SCHEMA)
+        self.assertEqual(config["maxOutputTokens"], gemini_llm.SAIDA_MIN_TOKENS + 4)
+        self.assertEqual(limite_saida("x" * 10 ** 6), gemini_llm.MAX_SAIDA_TOKENS)
+
+    def test_resposta_validada_e_tokens_contados(self):
+        entrada = GEMINI_TOKENS.valor(tipo="entrada")
+        resultado = _extrair(lambda request: _resposta('[{"responsavel": "Lucas", "feitas": [], "a_fazer": [{"task": "revisar o PR", "prazo": "amanhã"}]}]'))
+        self.assertEqual(resultado[0]["a_fazer"][0]["task"], "revisar o PR")
+        self.assertTrue(resultado[0]["a_fazer"][0]["data_prazo"])
+        self.assertEqual(GEMINI_TOKENS.valor(tipo="entrada") - entrada, 120)
+
+    def test_formato_errado_ou_cortado_falha_rapido(self):
+        invalidos = GEMINI_JSON_INVALIDO.valor()
+        resultado = _extrair(lambda request: _resposta('[{"feitas": ["sem responsável"]}]'))
+        self.assertIn("inválido", resultado[0]["erro"])
+        resultado = _extrair(lambda request: _resposta('[{"responsavel": "Lucas", "feitas": ["revi', finishReason="MAX_TOKENS"))
+        self.assertIn("inválido", resultado[0]["erro"])
+        self.assertEqual(GEMINI_JSON_INVALIDO.valor() - invalidos, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest.mock import patch
+import httpx
+from fastapi.testclient import TestClient
+import main
+import services.gemini_transporte as gemini_transporte
+from services.gemini_transporte import TransporteGemini, CircuitoAbertoError, retry_after_segundos
+
+URL = "https://gemini.test/generateContent"
+
+def _post(transporte, handler):
+    async def _rodar():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await transporte.post(client, URL, json={})
+    return asyncio.run(_rodar())
+
+class TestGeminiTransporte(unittest.TestCase):
+    def test_retry_after(self):
+        self.assertEqual(retry_after_segundos("3"), 3.0)
+        self.assertIsNone(retry_after_segundos(None))
+        self.assertEqual(retry_after_segundos("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+
+    def test_repete_erros_temporarios_e_respeita_retry_after(self):
+        chamadas = []
+
+        def handler(request):
+            chamadas.append(time.monotonic())
+            if len(chamadas) == 1:
+                return httpx.Response(429, headers={"Retry-After": "0.2"})
+            if len(chamadas) == 2:
+                raise httpx.ConnectError("caiu")
+            return httpx.Response(200, json={})
+
+        transporte = TransporteGemini(tentativas=2, backoff_base=0)
+        self.assertEqual(_post(transporte, handler).status_code, 200)
+        self.assertEqual(len(chamadas), 3)
+        self.assertGreaterEqual(chamadas[1] - chamadas[0], 0.2)
+        self.assertEqual(transporte.stats()["retentativas"], 2)
+
+        # Retry-After acima do limite: devolve a resposta sem esperar.
+        transporte = TransporteGemini(tentativas=2, retry_after_max=1)
+        self.assertEqual(_post(transporte, lambda request: httpx.Response(503, headers={"Retry-After": "60"})).status_code, 503)
+        self.assertEqual(transporte.retentativas, 0)
+
+        # Erro do cliente (4xx) não é repetido.
+        transporte = TransporteGemini(tentativas=2, backoff_base=0)
+        self.assertEqual(_post(transporte, lambda request: httpx.Response(400)).status_code, 400)
+        self.assertEqual(transporte.retentativas, 0)
+
+    def test_prazo_total_corta_a_tentativa_em_andamento(self):
+        async def handler(request):
+            await asyncio.sleep(1)
+            return httpx.Response(503)
+
+        transporte = TransporteGemini(tentativas=3, backoff_base=0, prazo_total=1.5)
+        inicio = time.monotonic()
+        # A primeira tentativa volta com 503 em 1s; a segunda é cortada no prazo e fica a última resposta.
+        self.assertEqual(_post(transporte, handler).status_code, 503)
+        self.assertLess(time.monotonic() - inicio, 1.8)
+        self.assertEqual(transporte.stats()["prazos_esgotados"], 1)
+
+        transporte = TransporteGemini(tentativas=3, prazo_total=0.3)
+        inicio = time.monotonic()
+        with self.assertRaises(httpx.TimeoutException):
+            _post(transporte, handler)
+        self.assertLess(time.monotonic() - inicio, 0.6)
+
+    def test_circuit_breaker(self):
+        chamadas = []
+
+        def handler(request):
+            chamadas.append(1)
+            return httpx.Response(503)
+
+        transporte = TransporteGemini(tentativas=0, cb_falhas=2, cb_aberto_segundos=0.1)
+        _post(transporte, handler)
+        _post(transporte, handler)
+        self.assertEqual(transporte.stats()["circuito"], "aberto")
+        with self.assertRaises(CircuitoAbertoError):
+            _post(transporte, handler)
+        self.assertEqual(len(chamadas), 2)
+
+        # Depois do intervalo, uma chamada de teste: se der certo, o circuito fecha.
+        time.sleep(0.12)
+        self.assertEqual(_post(transporte, lambda request: httpx.Response(200)).status_code, 200)
+        self.assertEqual(transporte.stats()["circuito"], "fechado")
+        self.assertEqual(transporte.stats()["rejeitadas_circuito"], 1)
+
+    def test_hedge_depois_do_p95(self):
+        chamadas = []
+
+        async def handler(request):
+            chamadas.append(1)
+            if len(chamadas) == 1:
+                await asyncio.sleep(1)
+                return httpx.Response(200, json={"lenta": True})
+            return httpx.Response(200, json={"lenta": False})
+
+        transporte = TransporteGemini(hedge=True, hedge_min_ms=20, hedge_amostras_min=5)
+        transporte._latencias.extend([10.0] * 5)
+        inicio = time.monotonic()
+        resposta = _post(transporte, handler)
+        self.assertLess(time.monotonic() - inicio, 0.5)
+        self.assertFalse(resposta.json()["lenta"])
+        self.assertEqual((transporte.hedges, transporte.hedges_vencedores), (1, 1))
+
+    def test_limite_de_concorrencia(self):
+        ativas, pico = [0], [0]
+
+        async def handler(request):
+            ativas[0] += 1
+            pico[0] = max(pico[0], ativas[0])
+            await asyncio.sleep(0.02)
+            ativas[0] -= 1
+            return httpx.Response(200)
+
+        transporte = TransporteGemini(concorrencia_max=2)
+
+        async def _rodar():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                await asyncio.gather(*(transporte.post(client, URL, json={}) for _ in range(6)))
+
+        asyncio.run(_rodar())
+        self.assertEqual(pico[0], 2)
+
+class TestFallbackSpacy(unittest.TestCase):
+    def setUp(self):
+        os.environ["GEMINI_API_KEY"] = "fake-key"
+
+    def test_circuito_aberto_degrada_para_spacy(self):
+        transporte = TransporteGemini(tentativas=0, cb_falhas=1, cb_aberto_segundos=60)
+        transporte.circuito.falha()
+        texto = "João: finalizei o ajuste no endpoint de faturamento."
+        with patch.object(gemini_transporte, "_transporte", transporte), patch.object(main, "GEMINI_FALLBACK_SPACY", True):
+            response = TestClient(main.app).post("/extract-tasks", json={"texto": texto, "provedor": "gemini"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-Roteamento"], "*:spacy_fallback:0.0")
+        self.assertEqual(response.json()[0]["responsavel"], "João")
+
+        with patch.object(gemini_transporte, "_transporte", transporte):
+            response = TestClient(main.app).post("/extract-tasks", json={"texto": texto, "provedor": "gemini"})
+        self.assertEqual(response.status_code, 422)
+        self.assertIn("indisponível", response.json()["detail"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+import main
+import services.jobs as jobs
+from services.jobs import JobQueue, JobNaoEncontradoError, FilaCheiaError
+from services.spacy_local import extract_tasks_with_spacy
+
+def _esperar(fila, id, status, limite=10.0):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        job = fila.obter(id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {id} ficou em {fila.obter(id)['status']}")
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.tmp.name, "jobs.db")
+        self.chamadas = []
+
+        async def _spacy_falso(falas, ultimo_nome):
+            self.chamadas.append(([f["fala"] for f in falas], ultimo_nome))
+            await asyncio.sleep(0.01)
+            return [{"responsavel": f["responsavel"], "feitas": [f["fala"]], "a_fazer": []} for f in falas]
+
+        self.patch = patch("services.jobs.processar_falas_async", _spacy_falso)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.tmp.cleanup()
+
+    def _rodar_com_workers(self, fila, corpo):
+        async def _rodar():
+            fila.start()
+            try:
+                return await corpo()
+            finally:
+                await fila.stop()
+        return asyncio.run(_rodar())
+
+    async def _ate(self, fila, id, condicao):
+        for _ in range(500):
+            job = fila.obter(id)
+            if condicao(job):
+                return job
+            await asyncio.sleep(0.01)
+        raise AssertionError(fila.obter(id))
+
+    def test_progresso_por_passos(self):
+        fila = JobQueue(self.caminho, blocos_por_passo=2, poll_segundos=0.05)
+        texto = "\n".join(f"{nome}: tarefa {i}" for i, nome in enumerate(["João", "Ana", "Caio", "João", "Ana"]))
+        job = fila.criar(texto, "spacy")
+        self.assertEqual((job["status"], job["progresso"]), ("pendente", {"feitos": 0, "total": 0}))
+
+        job = self._rodar_com_workers(fila, lambda: self._ate(fila, job["id"], lambda j: j["status"] == "concluido"))
+        self.assertEqual(job["progresso"], {"feitos": 5, "total": 5})
+        self.assertEqual([c[1] for c in self.chamadas], ["", "Ana", "João"])
+        self.assertEqual([p["responsavel"] for p in job["resultado"]], ["João", "Ana", "Caio"])
+        self.assertEqual(job["resultado"][0]["feitas"], ["tarefa 0", "tarefa 3"])
+
+    def test_cancelamento(self):
+        fila = JobQueue(self.caminho, blocos_por_passo=1, poll_segundos=0.05)
+        texto = "\n".join(f"João: tarefa {i}" if i % 2 else f"Ana: tarefa {i}" for i in range(200))
+        job = fila.criar(texto, "spacy")
+
+        async def _cancelar_no_meio():
+            await self._ate(fila, job["id"], lambda j: j["progresso"]["feitos"] >= 3)
+            return fila.cancelar(job["id"])
+
+        cancelado = self._rodar_com_workers(fila, _cancelar_no_meio)
+        self.assertEqual(cancelado["status"], "cancelado")
+        self.assertLess(len(self.chamadas), 200)
+        self.assertIsNone(cancelado["resultado"])
+        # Cancelar de novo não muda nada.
+        self.assertEqual(fila.cancelar(job["id"])["status"], "cancelado")
+
+    def test_retoma_job_abandonado_depois_do_restart(self):
+        antes = JobQueue(self.caminho)
+        job = antes.criar("João: fiz o deploy", "spacy")
+        # O processo pegou o job e morreu sem terminar.
+        self.assertEqual(antes._reivindicar()["id"], job["id"])
+        self.assertEqual(antes.obter(job["id"])["status"], "processando")
+
+        depois = JobQueue(self.caminho, heartbeat_timeout=0.05, poll_segundos=0.05)
+        time.sleep(0.06)
+        job = self._rodar_com_workers(depois, lambda: self._ate(depois, job["id"], lambda j: j["status"] == "concluido"))
+        self.assertEqual(job["resultado"][0]["feitas"], ["fiz o deploy"])
+        self.assertEqual(depois.stats()["recuperados"], 1)
+
+    def test_ttl_e_limite_de_pendentes(self):
+        fila = JobQueue(self.caminho, ttl=0.05, max_pendentes=1, poll_segundos=0.05)
+        job = fila.criar("Ana: revisei o PR", "spacy")
+        with self.assertRaises(FilaCheiaError):
+            fila.criar("Ana: revisei o PR", "spacy")
+        self._rodar_com_workers(fila, lambda: self._ate(fila, job["id"], lambda j: j["status"] == "concluido"))
+        time.sleep(0.06)
+        with self.assertRaises(JobNaoEncontradoError):
+            fila.obter(job["id"])
+        fila._limpar()
+        self.assertEqual(fila.stats()["concluido"], 0)
+
+    def _travar_escrita(self):
+        """Outro processo segurando o lock de escrita do banco."""
+        outro = sqlite3.connect(self.caminho, isolation_level=None)
+        outro.execute("BEGIN IMMEDIATE")
+        return outro
+
+    def test_poll_com_fila_vazia_nao_disputa_o_lock_de_escrita(self):
+        fila = JobQueue(self.caminho)
+        outro = self._travar_escrita()
+        try:
+            inicio = time.monotonic()
+            self.assertIsNone(fila._reivindicar())
+            self.assertLess(time.monotonic() - inicio, 1)
+        finally:
+            outro.execute("ROLLBACK")
+            outro.close()
+
+    def test_lock_do_banco_nao_trava_o_event_loop(self):
+        fila = JobQueue(self.caminho, poll_segundos=0.05)
+        job = fila.criar("Ana: revisei o PR", "spacy")
+        outro = self._travar_escrita()
+
+        async def _corpo():
+            # O worker fica esperando o lock (busy_timeout) numa thread; o loop continua girando.
+            voltas = 0
+            fim = time.monotonic() + 0.3
+            while time.monotonic() < fim:
+                await asyncio.sleep(0.01)
+                voltas += 1
+            outro.execute("ROLLBACK")
+            return voltas, await self._ate(fila, job["id"], lambda j: j["status"] == "concluido")
+
+        try:
+            voltas, job = self._rodar_com_workers(fila, _corpo)
+        finally:
+            outro.close()
+        self.assertGreater(voltas, 10)
+        self.assertEqual(job["resultado"][0]["feitas"], ["revisei o PR"])
+
+class TestJobsEndpoint(unittest.TestCase):
+    def test_fluxo_completo(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["JOBS_SQLITE_PATH"] = os.path.join(tmp, "jobs.db")
+            os.environ["JOBS_POLL_SEGUNDOS"] = "0.05"
+            try:
+                with patch.object(jobs, "_fila", None), TestClient(main.app) as client:
+                    texto = "João: Ontem corrigi o bug do relatório. Vou atualizar a documentação até sexta-feira.\nAlê: Fiz o deploy."
+                    response = client.post("/jobs", json={"texto": texto})
+                    self.assertEqual(response.status_code, 202)
+                    job_id = response.json()["id"]
+                    self.assertEqual(response.headers["Location"], f"/jobs/{job_id}")
+                    job = _esperar(jobs.get_job_queue(), job_id, "concluido")
+                    self.assertEqual(job["progresso"], {"feitos": 2, "total": 2})
+
+                    response = client.get(f"/jobs/{job_id}")
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.json()["resultado"], extract_tasks_with_spacy(texto))
+                    self.assertEqual(client.delete(f"/jobs/{job_id}").json()["status"], "concluido")
+                    self.assertEqual(client.get("/jobs/inexistente").status_code, 404)
+                    self.assertIn('tarefai_jobs{status="concluido"} 1', client.get("/metrics").text)
+            finally:
+                del os.environ["JOBS_SQLITE_PATH"], os.environ["JOBS_POLL_SEGUNDOS"]
+
+if __name__ == "__main__":
+    unittest.main()
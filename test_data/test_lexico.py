@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import services.lexico as lexico
+import services.nlp_loader as nlp_loader
+from services.falas import normalize_nome
+from services.lexico import Lexico, lexico_atual, recarregar_lexico
+
+class TestLexico(unittest.TestCase):
+    def setUp(self):
+        self._original = lexico._lexico
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._dir.name, "lexico.json")
+
+    def tearDown(self):
+        lexico._aplicar(lexico._DADOS_PADRAO)
+        lexico._lexico = self._original
+        lexico._mtime = None
+        self._dir.cleanup()
+
+    def _escrever(self, dados):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False)
+
+    def test_marcar_categorias_em_uma_varredura(self):
+        marcar = lexico_atual().marcar
+        self.assertEqual(marcar("vou fazer pairing com o Caio").categorias, {"pairing", "futuro"})
+        self.assertEqual(marcar("Não consegui terminar, aguardando o deploy").categorias, {"negativo", "bloqueio"})
+        self.assertEqual(marcar("reunião com o cliente").categorias, {"reuniao"})
+        # Frases casam como substring; palavras (marcadores de futuro) só com borda de palavra.
+        self.assertEqual(marcar("xaguardando").categorias, {"bloqueio"})
+        self.assertEqual(marcar("os afazeres da semana").categorias, frozenset())
+        self.assertEqual(marcar("VAI revisar").categorias, {"futuro"})
+
+    def test_prazo(self):
+        prazo = lexico_atual().prazo
+        self.assertEqual(prazo("entregar depois de amanhã"), "depois de amanhã")
+        self.assertEqual(prazo("até sexta"), "até sexta")
+        self.assertEqual(prazo("sem data"), "")
+
+    def test_lexico_vazio(self):
+        vazio = Lexico({**lexico._DADOS_PADRAO, "pairing": [], "reuniao": [], "bloqueio": [], "negativos": [],
+                        "verbos_passado": [], "marcadores_futuro": []})
+        self.assertEqual(vazio.marcar("vou fazer pairing com o Caio").categorias, frozenset())
+
+    def test_recarregar_de_arquivo(self):
+        versao = lexico_atual().versao
+        self._escrever({"pairing": ["mob com"], "apelidos": {"Dudu": "Eduardo"}})
+        novo = recarregar_lexico(self.path)
+        self.assertNotEqual(novo.versao, versao)
+        self.assertIs(lexico_atual(), novo)
+        self.assertEqual(novo.marcar("mob com a Ana").categorias, {"pairing"})
+        self.assertEqual(novo.marcar("pairing com a Ana").categorias, frozenset())
+        # Chaves ausentes ficam com o padrão e as listas exportadas são atualizadas no lugar.
+        self.assertEqual(novo.marcar("reunião com o time").categorias, {"reuniao"})
+        self.assertEqual(lexico.PAIRING, ["mob com"])
+        self.assertEqual(normalize_nome("Dudu"), "Eduardo")
+        self.assertEqual(normalize_nome("Vini"), "Vini")
+
+    def test_versao_cache_memorizada_ate_recarregar(self):
+        with patch.object(nlp_loader, "versao_modelo", return_value="1.0") as versao_modelo:
+            nlp_loader._versao_cache = ("", "")
+            antes = nlp_loader.versao_cache()
+            self.assertEqual(nlp_loader.versao_cache(), antes)
+            self.assertEqual(versao_modelo.call_count, 1)
+            self._escrever({"pairing": ["mob com"]})
+            recarregar_lexico(self.path)
+            self.assertNotEqual(nlp_loader.versao_cache(), antes)
+            self.assertEqual(versao_modelo.call_count, 2)
+        nlp_loader._versao_cache = ("", "")
+
+    def test_recarga_refaz_padroes_do_entity_ruler(self):
+        import services.spacy_local as spacy_local
+        self._escrever({"verbos_passado": ["mergear"]})
+        recarregar_lexico(self.path)
+        spacy_local.processar_falas([{"responsavel": "Ana", "fala": "mergeei o PR"}])
+        tarefas = [p["pattern"][0]["LEMMA"] for p in spacy_local.ruler.patterns if p["label"] == "TAREFA"]
+        self.assertEqual(tarefas, ["mergear"])
+        self.assertTrue(any(p["label"] == "PRAZO" for p in spacy_local.ruler.patterns))
+
+    def test_arquivo_invalido_mantem_lexico(self):
+        atual = lexico_atual()
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("{não é json")
+        self.assertIs(recarregar_lexico(self.path), atual)
+
+    def test_lexico_atual_recarrega_quando_arquivo_muda(self):
+        self._escrever({"bloqueio": ["travado por"]})
+        with patch.object(lexico, "LEXICO_PATH", self.path), patch.object(lexico, "LEXICO_RECARGA_SEGUNDOS", 0):
+            self.assertEqual(lexico_atual().marcar("travado por infra").categorias, {"bloqueio"})
+            self._escrever({"bloqueio": ["parado por"]})
+            os.utime(self.path, (0, 0))
+            self.assertEqual(lexico_atual().marcar("parado por infra").categorias, {"bloqueio"})
+
+if __name__ == "__main__":
+    unittest.main()
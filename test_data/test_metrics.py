@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+import main
+from utils import metrics
+from utils.metrics import Contador, Histograma, etapa, coletar_tempos, resumir_tempos, server_timing
+
+class TestMetrics(unittest.TestCase):
+    def test_exportacao_formato_prometheus(self):
+        contador = Contador("teste_total", "Ajuda.", ("status",))
+        contador.inc(status=200)
+        contador.inc(2, status=200)
+        self.assertIn('teste_total{status="200"} 3', contador.exportar())
+
+        hist = Histograma("teste_segundos", "Ajuda.", ("etapa",), buckets=(0.1, 1.0))
+        hist.observar(0.05, etapa="x")
+        hist.observar(0.5, etapa="x")
+        linhas = hist.exportar()
+        self.assertIn('teste_segundos_bucket{etapa="x",le="0.1"} 1', linhas)
+        self.assertIn('teste_segundos_bucket{etapa="x",le="1"} 2', linhas)
+        self.assertIn('teste_segundos_bucket{etapa="x",le="+Inf"} 2', linhas)
+        self.assertIn('teste_segundos_count{etapa="x"} 2', linhas)
+
+    def test_desligado_nao_mede(self):
+        with patch.object(metrics, "METRICS_ENABLED", False):
+            self.assertIs(etapa("spacy", "x"), metrics._NULO)
+            # Com ?debug_timings o coletor da requisição continua recebendo os tempos.
+            with coletar_tempos() as tempos:
+                with etapa("spacy", "x"):
+                    pass
+            self.assertEqual([t[:2] for t in tempos], [("spacy", "x")])
+
+    def test_resumo_e_server_timing(self):
+        resumo = resumir_tempos([("spacy", "nlp_pipe", 0.002), ("spacy", "nlp_pipe", 0.001), ("gemini", "http", 0.5)])
+        self.assertEqual(resumo, {"spacy.nlp_pipe": 3.0, "gemini.http": 500.0})
+        self.assertEqual(server_timing(resumo), "spacy.nlp_pipe;dur=3.0, gemini.http;dur=500.0")
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+
+    def test_debug_timings(self):
+        with patch("main.get_result_cache", return_value=None):
+            response = self.client.post("/extract-tasks?debug_timings=1", json={"texto": "João: finalizei o ajuste no endpoint.", "provedor": "spacy"})
+        self.assertEqual(response.status_code, 200)
+        cabecalho = response.headers["Server-Timing"]
+        # As etapas medidas na thread do spaCy chegam ao coletor da requisição.
+        for nome in ("spacy.separar_falas", "spacy.nlp_pipe", "spacy.classificacao", "spacy.prazos", "spacy.total"):
+            self.assertIn(nome + ";dur=", cabecalho)
+
+    def test_sem_debug_timings_nao_tem_cabecalho(self):
+        response = self.client.post("/extract-tasks", json={"texto": "João: finalizei o ajuste no endpoint.", "provedor": "spacy"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response.headers)
+
+    def test_metrics(self):
+        self.client.post("/extract-tasks", json={"texto": "Ana: entreguei o relatório.", "provedor": "spacy"})
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn("# TYPE tarefai_etapa_segundos histogram", response.text)
+        self.assertIn('tarefai_etapa_segundos_count{provedor="spacy",etapa="total"}', response.text)
+        self.assertIn("tarefai_cache_consultas_total", response.text)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest.mock import patch
+import services.nlp_loader as nlp_loader
+from services.nlp_loader import perfil_de_carga, nome_do_modelo
+
+CONFIG_LG = {
+    "nlp": {"pipeline": ["tok2vec", "morphologizer", "parser", "lemmatizer", "attribute_ruler", "ner"]},
+    "components": {
+        "senter": {},
+        "tok2vec": {"model": {"embed": {"include_static_vectors": True}}},
+        "ner": {"model": {"tok2vec": {"embed": {"include_static_vectors": True}}}},
+    },
+}
+CONFIG_SM = {
+    "nlp": {"pipeline": ["tok2vec", "morphologizer", "parser", "senter", "lemmatizer", "attribute_ruler", "ner"]},
+    "components": {"tok2vec": {"model": {"embed": {"include_static_vectors": False}}}},
+}
+
+class TestPerfilDeCarga(unittest.TestCase):
+    def _perfil(self, config, perfil="completo", vetores="auto", excluir=""):
+        with patch.object(nlp_loader, "SPACY_PERFIL", perfil), patch.object(nlp_loader, "SPACY_VETORES", vetores), \
+                patch.object(nlp_loader, "SPACY_EXCLUIR", excluir):
+            return perfil_de_carga(config)
+
+    def test_completo_nao_exclui_nada(self):
+        self.assertEqual(self._perfil(CONFIG_LG), ([], []))
+
+    def test_enxuto_troca_parser_por_senter_e_tira_ner(self):
+        excluir, habilitar = self._perfil(CONFIG_SM, perfil="enxuto")
+        self.assertEqual(excluir, ["parser", "ner", "vectors"])
+        self.assertEqual(habilitar, ["senter"])
+
+    def test_enxuto_mantem_vetores_usados_pelo_tok2vec(self):
+        excluir, _ = self._perfil(CONFIG_LG, perfil="enxuto")
+        self.assertNotIn("vectors", excluir)
+        excluir, _ = self._perfil(CONFIG_LG, perfil="enxuto", vetores="remover")
+        self.assertIn("vectors", excluir)
+
+    def test_lista_explicita_tem_prioridade(self):
+        self.assertEqual(self._perfil(CONFIG_LG, perfil="enxuto", vetores="manter", excluir="ner, parser"), (["ner", "parser"], []))
+
+    def test_modelo_por_tamanho(self):
+        self.assertEqual(nome_do_modelo("sm"), "pt_core_news_sm")
+        self.assertEqual(nome_do_modelo("pt_core_news_md"), "pt_core_news_md")
+
+if __name__ == "__main__":
+    unittest.main()
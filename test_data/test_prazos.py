@@ -0,0 +1,43 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from services.prazos import resolver_prazo, _resolver
+
+# Domingo, 18/10/2026
+BASE = datetime(2026, 10, 18, 15, 30)
+
+class TestResolverPrazo(unittest.TestCase):
+    def test_expressoes_relativas(self):
+        self.assertEqual(resolver_prazo("hoje", BASE), "2026-10-18")
+        self.assertEqual(resolver_prazo("Amanhã", BASE), "2026-10-19")
+        self.assertEqual(resolver_prazo("depois de amanhã", BASE), "2026-10-20")
+        self.assertEqual(resolver_prazo("próxima semana", BASE), "2026-10-25")
+        self.assertEqual(resolver_prazo("em 3 dias", BASE), "2026-10-21")
+
+    def test_dias_da_semana_sempre_no_futuro(self):
+        self.assertEqual(resolver_prazo("sexta-feira", BASE), "2026-10-23")
+        self.assertEqual(resolver_prazo("terça", BASE), "2026-10-20")
+        self.assertEqual(resolver_prazo("domingo", BASE), "2026-10-25")
+
+    def test_datas_dia_mes(self):
+        self.assertEqual(resolver_prazo("25/12", BASE), "2026-12-25")
+        self.assertEqual(resolver_prazo("5/1", BASE), "2027-01-05")
+        self.assertEqual(resolver_prazo("18/10", BASE), "2027-10-18")
+        self.assertEqual(resolver_prazo("3 de março", BASE), "2027-03-03")
+        self.assertEqual(resolver_prazo("29 de fevereiro", BASE), "2028-02-29")
+
+    def test_fallback_dateparser_so_para_o_que_a_tabela_nao_conhece(self):
+        with patch("services.prazos._dateparser_para") as mock_parser:
+            resolver_prazo("quinta-feira", datetime(2031, 1, 1))
+            mock_parser.assert_not_called()
+        self.assertEqual(resolver_prazo("até sexta", BASE), "")
+        self.assertEqual(resolver_prazo("", BASE), "")
+
+    def test_memoizado_por_expressao_e_dia(self):
+        _resolver.cache_clear()
+        resolver_prazo("amanhã", datetime(2026, 10, 18, 9, 0))
+        resolver_prazo("amanhã", datetime(2026, 10, 18, 17, 0))
+        self.assertEqual(_resolver.cache_info().hits, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+import json
+import unittest
+from fastapi.testclient import TestClient
+from starlette.responses import JSONResponse
+import main
+from services.spacy_local import extract_tasks_with_spacy
+from utils.respostas import RespostaJSON
+
+class TestRespostas(unittest.TestCase):
+    def test_mesma_saida_do_json_response(self):
+        conteudo = [{"responsavel": "João", "feitas": ["Revisei a integração"], "a_fazer": [
+            {"task": "Atualizar a documentação", "prazo": "sexta-feira", "data_prazo": "2026-10-23", "descricao": None}]}]
+        self.assertEqual(RespostaJSON(conteudo).body, JSONResponse(conteudo).body)
+
+    def test_endpoints_com_modelos_de_resposta(self):
+        client = TestClient(main.app)
+        texto = "João: Ontem corrigi o bug do relatório. Vou atualizar a documentação até sexta-feira."
+        response = client.post("/extract-tasks", json={"texto": texto})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), extract_tasks_with_spacy(texto))
+
+        esquema = client.get("/openapi.json").json()
+        resposta = esquema["paths"]["/extract-tasks"]["post"]["responses"]["200"]["content"]["application/json"]["schema"]
+        self.assertEqual(resposta["items"]["$ref"], "#/components/schemas/PessoaTarefas")
+        for modelo in ("ItemLote", "ResultadoSessao", "Job"):
+            self.assertIn(modelo, esquema["components"]["schemas"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import os
+import unittest
+from unittest.mock import patch
+import httpx
+from fastapi.testclient import TestClient
+import main
+from services.router import pontuar_bloco, extract_tasks_auto
+
+def _bloco(nome, feitas, a_fazer, subfrases, nomes=()):
+    return {"responsavel": nome, "feitas": feitas, "a_fazer": a_fazer, "metricas": {"subfrases": subfrases, "nomes": list(nomes)}}
+
+def _so(termo):
+    """Zera o peso dos outros termos da pontuação, para medir um termo isolado."""
+    pesos = {"PESO_COBERTURA": 0, "PESO_PRAZOS": 0, "PESO_FALANTES": 0, "PESO_NOMES": 0, termo: 1}
+    return patch.multiple("services.router", **pesos)
+
+BLOCOS = [
+    _bloco("João", ["finalizei o ajuste"], [{"task": "vou revisar amanhã", "prazo": "amanhã", "data_prazo": "", "descricao": ""}], 2),
+    _bloco("Fulano", [], [], 3),
+]
+
+async def _spacy_falso(falas):
+    return [dict(b) for b in BLOCOS]
+
+class TestRouter(unittest.TestCase):
+    def setUp(self):
+        os.environ["GEMINI_API_KEY"] = "fake-key"
+
+    def test_pontuar_bloco(self):
+        self.assertAlmostEqual(pontuar_bloco(BLOCOS[0]), 1.0)
+        self.assertAlmostEqual(pontuar_bloco(BLOCOS[1]), 0.3)
+        self.assertAlmostEqual(pontuar_bloco(_bloco("João", [], [{"task": "t", "prazo": "até xyz"}], 2)), 0.55)
+
+    def test_termo_cobertura(self):
+        with _so("PESO_COBERTURA"):
+            self.assertAlmostEqual(pontuar_bloco(_bloco("João", ["a"], [], 4)), 0.25)
+            self.assertAlmostEqual(pontuar_bloco(_bloco("João", [], [], 0)), 0.0)
+
+    def test_termo_prazos(self):
+        with _so("PESO_PRAZOS"):
+            a_fazer = [{"task": "t", "prazo": "amanhã"}, {"task": "u", "prazo": "até xyz"}]
+            self.assertAlmostEqual(pontuar_bloco(_bloco("João", [], a_fazer, 2)), 0.5)
+            self.assertAlmostEqual(pontuar_bloco(_bloco("João", ["a"], [], 1)), 1.0)
+
+    def test_termo_falantes(self):
+        bloco = _bloco("João", [], [], 1, nomes=["Caio", "Ana Souza"])
+        with _so("PESO_FALANTES"):
+            # Só o João fala: Caio e Ana são citados mas não têm bloco de fala.
+            self.assertAlmostEqual(pontuar_bloco(bloco, falantes={"João"}), 1 / 3)
+            self.assertAlmostEqual(pontuar_bloco(bloco, falantes={"João", "Caio", "Ana"}), 1.0)
+
+    def test_termo_nomes_desconhecidos(self):
+        with _so("PESO_NOMES"):
+            self.assertAlmostEqual(pontuar_bloco(_bloco("João", [], [], 1, nomes=["Caio", "Fulano", "Beltrano"])), 0.5)
+            self.assertAlmostEqual(pontuar_bloco(_bloco("Fulano", [], [], 1)), 0.0)
+            self.assertAlmostEqual(pontuar_bloco(_bloco("Ana", [], [], 1, nomes=["Ana Souza"])), 1.0)
+
+    def test_so_blocos_fracos_vao_para_gemini(self):
+        enviados = []
+
+        def handler(request):
+            enviados.append(json.loads(request.content)["contents"][0]["parts"][0]["text"])
+            return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": '[{"responsavel": "Fulano", "feitas": ["migrou o banco"], "a_fazer": []}]'}]}}]})
+
+        texto = "João: finalizei o ajuste e vou revisar amanhã\nFulano: blá blá blá"
+        with patch("services.router._processar_falas_spacy", _spacy_falso), \
+                patch("services.gemini_llm.get_async_client", return_value=httpx.AsyncClient(transport=httpx.MockTransport(handler))):
+            resultado, roteamento = asyncio.run(extract_tasks_auto(texto))
+        self.assertEqual(len(enviados), 1)
+        self.assertIn("Fulano: blá blá blá", enviados[0])
+        self.assertNotIn("João:", enviados[0])
+        self.assertEqual([r["provedor"] for r in roteamento], ["spacy", "gemini"])
+        self.assertEqual(resultado[1]["feitas"], ["migrou o banco"])
+        self.assertTrue(resultado[0]["a_fazer"][0]["data_prazo"])
+
+    def test_endpoint_auto_informa_roteamento(self):
+        with patch("services.router._processar_falas_spacy", lambda falas: _spacy_falso(falas)), \
+                patch("services.router.CONFIANCA_MINIMA", 0.1):
+            response = TestClient(main.app).post("/extract-tasks", json={"texto": "João: roteamento local.\nFulano: outro.", "provedor": "auto"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-Roteamento"], "0:spacy:1.0,1:spacy:0.3")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+import main
+from services.sessoes import SessionStore, SessaoNaoEncontradaError, SessaoMuitoGrandeError
+from services.spacy_local import extract_tasks_with_spacy
+
+def _rodar(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+class TestSessoes(unittest.TestCase):
+    def setUp(self):
+        self.chamadas = []
+
+        async def _spacy_falso(falas, ultimo_nome):
+            self.chamadas.append(([f["fala"] for f in falas], ultimo_nome))
+            return [{"responsavel": f["responsavel"], "feitas": [f["fala"]], "a_fazer": []} for f in falas]
+
+        self.patch = patch("services.sessoes.processar_falas_async", _spacy_falso)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_so_blocos_novos_ou_alterados_sao_reprocessados(self):
+        store = SessionStore()
+        sessao = store.criar("João: fiz o deploy")
+        self.assertEqual(_rodar(sessao.atualizar())["reprocessados"], 1)
+
+        store.anexar(sessao.id, "Ana: revisei o PR\nCaio: testei a tela")
+        resposta = _rodar(sessao.atualizar())
+        self.assertEqual(resposta["reprocessados"], 2)
+        self.assertEqual(self.chamadas[-1], (["revisei o PR", "testei a tela"], "João"))
+
+        # Linha sem "Nome:" continua o último bloco: só ele volta para o spaCy.
+        store.anexar(sessao.id, "e subi a versão")
+        resposta = _rodar(sessao.atualizar())
+        self.assertEqual(resposta["reprocessados"], 1)
+        self.assertEqual(self.chamadas[-1], (["testei a tela\ne subi a versão"], "Ana"))
+
+        store.anexar(sessao.id, "João: corrigi o bug")
+        resposta = _rodar(sessao.atualizar())
+        self.assertEqual(resposta["blocos"], 4)
+        self.assertEqual(resposta["reprocessados"], 1)
+        self.assertEqual([p["responsavel"] for p in resposta["resultado"]], ["João", "Ana", "Caio"])
+        self.assertEqual(resposta["resultado"][0]["feitas"], ["fiz o deploy", "corrigi o bug"])
+
+        # Sem mudança, nada é reprocessado e o agrupamento não duplica itens.
+        resposta = _rodar(sessao.atualizar())
+        self.assertEqual(resposta["reprocessados"], 0)
+        self.assertEqual(resposta["resultado"][0]["feitas"], ["fiz o deploy", "corrigi o bug"])
+
+    def test_expiracao_e_limites(self):
+        store = SessionStore(ttl=60, max_sessoes=2, max_caracteres=50)
+        a, b, c = store.criar(), store.criar(), store.criar()
+        with self.assertRaises(SessaoNaoEncontradaError):
+            store.obter(a.id)
+        self.assertIs(store.obter(c.id), c)
+        with self.assertRaises(SessaoMuitoGrandeError):
+            store.anexar(c.id, "x" * 51)
+        b.usada_em = time.monotonic() - 61
+        with self.assertRaises(SessaoNaoEncontradaError):
+            store.obter(b.id)
+        self.assertEqual(store.stats()["expiradas"], 1)
+        self.assertEqual(store.stats()["despejadas"], 1)
+
+    def test_sqlite_compartilha_entre_processos(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            caminho = os.path.join(tmp, "sessoes.db")
+            worker1, worker2 = SessionStore(sqlite_path=caminho), SessionStore(sqlite_path=caminho)
+            sessao = worker1.criar("João: fiz o deploy")
+            worker2.anexar(sessao.id, "Ana: revisei o PR")
+            self.assertEqual(worker1.obter(sessao.id).texto, "João: fiz o deploy\nAna: revisei o PR")
+            worker1.remover(sessao.id)
+            with self.assertRaises(SessaoNaoEncontradaError):
+                worker2.obter(sessao.id)
+
+    def test_sqlite_leitura_nao_escreve_e_expiracao_periodica(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SessionStore(ttl=60, sqlite_path=os.path.join(tmp, "sessoes.db"), limpeza_segundos=0.01)
+            sessao = store.criar("João: fiz o deploy")
+            escritas = store._db.total_changes
+            for _ in range(5):
+                store.obter(sessao.id)
+            self.assertEqual(store._db.total_changes, escritas)
+
+            # Vencida no banco: some na leitura mesmo antes da limpeza, e a limpeza periódica apaga a linha.
+            store._db.execute("UPDATE sessoes SET usada_em = ?", (time.time() - 61,))
+            store._db.commit()
+            with self.assertRaises(SessaoNaoEncontradaError):
+                _rodar(store.obter_async(sessao.id))
+
+            async def _limpeza():
+                store.start()
+                await asyncio.sleep(0.1)
+                await store.stop()
+            _rodar(_limpeza())
+            self.assertEqual(store._db.execute("SELECT COUNT(*) FROM sessoes").fetchone()[0], 0)
+
+class TestSessoesEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+
+    def test_fluxo_incremental_igual_ao_texto_inteiro(self):
+        linhas = [
+            "João: Ontem corrigi o bug do relatório. Vou atualizar a documentação até sexta-feira.",
+            "Alê: Não consegui terminar o deploy, vou fazer pairing com o Caio amanhã.",
+            "João: Também preciso revisar o PR da Ana.",
+        ]
+        response = self.client.post("/sessions", json={"texto": linhas[0]})
+        self.assertEqual(response.status_code, 201)
+        sessao_id = response.json()["sessao"]
+        for linha in linhas[1:]:
+            response = self.client.post(f"/sessions/{sessao_id}/append", json={"texto": linha})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["reprocessados"], 1)
+        self.assertEqual(response.json()["resultado"], extract_tasks_with_spacy("\n".join(linhas)))
+        self.assertEqual(self.client.get(f"/sessions/{sessao_id}").json()["reprocessados"], 0)
+
+        self.assertEqual(self.client.delete(f"/sessions/{sessao_id}").status_code, 204)
+        self.assertEqual(self.client.get(f"/sessions/{sessao_id}").status_code, 404)
+        self.assertEqual(self.client.post(f"/sessions/{sessao_id}/append", json={"texto": "x"}).status_code, 404)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest.mock import patch
+from services.spacy_pool import SpacyPool, PoolSaturadoError, PoolTimeoutError, _dividir, workers_do_processo
+
+class TestSpacyPool(unittest.TestCase):
+    def test_dividir_blocos_mantem_ordem(self):
+        falas = [{"responsavel": f"P{i}", "fala": ""} for i in range(5)]
+        trechos = _dividir(falas, 2)
+        self.assertEqual([len(t) for t in trechos], [3, 2])
+        self.assertEqual([b for t in trechos for b in t], falas)
+        self.assertEqual(len(_dividir(falas[:1], 4)), 1)
+
+    def test_workers_divididos_entre_os_processos_web(self):
+        for total, web, esperado in ((0, 4, 0), (4, 1, 4), (8, 2, 4), (3, 2, 1), (1, 4, 1)):
+            with patch.dict(os.environ, {"SPACY_POOL_WORKERS": str(total), "WEB_CONCURRENCY": str(web)}):
+                self.assertEqual(workers_do_processo(), esperado, (total, web))
+
+    def test_fila_limitada_rejeita_excesso(self):
+        pool = SpacyPool(workers=1, max_fila=1)
+        try:
+            pool._reservar(2)
+            with self.assertRaises(PoolSaturadoError):
+                pool._reservar(1)
+            pool._liberar(2)
+            pool._reservar(1)
+            self.assertEqual(pool.stats()["rejeitados"], 1)
+        finally:
+            pool.shutdown()
+
+    def test_timeout_mantem_a_vaga_ate_o_job_terminar(self):
+        falas = [{"responsavel": "João", "fala": "Ontem corrigi o bug do relatório."},
+                 {"responsavel": "Ana", "fala": "Vou revisar o PR amanhã."}]
+        pool = SpacyPool(workers=1, max_fila=0, timeout=0.01)
+        try:
+            # O primeiro job ainda carrega o worker: a espera estoura, mas ele continua rodando no processo.
+            with self.assertRaises(PoolTimeoutError):
+                asyncio.run(pool.processar_falas(falas))
+            self.assertEqual(pool.stats()["em_andamento"], 1)
+            with self.assertRaises(PoolSaturadoError):
+                asyncio.run(pool.processar_falas(falas))
+
+            limite = time.monotonic() + 120
+            while pool.stats()["em_andamento"] and time.monotonic() < limite:
+                time.sleep(0.05)
+            self.assertEqual(pool.stats()["em_andamento"], 0)
+
+            pool.timeout = 120
+            blocos = asyncio.run(pool.processar_falas(falas))
+            self.assertEqual([b["responsavel"] for b in blocos], ["João", "Ana"])
+            self.assertEqual(pool.stats()["em_andamento"], 0)
+            self.assertEqual((pool.stats()["timeouts"], pool.stats()["rejeitados"], pool.stats()["concluidos"]), (1, 1, 2))
+        finally:
+            pool.shutdown()
+
+if __name__ == "__main__":
+    unittest.main()
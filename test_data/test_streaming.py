@@ -0,0 +1,65 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+import httpx
+from fastapi.testclient import TestClient
+import main
+from utils.json_stream import JSONArrayStreamParser
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        os.environ["GEMINI_API_KEY"] = "fake-key"
+
+    def test_parser_entrega_objetos_completos_em_pedacos(self):
+        texto = '```json\n[{"responsavel": "Ana", "feitas": ["chave {com} \\"aspas\\""]}, {"responsavel": "Caio", "a_fazer": [{"task": "x"}]}]\n```'
+        parser = JSONArrayStreamParser()
+        objetos = []
+        for i in range(0, len(texto), 7):
+            objetos.extend(parser.feed(texto[i:i + 7]))
+        self.assertEqual([o["responsavel"] for o in objetos], ["Ana", "Caio"])
+        self.assertEqual(objetos[0]["feitas"], ['chave {com} "aspas"'])
+        self.assertTrue(parser.completo)
+
+    def test_stream_spacy_ndjson_com_patch_e_fim(self):
+        texto = "Ana: vou fazer pairing com o Caio.\nCaio: aguardando o time de infra.\nAna: tenho reunião com o cliente."
+        response = TestClient(main.app).post("/extract-tasks/stream", json={"texto": texto, "provedor": "spacy"})
+        self.assertEqual(response.status_code, 200)
+        eventos = [json.loads(linha) for linha in response.text.splitlines()]
+        self.assertEqual([e["evento"] for e in eventos], ["responsavel", "responsavel", "patch", "fim"])
+        self.assertEqual(eventos[2]["dados"]["responsavel"], "Ana")
+        ana = next(p for p in eventos[-1]["dados"] if p["responsavel"] == "Ana")
+        self.assertEqual([t["descricao"] for t in ana["a_fazer"]], ["pairing", "reunião"])
+
+    def test_stream_spacy_passa_pelo_pool(self):
+        from services.spacy_pool import SpacyPool
+        texto = "Ana: vou fazer pairing com o Caio.\nCaio: aguardando o time de infra.\nAna: tenho reunião com o cliente."
+        client = TestClient(main.app)
+        with patch.object(main, "_cache_get", return_value=None):
+            sem_pool = client.post("/extract-tasks/stream", json={"texto": texto, "provedor": "spacy"}).text
+        pool = SpacyPool(workers=1)
+        try:
+            with patch.object(main, "get_pool", return_value=pool), patch.object(main, "_cache_get", return_value=None), \
+                    patch("services.spacy_local.stream_tasks_with_spacy", side_effect=AssertionError("rodou no processo web")):
+                com_pool = client.post("/extract-tasks/stream", json={"texto": texto, "provedor": "spacy"}).text
+            self.assertEqual(com_pool, sem_pool)
+            self.assertEqual(pool.stats()["concluidos"], 3)
+        finally:
+            pool.shutdown()
+
+    def test_stream_gemini_sse(self):
+        resposta = '[{"responsavel": "Lucas", "feitas": ["login"], "a_fazer": [{"task": "revisar", "prazo": "amanhã"}]}]'
+        partes = [resposta[:30], resposta[30:]]
+        corpo = "".join("data: " + json.dumps({"candidates": [{"content": {"parts": [{"text": p}]}}]}) + "\r\n\r\n" for p in partes)
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text=corpo, headers={"content-type": "text/event-stream"}))
+        with patch('services.gemini_llm.get_async_client', return_value=httpx.AsyncClient(transport=transport)):
+            response = TestClient(main.app).post("/extract-tasks/stream?formato=sse", json={"texto": "Lucas: stream sse.", "provedor": "gemini"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("event: responsavel", response.text)
+        fim = [linha for linha in response.text.splitlines() if linha.startswith("data:")][-1]
+        dados = json.loads(fim[len("data:"):])
+        self.assertEqual(dados["evento"], "fim")
+        self.assertTrue(dados["dados"][0]["a_fazer"][0]["data_prazo"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import importlib.util
+import logging
+from typing import Optional
+
+import httpx
+
+from utils.config import get_env_var
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+def _http2_disponivel() -> bool:
+    """HTTP/2 no httpx depende do pacote opcional 'h2' (pip install httpx[http2])."""
+    return importlib.util.find_spec("h2") is not None
+
+def build_async_client() -> httpx.AsyncClient:
+    """
+    Cria o AsyncClient compartilhado pelo processo, com pool de conexões keep-alive e timeouts por fase.
+    Configurável pelas variáveis HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_WRITE_TIMEOUT, HTTP_POOL_TIMEOUT e HTTP2.
+    """
+    limits = httpx.Limits(
+        max_connections=int(get_env_var("HTTP_MAX_CONNECTIONS", default="20")),
+        max_keepalive_connections=int(get_env_var("HTTP_MAX_KEEPALIVE", default="10")),
+        keepalive_expiry=float(get_env_var("HTTP_KEEPALIVE_EXPIRY", default="30")),
+    )
+    timeout = httpx.Timeout(
+        connect=float(get_env_var("HTTP_CONNECT_TIMEOUT", default="5")),
+        read=float(get_env_var("HTTP_READ_TIMEOUT", default="30")),
+        write=float(get_env_var("HTTP_WRITE_TIMEOUT", default="10")),
+        pool=float(get_env_var("HTTP_POOL_TIMEOUT", default="5")),
+    )
+    http2 = get_env_var("HTTP2", default="true").lower() == "true"
+    if http2 and not _http2_disponivel():
+        logger.warning("HTTP2 ativado mas o pacote 'h2' não está instalado. Usando HTTP/1.1 com keep-alive.")
+        http2 = False
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+def get_async_client() -> httpx.AsyncClient:
+    """Retorna o AsyncClient do processo, criando-o sob demanda se o lifespan do app ainda não o abriu."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = build_async_client()
+    return _client
+
+async def start_async_client() -> httpx.AsyncClient:
+    """Abre o cliente compartilhado no startup do app."""
+    return get_async_client()
+
+async def close_async_client() -> None:
+    """Fecha o cliente compartilhado e suas conexões no shutdown do app."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,58 @@
+import json
+from typing import List, Any
+
+class JSONArrayStreamParser:
+    """
+    Extrai, um a um, os objetos de um array JSON que chega em pedaços (ex.: resposta em streaming de um LLM).
+    Ignora o que vier antes do '[' (como cercas ```json) e depois do ']' de fechamento.
+    """
+
+    def __init__(self):
+        self._dentro_array = False
+        self._fim_array = False
+        self._profundidade = 0
+        self._em_string = False
+        self._escape = False
+        self._atual: List[str] = []
+
+    def feed(self, pedaco: str) -> List[Any]:
+        """Consome um pedaço de texto e retorna os objetos que ficaram completos com ele."""
+        objetos = []
+        for c in pedaco:
+            if self._fim_array:
+                break
+            if not self._dentro_array:
+                if c == "[":
+                    self._dentro_array = True
+                continue
+            if self._profundidade == 0:
+                if c == "{":
+                    self._profundidade = 1
+                    self._atual = [c]
+                elif c == "]":
+                    self._fim_array = True
+                continue
+            self._atual.append(c)
+            if self._em_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._em_string = False
+                continue
+            if c == '"':
+                self._em_string = True
+            elif c in "{[":
+                self._profundidade += 1
+            elif c in "}]":
+                self._profundidade -= 1
+                if self._profundidade == 0:
+                    objetos.append(json.loads("".join(self._atual)))
+                    self._atual = []
+        return objetos
+
+    @property
+    def completo(self) -> bool:
+        """True quando o array foi fechado."""
+        return self._fim_array
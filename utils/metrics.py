@@ -0,0 +1,206 @@
+"""
+Instrumentação leve: contadores, histogramas e cronômetros por etapa, exportados no formato texto do Prometheus.
+
+Sem dependências externas. Com METRICS_ENABLED=false e sem ?debug_timings, `etapa()` devolve um context manager
+vazio compartilhado e os contadores retornam na primeira linha, então o custo é o de uma checagem de flag.
+Cada processo (worker do uvicorn) tem o seu registro; os tempos medidos no pool de processos spaCy voltam
+com o resultado e são registrados no processo do app.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.config import get_env_var
+
+METRICS_ENABLED = get_env_var("METRICS_ENABLED", default="true").lower() == "true"
+
+# Limites (em segundos) dos buckets dos histogramas de latência.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _rotulos(nomes: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+class Contador:
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valor: float = 1, **rotulos: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        chave = tuple(str(rotulos.get(r, "")) for r in self.rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos: str) -> float:
+        return self._valores.get(tuple(str(rotulos.get(r, "")) for r in self.rotulos), 0)
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            for chave, valor in sorted(self._valores.items()):
+                linhas.append(f"{self.nome}{_rotulos(self.rotulos, chave)} {valor:g}")
+        return linhas
+
+class Histograma:
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = (), buckets: Tuple[float, ...] = BUCKETS):
+        self.nome, self.ajuda, self.rotulos, self.buckets = nome, ajuda, rotulos, buckets
+        # chave -> [contagem por bucket (não cumulativa) + estouro, soma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **rotulos: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        chave = tuple(str(rotulos.get(r, "")) for r in self.rotulos)
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def contagem(self, **rotulos: str) -> int:
+        serie = self._series.get(tuple(str(rotulos.get(r, "")) for r in self.rotulos))
+        return serie[2] if serie else 0
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            for chave, (contagens, soma, total) in sorted(self._series.items()):
+                acumulado = 0
+                for limite, n in zip(self.buckets, contagens):
+                    acumulado += n
+                    le = 'le="%g"' % limite
+                    linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos, chave, le)} {acumulado}")
+                le = 'le="+Inf"'
+                linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos, chave, le)} {total}")
+                linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {soma:.6f}")
+                linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, chave)} {total}")
+        return linhas
+
+class Registro:
+    """Conjunto das métricas do processo, mais gauges calculados na hora da coleta (ex.: estado do cache e do pool)."""
+
+    def __init__(self):
+        self._metricas: List = []
+        self._gauges: List[Tuple[str, str, Callable[[], Iterable[Tuple[Dict[str, str], float]]]]] = []
+
+    def contador(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()) -> Contador:
+        metrica = Contador(nome, ajuda, rotulos)
+        self._metricas.append(metrica)
+        return metrica
+
+    def histograma(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()) -> Histograma:
+        metrica = Histograma(nome, ajuda, rotulos)
+        self._metricas.append(metrica)
+        return metrica
+
+    def gauge(self, nome: str, ajuda: str, coletar: Callable[[], Iterable[Tuple[Dict[str, str], float]]]) -> None:
+        """Registra um gauge cujo valor é lido por `coletar()` a cada exportação: pares (rótulos, valor)."""
+        self._gauges.append((nome, ajuda, coletar))
+
+    def exportar(self) -> str:
+        linhas: List[str] = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.exportar())
+        for nome, ajuda, coletar in self._gauges:
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} gauge"]
+            for rotulos, valor in coletar():
+                nomes = tuple(rotulos)
+                linhas.append(f"{nome}{_rotulos(nomes, tuple(rotulos[n] for n in nomes))} {float(valor):g}")
+        return "\n".join(linhas) + "\n"
+
+REGISTRO = Registro()
+
+ETAPA_SEGUNDOS = REGISTRO.histograma("tarefai_etapa_segundos", "Duração de cada etapa da extração.", ("provedor", "etapa"))
+GEMINI_RESPOSTAS = REGISTRO.contador("tarefai_gemini_respostas_total", "Respostas HTTP da Gemini por status.", ("status",))
+GEMINI_JSON_INVALIDO = REGISTRO.contador("tarefai_gemini_json_invalido_total", "Respostas da Gemini que não viraram JSON válido.")
+GEMINI_TOKENS = REGISTRO.contador("tarefai_gemini_tokens_total", "Tokens da Gemini (usageMetadata) por tipo: entrada ou saida.", ("tipo",))
+CACHE_CONSULTAS = REGISTRO.contador("tarefai_cache_consultas_total", "Consultas ao cache de resultados.", ("provedor", "resultado"))
+TEXTOS_PROCESSADOS = REGISTRO.contador("tarefai_textos_processados_total", "Textos extraídos (fora do cache).", ("provedor",))
+FALANTES_PROCESSADOS = REGISTRO.contador("tarefai_falantes_processados_total", "Blocos de fala processados.", ("provedor",))
+
+# Tempos da requisição atual, quando ela pediu ?debug_timings=1: lista de (provedor, etapa, segundos).
+_coletor: ContextVar[Optional[List[Tuple[str, str, float]]]] = ContextVar("tarefai_coletor_tempos", default=None)
+
+def registrar_etapa(provedor: str, nome: str, segundos: float) -> None:
+    """Registra a duração de uma etapa no histograma e, se houver, no coletor da requisição."""
+    if METRICS_ENABLED:
+        ETAPA_SEGUNDOS.observar(segundos, provedor=provedor, etapa=nome)
+    coletor = _coletor.get()
+    if coletor is not None:
+        coletor.append((provedor, nome, segundos))
+
+class _Cronometro:
+    __slots__ = ("provedor", "nome", "_inicio")
+
+    def __init__(self, provedor: str, nome: str):
+        self.provedor, self.nome = provedor, nome
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registrar_etapa(self.provedor, self.nome, time.perf_counter() - self._inicio)
+        return False
+
+class _Nulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULO = _Nulo()
+
+def medindo() -> bool:
+    """True se alguém vai ler os tempos (métricas ligadas ou ?debug_timings na requisição atual)."""
+    return METRICS_ENABLED or _coletor.get() is not None
+
+def etapa(provedor: str, nome: str):
+    """Context manager que cronometra uma etapa. Sem métricas e sem coletor, não faz nada."""
+    if not METRICS_ENABLED and _coletor.get() is None:
+        return _NULO
+    return _Cronometro(provedor, nome)
+
+class coletar_tempos:
+    """
+    Ativa a coleta dos tempos de etapa no contexto atual (requisição com ?debug_timings=1).
+    O contexto é herdado pelas threads do run_in_threadpool, então as etapas do spaCy também entram.
+    """
+
+    def __enter__(self) -> List[Tuple[str, str, float]]:
+        self.tempos: List[Tuple[str, str, float]] = []
+        self._token = _coletor.set(self.tempos)
+        return self.tempos
+
+    def __exit__(self, *exc):
+        _coletor.reset(self._token)
+        return False
+
+def resumir_tempos(tempos: List[Tuple[str, str, float]]) -> Dict[str, float]:
+    """Soma as durações por provedor.etapa, em milissegundos, na ordem em que apareceram."""
+    resumo: Dict[str, float] = {}
+    for provedor, nome, segundos in tempos:
+        chave = f"{provedor}.{nome}"
+        resumo[chave] = resumo.get(chave, 0.0) + segundos * 1000
+    return {chave: round(ms, 3) for chave, ms in resumo.items()}
+
+def server_timing(resumo: Dict[str, float]) -> str:
+    """Cabeçalho Server-Timing (aparece na aba de rede do navegador): etapa;dur=ms separados por vírgula."""
+    return ", ".join(f"{chave};dur={ms}" for chave, ms in resumo.items())
@@ -0,0 +1,24 @@
+"""
+Resposta JSON dos resultados de extração.
+
+Os resultados já saem dos provedores como listas e dicts só com str/None, validados no caminho (os da Gemini pelo
+schema pydantic). Passar isso pelo jsonable_encoder e pela validação do response_model do FastAPI a cada resposta
+custa caro em saídas grandes (veja benchmarks/serializacao_bench.py). Os endpoints declaram os modelos de resposta
+(para o OpenAPI) e devolvem RespostaJSON, que o FastAPI envia sem reprocessar.
+"""
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele, cai no json da biblioteca padrão.
+    orjson = None
+
+class RespostaJSON(JSONResponse):
+    """JSONResponse serializada com orjson quando instalado (mesma saída compacta em UTF-8 do JSONResponse)."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content)